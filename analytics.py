@@ -0,0 +1,193 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from db_pool import get_connection
+
+# Метрики из daily_logs и суммы питания из nutrition_logs, по которым строятся тренды
+DAY_METRICS = ("water", "cigarettes", "expenses", "income", "mood", "energy")
+NUTRITION_METRICS = ("calories", "protein", "fat", "carbs")
+# Отдельной колонки для сна нет: берём числовое кастомное поле с таким названием
+SLEEP_FIELDS = ("сон", "sleep")
+METRICS = (*DAY_METRICS, *NUTRITION_METRICS, "sleep")
+
+# Пары метрик, связь между которыми показывает /trends
+CORRELATIONS = (
+    ("mood", "sleep"),
+    ("cigarettes", "mood"),
+    ("calories", "energy"),
+    ("mood", "energy"),
+    ("water", "energy"),
+)
+# Меньше совпадающих дней — корреляция не считается
+MIN_PAIRS = 7
+
+TRENDS_DAYS = 90
+MAX_TRENDS_DAYS = 3650
+
+# Понедельник, от которого считаются недели (1970-01-01 — четверг)
+_MONDAY = np.datetime64("1970-01-05")
+
+
+# === ЗАГРУЗКА РЯДОВ ===
+# Каждая метрика — массив float длиной в число дней периода, NaN там, где записи нет.
+# Данные читаются одним запросом на таблицу и раскладываются по дням без цикла по строкам.
+
+def _numeric(column):
+    # Текст, случайно оказавшийся в числовой колонке, превращается в NULL (→ NaN)
+    return f"CASE WHEN typeof({column}) IN ('integer', 'real') THEN {column} END"
+
+
+def _scatter(columns, names, rows, start):
+    if not rows:
+        return
+    dates, *values = zip(*rows)
+    index = (np.array(dates, dtype="datetime64[D]") - start).astype(np.int64)
+    matrix = np.array(values, dtype=float)
+    for name, row in zip(names, matrix):
+        columns[name][index] = row
+
+
+def load_series(conn, user_id, start, end):
+    """
+    Ряды по дням периода [start, end]: (массив дат datetime64[D], {метрика: значения}).
+    """
+    start, end = np.datetime64(start, "D"), np.datetime64(end, "D")
+    days = np.arange(start, end + 1)
+    columns = {name: np.full(len(days), np.nan) for name in METRICS}
+    bounds = (user_id, str(start), str(end))
+
+    _scatter(columns, DAY_METRICS, conn.execute(f"""
+        SELECT date, {", ".join(_numeric(m) for m in DAY_METRICS)}
+        FROM daily_logs
+        WHERE user_id = ? AND date BETWEEN ? AND ?
+    """, bounds).fetchall(), start)
+
+    _scatter(columns, NUTRITION_METRICS, conn.execute(f"""
+        SELECT date, {", ".join(f"SUM({m})" for m in NUTRITION_METRICS)}
+        FROM nutrition_logs
+        WHERE user_id = ? AND date BETWEEN ? AND ?
+        GROUP BY date
+    """, bounds).fetchall(), start)
+
+    # lower() в SQLite не понимает кириллицу, поэтому имя поля сравниваем в Python
+    sleep_fields = [
+        name for (name,) in conn.execute(
+            "SELECT field_name FROM custom_fields WHERE user_id = ?", (user_id,)
+        )
+        if name.strip().lower() in SLEEP_FIELDS
+    ]
+    if sleep_fields:
+        _scatter(columns, ("sleep",), conn.execute(f"""
+            SELECT date, MAX({_numeric("value")})
+            FROM daily_custom_values
+            WHERE user_id = ? AND date BETWEEN ? AND ?
+              AND field_name IN ({", ".join("?" * len(sleep_fields))})
+            GROUP BY date
+        """, (*bounds, *sleep_fields)).fetchall(), start)
+
+    return days, columns
+
+
+# === ВЕКТОРНЫЕ РАСЧЁТЫ ===
+def rolling_mean(values, window):
+    """
+    Скользящее среднее за window дней, заканчивающихся каждым днём; пропуски (NaN) не учитываются.
+    """
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0))
+    counts = np.cumsum(valid)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    result = np.full(len(values), np.nan)
+    np.divide(sums, counts, out=result, where=counts > 0)
+    return result
+
+
+def aggregate(days, values, period):
+    """
+    Средние по неделям (с понедельника) или месяцам: (метки периодов, средние, число дней с данными).
+    """
+    if period == "month":
+        keys = days.astype("datetime64[M]")
+    else:
+        keys = days - (days - _MONDAY).astype(np.int64) % 7
+    labels, inverse = np.unique(keys, return_inverse=True)
+    valid = ~np.isnan(values)
+    sums = np.bincount(inverse, weights=np.where(valid, values, 0.0), minlength=len(labels))
+    counts = np.bincount(inverse, weights=valid, minlength=len(labels))
+    means = np.full(len(labels), np.nan)
+    np.divide(sums, counts, out=means, where=counts > 0)
+    return labels, means, counts.astype(np.int64)
+
+
+def correlation(x, y):
+    """
+    Коэффициент Пирсона по дням, где есть обе метрики: (r или None, число дней).
+    """
+    mask = ~(np.isnan(x) | np.isnan(y))
+    pairs = int(mask.sum())
+    if pairs < MIN_PAIRS:
+        return None, pairs
+    dx = x[mask] - x[mask].mean()
+    dy = y[mask] - y[mask].mean()
+    denominator = np.sqrt((dx * dx).sum() * (dy * dy).sum())
+    if denominator == 0:
+        return None, pairs
+    return float((dx * dy).sum() / denominator), pairs
+
+
+def _mean(values):
+    return float(np.nanmean(values)) if (~np.isnan(values)).any() else None
+
+
+# === ОТЧЁТ /trends ===
+def compute_trends(user_id, days=TRENDS_DAYS, today=None):
+    """
+    Тренды за последние days дней: средние за 7 и 30 дней (и 7 дней до этого),
+    средние по неделям и месяцам, корреляции из CORRELATIONS.
+    Метрики без единой записи в отчёт не попадают.
+    """
+    end = today or date.today()
+    start = end - timedelta(days=days - 1)
+    with get_connection() as conn:
+        day_axis, columns = load_series(conn, user_id, start, end)
+
+    present = {name: values for name, values in columns.items() if (~np.isnan(values)).any()}
+    filled = np.zeros(len(day_axis), dtype=bool)
+    for values in present.values():
+        filled |= ~np.isnan(values)
+
+    averages, weekly, monthly = {}, {}, {}
+    for name, values in present.items():
+        week = rolling_mean(values, 7)
+        averages[name] = {
+            "week": _nan_to_none(week[-1]),
+            "prev_week": _nan_to_none(week[-8]) if len(week) > 7 else None,
+            "month": _nan_to_none(rolling_mean(values, 30)[-1]),
+            "total": _mean(values),
+        }
+        for period, target in (("week", weekly), ("month", monthly)):
+            labels, means, _ = aggregate(day_axis, values, period)
+            target[name] = [(str(label), _nan_to_none(mean)) for label, mean in zip(labels, means)]
+
+    correlations = []
+    for x, y in CORRELATIONS:
+        if x in present and y in present:
+            r, pairs = correlation(present[x], present[y])
+            correlations.append((x, y, r, pairs))
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": len(day_axis),
+        "filled": int(filled.sum()),
+        "averages": averages,
+        "weekly": weekly,
+        "monthly": monthly,
+        "correlations": correlations,
+    }
+
+
+def _nan_to_none(value):
+    return None if np.isnan(value) else float(value)
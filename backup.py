@@ -0,0 +1,226 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+from db_pool import DB_PATH, get_connection
+
+logger = logging.getLogger(__name__)
+
+BACKUP_DIR = "backups"
+# Размер куска: кратен странице SQLite (4096), чтобы неизменённые страницы
+# давали те же куски и не записывались повторно
+CHUNK_SIZE = 64 * 1024
+# Сколько последних снимков хранить при очистке
+KEEP_BACKUPS = 30
+
+
+# === СНИМОК БАЗЫ КУСКАМИ С ДЕДУПЛИКАЦИЕЙ ===
+# backups/manifests/<время>.json — список хэшей кусков одного снимка
+# backups/chunks/<2 символа>/<sha256> — содержимое куска (zlib); одинаковые куски
+# разных снимков хранятся один раз, так что новый снимок стоит только изменённых байт.
+
+def _chunk_path(backup_dir, digest):
+    return os.path.join(backup_dir, "chunks", digest[:2], digest)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def create_backup(db_path=None, backup_dir=BACKUP_DIR):
+    """
+    Делает согласованный снимок через online backup API SQLite
+    (незавершённые транзакции в него не попадают) и сохраняет новые куски.
+    Возвращает отчёт: манифест, длительность, размер базы и сколько байт записано.
+    """
+    db_path = db_path or DB_PATH
+    started = time.monotonic()
+    os.makedirs(backup_dir, exist_ok=True)
+
+    fd, snapshot = tempfile.mkstemp(suffix=".db", dir=backup_dir)
+    os.close(fd)
+    try:
+        dst = sqlite3.connect(snapshot)
+        try:
+            get_connection(db_path).backup(dst)
+        finally:
+            dst.close()
+
+        chunks = []
+        new_chunks = written = 0
+        whole = hashlib.sha256()
+        with open(snapshot, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                whole.update(chunk)
+                digest = hashlib.sha256(chunk).hexdigest()
+                chunks.append(digest)
+                path = _chunk_path(backup_dir, digest)
+                if not os.path.exists(path):
+                    data = zlib.compress(chunk)
+                    _write_atomic(path, data)
+                    new_chunks += 1
+                    written += len(data)
+        size = os.path.getsize(snapshot)
+    finally:
+        os.remove(snapshot)
+
+    name = datetime.now().strftime("%Y%m%d-%H%M%S")
+    manifest = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "source": os.path.abspath(db_path),
+        "size": size,
+        "chunk_size": CHUNK_SIZE,
+        "sha256": whole.hexdigest(),
+        "chunks": chunks,
+    }
+    manifest_path = os.path.join(backup_dir, "manifests", f"{name}.json")
+    _write_atomic(manifest_path, json.dumps(manifest).encode())
+
+    report = {
+        "manifest": manifest_path,
+        "duration": time.monotonic() - started,
+        "size": size,
+        "chunks": len(chunks),
+        "new_chunks": new_chunks,
+        "written": written,
+    }
+    logger.info(
+        f"[BACKUP] {manifest_path}: база {size} байт, записано {written} байт "
+        f"({new_chunks}/{len(chunks)} новых кусков) за {report['duration']:.2f} с"
+    )
+    return report
+
+
+def list_backups(backup_dir=BACKUP_DIR):
+    """
+    Пути манифестов, от старых к новым.
+    """
+    directory = os.path.join(backup_dir, "manifests")
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, n) for n in sorted(os.listdir(directory)) if n.endswith(".json")]
+
+
+# === ВОССТАНОВЛЕНИЕ И ПРОВЕРКА ===
+def restore_backup(manifest_path, target_path, backup_dir=BACKUP_DIR):
+    """
+    Собирает базу из кусков во временный файл рядом с target_path и проверяет:
+    хэш каждого куска, хэш всего файла и PRAGMA integrity_check.
+    Только после успешной проверки файл атомарно заменяет target_path.
+    Восстанавливать рабочую базу нужно при остановленном боте.
+    """
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    directory = os.path.dirname(os.path.abspath(target_path))
+    fd, tmp = tempfile.mkstemp(suffix=".db", dir=directory)
+    try:
+        whole = hashlib.sha256()
+        with os.fdopen(fd, "wb") as out:
+            for digest in manifest["chunks"]:
+                with open(_chunk_path(backup_dir, digest), "rb") as f:
+                    data = f.read()
+                try:
+                    chunk = zlib.decompress(data)
+                except zlib.error:
+                    chunk = None
+                if chunk is None or hashlib.sha256(chunk).hexdigest() != digest:
+                    raise ValueError(f"Повреждён кусок {digest}")
+                whole.update(chunk)
+                out.write(chunk)
+        if whole.hexdigest() != manifest["sha256"] or os.path.getsize(tmp) != manifest["size"]:
+            raise ValueError("Собранный файл не совпадает с манифестом")
+
+        conn = sqlite3.connect(tmp)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            conn.close()
+        if result != "ok":
+            raise ValueError(f"integrity_check: {result}")
+
+        # Старые -wal/-shm от прежней базы не должны примениться к восстановленной
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(target_path + suffix):
+                os.remove(target_path + suffix)
+        os.replace(tmp, target_path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    logger.info(f"[BACKUP] {manifest_path} восстановлен в {target_path}")
+
+
+def verify_backup(manifest_path, backup_dir=BACKUP_DIR):
+    """
+    Пробное восстановление во временный файл; бросает ValueError при повреждении.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        restore_backup(manifest_path, os.path.join(tmp_dir, "verify.db"), backup_dir)
+
+
+# === ОЧИСТКА СТАРЫХ СНИМКОВ ===
+def prune_backups(keep=KEEP_BACKUPS, backup_dir=BACKUP_DIR):
+    """
+    Оставляет keep последних снимков и удаляет куски, на которые они не ссылаются.
+    Возвращает число удалённых кусков.
+    """
+    manifests = list_backups(backup_dir)
+    for path in manifests[:-keep] if keep else manifests:
+        os.remove(path)
+
+    referenced = set()
+    for path in list_backups(backup_dir):
+        with open(path, encoding="utf-8") as f:
+            referenced.update(json.load(f)["chunks"])
+
+    removed = 0
+    chunks_dir = os.path.join(backup_dir, "chunks")
+    for root, _, files in os.walk(chunks_dir):
+        for name in files:
+            if name not in referenced:
+                os.remove(os.path.join(root, name))
+                removed += 1
+    return removed
+
+
+# === КОМАНДНАЯ СТРОКА ===
+# python backup.py create | list | verify <манифест> | restore <манифест> <файл базы> | prune [N]
+def main(argv):
+    logging.basicConfig(level=logging.INFO)
+    command = argv[0] if argv else "create"
+    if command == "create":
+        report = create_backup()
+        print(
+            f"{report['manifest']}: {report['size']} байт, записано {report['written']} байт, "
+            f"{report['duration']:.2f} с"
+        )
+    elif command == "list":
+        print("\n".join(list_backups()))
+    elif command == "verify":
+        verify_backup(argv[1])
+        print("OK")
+    elif command == "restore":
+        restore_backup(argv[1], argv[2])
+        print("OK")
+    elif command == "prune":
+        print(f"Удалено кусков: {prune_backups(int(argv[1]) if len(argv) > 1 else KEEP_BACKUPS)}")
+    else:
+        print("Команды: create | list | verify <манифест> | restore <манифест> <файл> | prune [N]")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
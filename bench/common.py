@@ -0,0 +1,42 @@
+"""
+Общее для бенчмарков: путь к модулям бота, временная база, перцентили.
+Скрипты запускаются из корня репозитория: python bench/<имя>.py
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def temp_db():
+    """
+    Направляет db_pool во временную базу и создаёт схему через init_db (со всеми миграциями).
+    Возвращает путь к базе.
+    """
+    import database
+    import db_pool
+
+    db_pool.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bench_"), "habits.db")
+    database.init_db()
+    return db_pool.DB_PATH
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def print_latency(label, seconds):
+    """
+    Строка отчёта по задержкам: p50/p99/среднее в миллисекундах.
+    """
+    ms = [s * 1000 for s in seconds]
+    print(
+        f"{label:<32} p50 {percentile(ms, 50):8.3f} мс   p99 {percentile(ms, 99):8.3f} мс   "
+        f"среднее {sum(ms) / len(ms):8.3f} мс   (n={len(ms)})"
+    )
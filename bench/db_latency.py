@@ -0,0 +1,78 @@
+"""
+Задержка одного вызова database.py: новое соединение на каждый вызов
+(как было до db_pool) против долгоживущего соединения из db_pool.
+
+    python bench/db_latency.py --calls 2000
+"""
+import argparse
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import common
+
+import database
+import db_pool
+
+USER = 1
+DAY = "2025-03-10"
+# Записи идут в другой день, чтобы чтения в обоих режимах видели одни и те же данные
+WRITE_DAY = "2025-03-11"
+
+
+@contextmanager
+def _fresh_connection(path=None):
+    # Поведение до db_pool: открыть файл, разобрать схему, закрыть после вызова
+    conn = sqlite3.connect(path or db_pool.DB_PATH)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _seed():
+    for i in range(20):
+        database.save_habit(USER, f"Привычка {i}", {"habit_type": "good", "tracking_type": "bool"})
+    database.save_daily_log(USER, DAY, {"water": 1500, "mood": 4})
+    database.add_product("Гречка", 313, 12.6, 3.3, 62.1, 0, 0)
+    for meal in ("Завтрак", "Обед", "Ужин"):
+        for _ in range(3):
+            database.log_food(USER, DAY, meal, "Гречка", 100)
+
+
+CALLS = [
+    ("get_daily_log", lambda: database.get_daily_log(USER, DAY)),
+    ("load_habits", lambda: database.load_habits(USER)),
+    ("get_food_log", lambda: database.get_food_log(USER, DAY)),
+    ("save_habit", lambda: database.save_habit(USER, "Бег", {"habit_type": "good"})),
+    ("log_food", lambda: database.log_food(USER, WRITE_DAY, "Обед", "Гречка", 100)),
+]
+
+
+def _measure(func, calls):
+    timings = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main(calls):
+    common.temp_db()
+    _seed()
+    pooled = database.get_connection
+    for mode, connect in (("новое соединение", _fresh_connection), ("db_pool", pooled)):
+        database.get_connection = connect
+        print(f"--- {mode}")
+        for name, func in CALLS:
+            func()  # прогрев: кэш страниц, подготовленные выражения
+            common.print_latency(name, _measure(func, calls))
+    database.get_connection = pooled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка вызовов database.py до и после db_pool")
+    parser.add_argument("--calls", type=int, default=2000, help="вызовов на каждую функцию")
+    main(parser.parse_args().calls)
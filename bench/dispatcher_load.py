@@ -0,0 +1,147 @@
+"""
+Нагрузочный тест диспетчера: синтетические апдейты от разных пользователей
+приходят с заданной частотой. Каждый HEAVY_EVERY-й — запрос к базе:
+/history (год логов дня) или запись еды; остальные — лёгкие команды без запросов.
+Фоновый писатель периодически держит блокировку записи (как импорт или бэкап),
+--hold 0 его выключает.
+Сравниваются синхронный вызов database.py внутри хендлера (цикл событий стоит,
+пока идёт запрос или ожидание блокировки) и db_async (запрос в пуле потоков).
+Задержка — от передачи апдейта в dp.feed_update до конца хендлера;
+шарды и FSM подключены так же, как в main.py.
+
+    python bench/dispatcher_load.py --updates 3000 --users 200 --rate 300 --hold 0.2
+"""
+import argparse
+import asyncio
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+import common
+
+from aiogram import Bot, Dispatcher, F
+from aiogram.types import Update
+
+import database
+import db_async
+import db_pool
+from update_scheduler import UpdateSchedulerMiddleware
+
+START = date(2025, 1, 1)
+DAYS = 365
+# Каждый какой апдейт идёт в базу
+HEAVY_EVERY = 10
+# Как часто фоновый писатель берёт блокировку записи, с
+WRITER_PERIOD = 0.5
+
+
+def _seed(users):
+    for user_id in range(1, users + 1):
+        for i in range(DAYS):
+            day = (START + timedelta(days=i)).isoformat()
+            database.save_daily_log(user_id, day, {"water": 1500 + i, "mood": i % 5 + 1, "thoughts": "—"})
+    database.add_product("Гречка", 313, 12.6, 3.3, 62.1, 0, 0)
+
+
+def _writer(hold, stop):
+    # Чужая длинная транзакция: запись в это время ждёт busy_timeout, чтения в WAL — нет
+    conn = sqlite3.connect(db_pool.DB_PATH, isolation_level=None)
+    while not stop.is_set():
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(hold)
+        conn.execute("COMMIT")
+        stop.wait(WRITER_PERIOD - hold)
+    conn.close()
+
+
+def _update(update_id, user_id, text):
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "bench"},
+            "text": text,
+        },
+    })
+
+
+async def _run(mode, count, users, rate):
+    dp = Dispatcher()
+    scheduler = UpdateSchedulerMiddleware()
+    scheduler.install(dp)
+    end = (START + timedelta(days=DAYS - 1)).isoformat()
+    fed_at = {}
+    latencies = {"лёгкие": [], "/history": [], "/food": []}
+    done = asyncio.Event()
+
+    def finished(message, kind):
+        latencies[kind].append(time.perf_counter() - fed_at[message.message_id])
+        if sum(map(len, latencies.values())) == count:
+            done.set()
+
+    @dp.message(F.text == "/history")
+    async def history(message):
+        if mode == "sync":
+            database.get_daily_logs(message.from_user.id, START.isoformat(), end)
+        else:
+            await db_async.get_daily_logs(message.from_user.id, START.isoformat(), end)
+        finished(message, "/history")
+
+    @dp.message(F.text == "/food")
+    async def food(message):
+        args = (message.from_user.id, "2025-06-01", "Обед", "Гречка", 100)
+        if mode == "sync":
+            database.log_food(*args)
+        else:
+            await db_async.log_food(*args)
+        finished(message, "/food")
+
+    @dp.message()
+    async def light(message):
+        finished(message, "лёгкие")
+
+    bot = Bot("123456:bench")
+    started = time.perf_counter()
+    for i in range(1, count + 1):
+        # Открытая нагрузка: апдейты приходят по расписанию, не дожидаясь обработки
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        fed_at[i] = time.perf_counter()
+        text = "/start" if i % HEAVY_EVERY else ("/history", "/food")[i // HEAVY_EVERY % 2]
+        await dp.feed_update(bot, _update(i, i % users + 1, text))
+    await done.wait()
+    await scheduler.close()
+    await bot.session.close()
+    return latencies
+
+
+async def main(count, users, rate, hold):
+    common.temp_db()
+    _seed(users)
+    for mode in ("sync", "db_async"):
+        stop = threading.Event()
+        writer = threading.Thread(target=_writer, args=(hold, stop))
+        if hold:
+            writer.start()
+        latencies = await _run(mode, count, users, rate)
+        stop.set()
+        if hold:
+            writer.join()
+        for kind, values in latencies.items():
+            common.print_latency(f"{mode}, {kind}", values)
+    db_async.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="p50/p99 задержки хендлеров под нагрузкой")
+    parser.add_argument("--updates", type=int, default=3000, help="сколько апдейтов отправить")
+    parser.add_argument("--users", type=int, default=200, help="сколько разных пользователей")
+    parser.add_argument("--rate", type=float, default=300, help="апдейтов в секунду")
+    parser.add_argument("--hold", type=float, default=0.2,
+                        help=f"сколько секунд из каждых {WRITER_PERIOD} фоновый писатель держит блокировку")
+    args = parser.parse_args()
+    asyncio.run(main(args.updates, args.users, args.rate, args.hold))
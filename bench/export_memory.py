@@ -0,0 +1,122 @@
+"""
+Экспорт синтетического пользователя со 100k строк журналов: пиковая память (RSS)
+и время для каждого формата /export. Для сравнения — прежний способ:
+fetchall() и обычная (не write_only) книга openpyxl в памяти.
+Каждый прогон идёт в отдельном процессе, чтобы пики не складывались.
+
+    python bench/export_memory.py --rows 100000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import common
+
+import db_pool
+
+USER = 1
+DAYS = 3650
+
+
+def _seed(rows):
+    conn = db_pool.get_connection()
+    start = date(2015, 1, 1)
+    days = [(start + timedelta(days=i)).isoformat() for i in range(DAYS)]
+    conn.executemany(
+        "INSERT INTO habits (user_id, habit_name, data) VALUES (?, ?, ?)",
+        [(USER, f"Привычка {i}", json.dumps({"habit_type": "good", "tracking_type": "bool"})) for i in range(10)]
+    )
+    conn.executemany(
+        "INSERT INTO custom_fields (user_id, field_name, field_type) VALUES (?, ?, ?)",
+        [(USER, name, "int") for name in ("сон", "шаги")]
+    )
+    conn.executemany(
+        "INSERT INTO daily_logs (user_id, date, water, mood, thoughts) VALUES (?, ?, ?, ?, ?)",
+        [(USER, day, 1500, 4, "обычный день") for day in days]
+    )
+    conn.executemany(
+        "INSERT INTO daily_custom_values (user_id, date, field_name, value) VALUES (?, ?, ?, ?)",
+        [(USER, day, name, 7) for day in days for name in ("сон", "шаги")]
+    )
+    # Остаток поровну между журналами привычек и питания
+    logs = max(rows - DAYS - 10, 0) // 2
+    conn.executemany(
+        "INSERT INTO habit_logs (user_id, habit_name, value, timestamp) VALUES (?, ?, ?, ?)",
+        [(USER, f"Привычка {i % 10}", 1, f"{days[i % DAYS]} 09:00:00") for i in range(logs)]
+    )
+    conn.executemany(
+        "INSERT INTO nutrition_logs (user_id, date, meal_name, product_name, weight_grams, calories) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [(USER, days[i % DAYS], "Обед", f"Продукт {i % 500}", 150, 240) for i in range(logs)]
+    )
+    conn.commit()
+
+
+def _naive_xlsx(user_id, directory):
+    # Как было до потокового экспорта: всё в память, потом в файл
+    from openpyxl import Workbook
+
+    from exporter import iter_tables
+
+    wb = Workbook()
+    wb.remove(wb.active)
+    tables = [(title, columns, list(rows)) for _, title, columns, rows in iter_tables(db_pool.get_connection(), user_id)]
+    for title, columns, rows in tables:
+        ws = wb.create_sheet(title)
+        ws.append([header for _, header in columns])
+        for row in rows:
+            ws.append(row)
+    path = os.path.join(directory, "naive.xlsx")
+    wb.save(path)
+    return [path]
+
+
+def _child(fmt, db_path):
+    # Отдельный процесс: один экспорт, на выходе JSON с временем, пиком памяти и размером
+    db_pool.DB_PATH = db_path
+    from exporter import export_data
+
+    directory = tempfile.mkdtemp(prefix="bench_export_")
+    started = time.perf_counter()
+    paths = _naive_xlsx(USER, directory) if fmt == "naive" else export_data(USER, directory, fmt)
+    print(json.dumps({
+        "seconds": time.perf_counter() - started,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "size_mb": sum(os.path.getsize(p) for p in paths) / 1024 / 1024,
+    }))
+
+
+def main(rows):
+    db_path = common.temp_db()
+    _seed(rows)
+    total = sum(
+        db_pool.get_connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("habits", "habit_logs", "daily_logs", "nutrition_logs")
+    )
+    print(f"строк в экспорте: {total}")
+    for fmt in ("naive", "xlsx", "csv", "jsonl", "npz"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", fmt, db_path],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        label = "xlsx (fetchall, в памяти)" if fmt == "naive" else fmt
+        print(
+            f"{label:<26} {result['seconds']:6.2f} с   пик RSS {result['rss_mb']:7.1f} МБ   "
+            f"файлы {result['size_mb']:6.1f} МБ   {total / result['seconds']:8.0f} строк/с"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        _child(sys.argv[2], sys.argv[3])
+        sys.exit()
+    parser = argparse.ArgumentParser(description="Пиковая память и время /export на 100k строк")
+    parser.add_argument("--rows", type=int, default=100000, help="сколько строк журналов создать")
+    main(parser.parse_args().rows)
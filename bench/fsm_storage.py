@@ -0,0 +1,61 @@
+"""
+Задержка get_data / update_data у хранилищ FSM: MemoryStorage (как было),
+SQLiteStorage с кэшем и отложенной записью и SQLiteStorage(shared=True),
+где каждое чтение и запись идут в fsm.db.
+
+    python bench/fsm_storage.py --users 1000 --ops 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import common
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from fsm_storage import SQLiteStorage
+
+
+def _keys(users):
+    return [StorageKey(bot_id=1, chat_id=1000 + i, user_id=1000 + i) for i in range(users)]
+
+
+async def _measure(storage, keys, ops):
+    random.seed(1)
+    reads, writes = [], []
+    for i in range(ops):
+        key = random.choice(keys)
+        started = time.perf_counter()
+        await storage.get_data(key)
+        reads.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        await storage.update_data(key, {"step": i, "product": "Гречка", "grams": 150})
+        writes.append(time.perf_counter() - started)
+    await storage.close()
+    return reads, writes
+
+
+async def main(users, ops):
+    keys = _keys(users)
+    directory = tempfile.mkdtemp(prefix="bench_fsm_")
+    storages = {
+        "MemoryStorage": MemoryStorage(),
+        "SQLiteStorage": SQLiteStorage(os.path.join(directory, "cached.db")),
+        "SQLiteStorage(shared)": SQLiteStorage(os.path.join(directory, "shared.db"), shared=True),
+    }
+    for label, storage in storages.items():
+        reads, writes = await _measure(storage, keys, ops)
+        common.print_latency(f"{label} get_data", reads)
+        common.print_latency(f"{label} update_data", writes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка хранилищ FSM")
+    parser.add_argument("--users", type=int, default=1000, help="сколько разных диалогов")
+    parser.add_argument("--ops", type=int, default=20000, help="сколько пар get_data/update_data")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.ops))
@@ -0,0 +1,112 @@
+"""
+/import на 1M строк журнала питания (CSV, как его пишет /export csv):
+строк в секунду, прирост пиковой памяти (RSS) и сколько держится блокировка записи.
+Для сравнения — прежний путь: save_nutrition_entry на каждую строку (на части файла).
+Каждый прогон идёт в отдельном процессе, чтобы пики памяти не складывались.
+
+    python bench/import_rows.py --rows 1000000
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import common
+
+import db_pool
+from importer import NUTRITION_HEADERS
+
+USER = 1
+DAYS = 3650
+# Сколько строк прогонять через save_nutrition_entry — по строке медленно
+PER_ROW_SAMPLE = 20000
+
+
+def _write_csv(path, rows):
+    start = date(2015, 1, 1)
+    days = [(start + timedelta(days=i)).isoformat() for i in range(DAYS)]
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(list(NUTRITION_HEADERS))
+        writer.writerows(
+            (days[i % DAYS], "Обед", f"Продукт {i % 500}", 150, 240.5, 12.1, 8.3, 30.2, 0.4, 5.1, 2.2)
+            for i in range(rows)
+        )
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child(mode, csv_path, db_path):
+    # Отдельный процесс: один прогон, на выходе JSON со временем и памятью
+    db_pool.DB_PATH = db_path
+    import database
+    from importer import import_file
+
+    # Записи [IMPORT] с временем этапа записи — из лога импортёра
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logging.getLogger("importer").addHandler(handler)
+    logging.getLogger("importer").setLevel(logging.INFO)
+
+    rss_before = _peak_rss_mb()
+    started = time.perf_counter()
+    if mode == "import":
+        rows = sum(import_file(USER, csv_path)["rows"].values())
+    else:
+        with open(csv_path, encoding="utf-8-sig", newline="") as f:
+            reader = csv.reader(f, delimiter=";")
+            next(reader)
+            rows = 0
+            for row in reader:
+                if rows == PER_ROW_SAMPLE:
+                    break
+                database.save_nutrition_entry(USER, row[0], *row[1:4], *map(float, row[4:]))
+                rows += 1
+    seconds = time.perf_counter() - started
+    print(json.dumps({
+        "rows": rows,
+        "seconds": seconds,
+        "rss_before_mb": rss_before,
+        "rss_peak_mb": _peak_rss_mb(),
+        "log": records[-1].getMessage() if records else "",
+    }))
+
+
+def main(rows):
+    db_path = common.temp_db()
+    csv_path = os.path.join(tempfile.mkdtemp(prefix="bench_import_"), "nutrition.csv")
+    _write_csv(csv_path, rows)
+    print(f"строк в файле: {rows}, размер {os.path.getsize(csv_path) / 1024 / 1024:.0f} МБ")
+    for mode in ("import", "per_row"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", mode, csv_path, db_path],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        label = "import_file" if mode == "import" else "save_nutrition_entry"
+        print(
+            f"{label:<22} {result['rows']:8d} строк за {result['seconds']:6.2f} с   "
+            f"{result['rows'] / result['seconds']:8.0f} строк/с   "
+            f"RSS {result['rss_before_mb']:6.1f} → {result['rss_peak_mb']:6.1f} МБ"
+        )
+        if result["log"]:
+            print(f"{'':<22} {result['log']}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--child":
+        _child(*sys.argv[2:])
+        sys.exit()
+    parser = argparse.ArgumentParser(description="Скорость и память /import на большом CSV")
+    parser.add_argument("--rows", type=int, default=1000000, help="сколько строк питания в файле")
+    main(parser.parse_args().rows)
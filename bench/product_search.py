@@ -0,0 +1,88 @@
+"""
+Поиск продуктов на 50k позиций справочника: задержка search_products
+для разных видов запросов (короткий префикс, префикс, подстрока, опечатка,
+пустой запрос — самые частые). Для сравнения — прежний путь:
+весь справочник через get_products() и фильтр в Python.
+
+    python bench/product_search.py --products 50000
+"""
+import argparse
+import random
+import time
+
+import common
+
+import database
+import db_pool
+
+USER = 1
+REPEATS = 200
+
+BASES = [
+    "Молоко", "Кефир", "Творог", "Сыр", "Йогурт", "Гречка", "Рис", "Овсянка", "Макароны", "Хлеб",
+    "Курица", "Говядина", "Свинина", "Индейка", "Лосось", "Треска", "Яйцо", "Яблоко", "Банан", "Груша",
+    "Картофель", "Морковь", "Капуста", "Огурец", "Помидор", "Фасоль", "Чечевица", "Орехи", "Шоколад", "Печенье",
+]
+KINDS = ["", "обезжиренный", "домашний", "отварной", "жареный", "запечённый", "сушёный", "свежий", "копчёный", "цельный"]
+BRANDS = [f"марка {i}" for i in range(200)]
+
+QUERIES = {
+    "префикс 2 символа": "гр",
+    "префикс": "греч",
+    "подстрока": "молоко",
+    "опечатка": "малоко",
+    "опечатка + слово": "курца отварная",
+    "пустой (частые)": "",
+}
+
+
+def _seed(count):
+    random.seed(1)
+    names = set()
+    while len(names) < count:
+        parts = [random.choice(BASES), random.choice(KINDS), random.choice(BRANDS)]
+        names.add(" ".join(p for p in parts if p))
+    conn = db_pool.get_connection()
+    conn.executemany(
+        "INSERT INTO products (name, calories, protein, fat, carbs, salt, sugar) VALUES (?, 100, 1, 1, 1, 0, 0)",
+        [(name,) for name in names]
+    )
+    # Частота: пользователь ел пару сотен разных продуктов
+    conn.executemany(
+        "INSERT INTO product_usage (user_id, product_id, uses) VALUES (?, ?, ?)",
+        [(USER, product_id, random.randrange(1, 50)) for product_id in random.sample(range(1, count + 1), 300)]
+    )
+    conn.commit()
+
+
+def _measure(func):
+    func()
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main(count):
+    common.temp_db()
+    _seed(count)
+    print(f"продуктов: {count}, FTS5: {'да' if database._has_products_fts(db_pool.get_connection()) else 'нет'}")
+    for label, query in QUERIES.items():
+        results = database.search_products(query, USER)
+        common.print_latency(f"{label} «{query}»", _measure(lambda: database.search_products(query, USER)))
+        print(f"{'':<32} → {', '.join(r[1] for r in results[:3])}")
+
+    # Прежний путь: весь справочник в память, потом подстрока в Python
+    def full_scan():
+        q = "молоко"
+        return [p for p in database.get_products() if q in p[1].lower()][:database.SEARCH_LIMIT]
+
+    common.print_latency("get_products() + фильтр", _measure(full_scan))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка поиска продуктов на большом справочнике")
+    parser.add_argument("--products", type=int, default=50000, help="сколько продуктов создать")
+    main(parser.parse_args().products)
@@ -0,0 +1,74 @@
+"""
+Планировщик напоминаний на 100k синтетических напоминаний:
+загрузка в кучу, стоимость одного «тика» (снять сработавшие за минуту),
+перепланирование через /remind и /remind_off. Для сравнения — прежняя
+проверка раз в минуту: выборка всех напоминаний с текущим HH:MM из таблицы.
+
+    python bench/reminders.py --reminders 100000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import common
+
+import database
+import db_pool
+from reminder_engine import ReminderEngine
+
+TICKS = 60
+
+
+def _times(count):
+    random.seed(1)
+    return [(user_id, f"{random.randrange(24):02d}:{random.randrange(60):02d}") for user_id in range(1, count + 1)]
+
+
+def main(count):
+    common.temp_db()
+    reminders = _times(count)
+    conn = db_pool.get_connection()
+    conn.executemany("INSERT INTO reminders (user_id, time) VALUES (?, ?)", reminders)
+    conn.commit()
+
+    started = time.perf_counter()
+    rows = database.get_all_reminders()
+    engine = ReminderEngine()
+    for user_id, time_str in rows:
+        engine.schedule(user_id, time_str)
+    print(f"загрузка {len(engine)} напоминаний: {(time.perf_counter() - started) * 1000:.0f} мс")
+
+    # Тики по минутам: каждый снимает с кучи то, что сработало за минуту
+    now = datetime.now().replace(second=0, microsecond=0)
+    ticks, fired = [], 0
+    for minute in range(1, TICKS + 1):
+        started = time.perf_counter()
+        fired += len(engine.pop_due(now + timedelta(minutes=minute)))
+        ticks.append(time.perf_counter() - started)
+    common.print_latency("тик (куча)", ticks)
+    print(f"{'':<32} сработало {fired} за {TICKS} мин, {fired / TICKS:.0f} в минуту")
+
+    # Прежний способ: раз в минуту выбрать всех, у кого сейчас HH:MM
+    scans = []
+    for minute in range(1, TICKS + 1):
+        hhmm = (now + timedelta(minutes=minute)).strftime("%H:%M")
+        started = time.perf_counter()
+        conn.execute("SELECT user_id FROM reminders WHERE time = ?", (hhmm,)).fetchall()
+        scans.append(time.perf_counter() - started)
+    common.print_latency("тик (выборка из таблицы)", scans)
+
+    # /remind и /remind_off поверх загруженной кучи
+    changes = []
+    for user_id, _ in random.sample(reminders, 10000):
+        started = time.perf_counter()
+        engine.schedule(user_id, "08:30")
+        engine.cancel(user_id)
+        changes.append(time.perf_counter() - started)
+    common.print_latency("schedule + cancel", changes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Стоимость тика планировщика напоминаний")
+    parser.add_argument("--reminders", type=int, default=100000, help="сколько напоминаний создать")
+    main(parser.parse_args().reminders)
@@ -0,0 +1,98 @@
+"""
+Отчёт за год: 365 дней с питанием и кастомными полями.
+Меряет сборку данных get_daily_report (холодный и тёплый кэш сводок),
+рендер render_report целиком и время до первого готового сообщения,
+а также число сообщений и их максимальную длину (лимит Telegram — 4096).
+
+    python bench/render_report.py --days 365 --fields 8
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import common
+
+import database
+import db_pool
+import reports
+from summary_cache import summary_cache
+
+USER = 1
+REPEATS = 50
+END = date(2026, 12, 31)
+
+
+def _seed(days, fields):
+    random.seed(1)
+    custom_names = [f"поле {i}" for i in range(fields)]
+    for name in custom_names:
+        database.save_custom_field(USER, name, "text")
+    dates = [(END - timedelta(days=i)).isoformat() for i in range(days)]
+    for day in dates:
+        database.save_daily_log(USER, day, {
+            "water": random.randrange(500, 3000),
+            "cigarettes": random.randrange(0, 10),
+            "exercise": "бег & растяжка",
+            "expenses": random.randrange(0, 5000),
+            "income": 0,
+            "mood": random.randrange(1, 11),
+            "energy": random.randrange(1, 11),
+            "thoughts": "мысли <за> день " * random.randrange(1, 20),
+            **{name: f"значение {random.randrange(100)}" for name in custom_names},
+        })
+    conn = db_pool.get_connection()
+    conn.executemany("""
+        INSERT INTO nutrition_logs (
+            user_id, date, meal_name, product_name, weight_grams,
+            calories, protein, fat, carbs, salt, sugar, fiber
+        ) VALUES (?, ?, 'Обед', 'Гречка', 150, 200, 8, 2, 40, 0.1, 1, 3)
+    """, [(USER, day) for day in dates for _ in range(4)])
+    conn.commit()
+    return dates[-1], dates[0], custom_names
+
+
+def _measure(func):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main(days, fields):
+    common.temp_db()
+    start, end, custom_names = _seed(days, fields)
+    title = f"📅 Лог за {start} — {end}:"
+
+    def cold():
+        summary_cache.__init__()
+        return database.get_daily_report(USER, start, end)
+
+    common.print_latency("get_daily_report, холодный кэш", _measure(cold))
+    common.print_latency("get_daily_report, тёплый кэш", _measure(
+        lambda: database.get_daily_report(USER, start, end)
+    ))
+
+    rows, summaries = database.get_daily_report(USER, start, end)
+    common.print_latency("render_report целиком", _measure(
+        lambda: list(reports.render_report(title, rows, summaries, custom_names))
+    ))
+    common.print_latency("первое сообщение", _measure(
+        lambda: next(reports.render_report(title, rows, summaries, custom_names))
+    ))
+
+    messages = list(reports.render_report(title, rows, summaries, custom_names))
+    print(
+        f"дней: {len(rows)}, сообщений: {len(messages)}, "
+        f"макс. длина: {max(map(len, messages))} (лимит {reports.MESSAGE_LIMIT})"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Рендер отчёта за длинный период")
+    parser.add_argument("--days", type=int, default=365, help="сколько дней в отчёте")
+    parser.add_argument("--fields", type=int, default=8, help="сколько кастомных полей")
+    args = parser.parse_args()
+    main(args.days, args.fields)
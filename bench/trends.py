@@ -0,0 +1,176 @@
+"""
+/trends за 5 лет: векторный расчёт analytics.compute_trends против наивного
+цикла по строкам на чистом Python (чтение построчно, суммы и средние в словарях).
+Оба дают одинаковый отчёт — это проверяется до 4 знаков.
+
+    python bench/trends.py --years 5
+"""
+import argparse
+import math
+import random
+import time
+from datetime import date, timedelta
+
+import common
+
+import analytics
+import database
+import db_pool
+
+USER = 1
+REPEATS = 20
+END = date(2026, 6, 30)
+
+
+def _seed(days):
+    random.seed(1)
+    database.save_custom_field(USER, "Сон", "int")
+    dates = [END - timedelta(days=i) for i in range(days)]
+    # Пропуски как у живого пользователя: примерно каждый десятый день не заполнен
+    logged = [d.isoformat() for d in dates if random.random() < 0.9]
+    conn = db_pool.get_connection()
+    conn.executemany(
+        "INSERT INTO daily_logs (user_id, date, water, cigarettes, expenses, income, mood, energy) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (USER, day, random.randrange(500, 3000), random.randrange(0, 15), random.randrange(0, 5000),
+             random.choice((0, 0, 0, 50000)), random.randrange(1, 11), random.randrange(1, 11))
+            for day in logged
+        ]
+    )
+    conn.executemany(
+        "INSERT INTO daily_custom_values (user_id, date, field_name, value) VALUES (?, ?, 'Сон', ?)",
+        [(USER, day, random.randrange(4, 10)) for day in logged]
+    )
+    conn.executemany(
+        "INSERT INTO nutrition_logs (user_id, date, meal_name, product_name, weight_grams, "
+        "calories, protein, fat, carbs) VALUES (?, ?, 'Обед', 'Гречка', 150, ?, ?, ?, ?)",
+        [
+            (USER, day, random.uniform(100, 900), random.uniform(5, 40), random.uniform(2, 30), random.uniform(10, 90))
+            for day in logged for _ in range(3)
+        ]
+    )
+    conn.commit()
+    return len(logged)
+
+
+# === НАИВНЫЙ ВАРИАНТ: цикл по строкам ===
+def _naive_load(conn, start, end):
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    by_day = {name: {} for name in analytics.METRICS}
+    bounds = (USER, start.isoformat(), end.isoformat())
+    for row in conn.execute(f"""
+        SELECT date, {", ".join(analytics.DAY_METRICS)} FROM daily_logs
+        WHERE user_id = ? AND date BETWEEN ? AND ?
+    """, bounds):
+        for name, value in zip(analytics.DAY_METRICS, row[1:]):
+            if isinstance(value, (int, float)):
+                by_day[name][row[0]] = float(value)
+    for row in conn.execute(f"""
+        SELECT date, {", ".join(analytics.NUTRITION_METRICS)} FROM nutrition_logs
+        WHERE user_id = ? AND date BETWEEN ? AND ?
+    """, bounds):
+        for name, value in zip(analytics.NUTRITION_METRICS, row[1:]):
+            if value is not None:
+                by_day[name][row[0]] = by_day[name].get(row[0], 0.0) + value
+    for day, name, value in conn.execute("""
+        SELECT date, field_name, value FROM daily_custom_values
+        WHERE user_id = ? AND date BETWEEN ? AND ?
+    """, bounds):
+        if name.strip().lower() in analytics.SLEEP_FIELDS and isinstance(value, (int, float)):
+            by_day["sleep"][day] = max(by_day["sleep"].get(day, value), value)
+    return days, {name: [values.get(d.isoformat()) for d in days] for name, values in by_day.items()}
+
+
+def _naive_mean(values):
+    present = [v for v in values if v is not None]
+    return sum(present) / len(present) if present else None
+
+
+def _naive_groups(days, values, key):
+    groups = {}
+    for day, value in zip(days, values):
+        groups.setdefault(key(day), []).append(value)
+    return [(label, _naive_mean(group)) for label, group in groups.items()]
+
+
+def _naive_correlation(x, y):
+    pairs = [(a, b) for a, b in zip(x, y) if a is not None and b is not None]
+    if len(pairs) < analytics.MIN_PAIRS:
+        return None, len(pairs)
+    mx = sum(a for a, _ in pairs) / len(pairs)
+    my = sum(b for _, b in pairs) / len(pairs)
+    sxy = sum((a - mx) * (b - my) for a, b in pairs)
+    sxx = sum((a - mx) ** 2 for a, _ in pairs)
+    syy = sum((b - my) ** 2 for _, b in pairs)
+    if sxx == 0 or syy == 0:
+        return None, len(pairs)
+    return sxy / math.sqrt(sxx * syy), len(pairs)
+
+
+def naive_trends(days_count, today):
+    start = today - timedelta(days=days_count - 1)
+    with db_pool.get_connection() as conn:
+        days, columns = _naive_load(conn, start, today)
+    present = {name: values for name, values in columns.items() if any(v is not None for v in values)}
+    averages, weekly, monthly = {}, {}, {}
+    for name, values in present.items():
+        averages[name] = {
+            "week": _naive_mean(values[-7:]),
+            "prev_week": _naive_mean(values[-14:-7]) if len(values) > 7 else None,
+            "month": _naive_mean(values[-30:]),
+            "total": _naive_mean(values),
+        }
+        weekly[name] = _naive_groups(days, values, lambda d: (d - timedelta(days=d.weekday())).isoformat())
+        monthly[name] = _naive_groups(days, values, lambda d: d.strftime("%Y-%m"))
+    correlations = [
+        (x, y, *_naive_correlation(present[x], present[y]))
+        for x, y in analytics.CORRELATIONS if x in present and y in present
+    ]
+    return {"averages": averages, "weekly": weekly, "monthly": monthly, "correlations": correlations}
+
+
+def _rounded(value):
+    if isinstance(value, float):
+        return round(value, 4)
+    if isinstance(value, dict):
+        return {k: _rounded(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_rounded(v) for v in value]
+    return value
+
+
+def _measure(func):
+    func()
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main(years):
+    common.temp_db()
+    days = years * 365
+    logged = _seed(days)
+    print(f"дней в периоде: {days}, заполнено: {logged}, строк питания: {logged * 3}")
+
+    vectorized = analytics.compute_trends(USER, days, today=END)
+    naive = naive_trends(days, END)
+    same = all(_rounded(vectorized[key]) == _rounded(naive[key]) for key in naive)
+    print(f"результаты совпадают до 4 знаков: {'да' if same else 'НЕТ'}")
+
+    def load_only():
+        with db_pool.get_connection() as conn:
+            analytics.load_series(conn, USER, END - timedelta(days=days - 1), END)
+
+    common.print_latency("NumPy: загрузка рядов", _measure(load_only))
+    common.print_latency("NumPy: compute_trends", _measure(lambda: analytics.compute_trends(USER, days, today=END)))
+    common.print_latency("Python: цикл по строкам", _measure(lambda: naive_trends(days, END)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Векторные тренды против цикла на Python")
+    parser.add_argument("--years", type=int, default=5, help="за сколько лет данные")
+    main(parser.parse_args().years)
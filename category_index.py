@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+from db_async import get_finance_categories, add_finance_category
+
+# Сколько пар (пользователь, тип) держать в памяти
+CACHE_SIZE = 10000
+
+
+# === ИНДЕКС КАТЕГОРИЙ ФИНАНСОВ ===
+class CategoryIndex:
+    """
+    Кэш категорий пользователя по типу ('expense'/'income'):
+    список для показа, id → название и название в нижнем регистре → id.
+    Первый запрос читает базу, дальше поиск категории — словарь, без запросов.
+    Добавление категории возвращает id сразу (lastrowid) и дописывает его в индекс.
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (user_id, type) -> {"list", "by_id", "by_name"}
+
+    async def get(self, user_id, type_):
+        """
+        Категории [(id, название)] в порядке создания.
+        """
+        return list((await self._load(user_id, type_))["list"])
+
+    async def resolve(self, user_id, type_, text):
+        """
+        id категории по номеру или названию (без учёта регистра), иначе None.
+        """
+        entry = await self._load(user_id, type_)
+        text = text.strip()
+        if text.isdigit() and int(text) in entry["by_id"]:
+            return int(text)
+        return entry["by_name"].get(text.lower())
+
+    async def add(self, user_id, type_, name):
+        category_id = await add_finance_category(user_id, name, type_)
+        entry = self._entries.get((user_id, type_))
+        if entry:
+            self._index(entry, category_id, name)
+        return category_id
+
+    def invalidate(self, user_id, type_=None):
+        for key in [k for k in self._entries if k[0] == user_id and type_ in (None, k[1])]:
+            del self._entries[key]
+
+    async def _load(self, user_id, type_):
+        key = (user_id, type_)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = {"list": [], "by_id": {}, "by_name": {}}
+            for category_id, name in await get_finance_categories(user_id, type_):
+                self._index(entry, category_id, name)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._entries.move_to_end(key)
+        return entry
+
+    @staticmethod
+    def _index(entry, category_id, name):
+        entry["list"].append((category_id, name))
+        entry["by_id"][category_id] = name
+        entry["by_name"].setdefault(name.lower(), category_id)
+
+
+category_index = CategoryIndex()
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+
+# Сколько графиков (пользователь × тип × период) помнить
+CACHE_SIZE = 5000
+
+
+# === КЭШ ОТПРАВЛЕННЫХ ГРАФИКОВ ===
+class ChartCache:
+    """
+    LRU {(user_id, тип графика, начало, конец): (версия данных, file_id)}.
+    Картинка уже лежит на серверах Telegram, поэтому хранится только file_id:
+    пока версия данных пользователя (database.get_data_version) не сменилась,
+    тот же график отправляется повторно без рендера и загрузки.
+    Используется только из цикла событий, замок не нужен.
+    Версия данных считается в процессе (summary_cache), поэтому при записи
+    из нескольких процессов кэш выключают (disable), как и summary_cache.
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self.enabled = True
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, version):
+        if not self.enabled:
+            self.misses += 1
+            return None
+        entry = self._entries.get(key)
+        if entry and entry[0] == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, key, version, file_id):
+        if not self.enabled:
+            return
+        self._entries[key] = (version, file_id)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def disable(self):
+        self.enabled = False
+        self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "charts": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+chart_cache = ChartCache()
@@ -0,0 +1,106 @@
+import io
+import math
+from datetime import date, timedelta
+
+# Размер картинки в дюймах и плотность: 1000×(высота) px — читается на телефоне
+CHART_WIDTH = 10
+CHART_DPI = 100
+
+EXPENSE_COLOR = "#d9534f"
+INCOME_COLOR = "#5cb85c"
+
+
+# === ДАННЫЕ ДЛЯ ГРАФИКОВ ===
+# Ряды — простые списки (None там, где записи нет), чтобы их можно было передать в процесс.
+
+def _days(start, end):
+    # end может быть «2025-02-31» (конец месяца в /month) или в будущем — до сегодня
+    day, last = date.fromisoformat(start), min(end, date.today().isoformat())
+    days = []
+    while day.isoformat() <= last:
+        days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+
+def day_series(start, end, rows, summaries):
+    """
+    Ряды для /week и /month из get_daily_report: вода, настроение, энергия, калории, расходы.
+    """
+    logs = {row[0]: row for row in rows}
+    days = _days(start, end)
+    series = {"days": days}
+    for name, index in (("water", 1), ("expenses", 4), ("mood", 6), ("energy", 7)):
+        series[name] = [_number(logs[day][index]) if day in logs else None for day in days]
+    series["calories"] = [summaries[day]["calories"] if day in summaries else None for day in days]
+    return series
+
+
+def finance_series(start, end, totals):
+    """
+    Ряды для /баланс из get_finance_daily_totals: расходы и доходы по дням.
+    """
+    days = _days(start, end)
+    by_day = {(day, type_): total for day, type_, total in totals}
+    return {
+        "days": days,
+        "expense": [by_day.get((day, "expense"), 0) for day in days],
+        "income": [by_day.get((day, "income"), 0) for day in days],
+    }
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) else None
+
+
+# === РЕНДЕР (в отдельном процессе, см. db_async.render_chart) ===
+def render_chart(chart_type, title, series):
+    """
+    PNG-картинка графика: chart_type "days" (series из day_series) или "finance" (finance_series).
+    """
+    # matplotlib импортируется только в процессах пула: основной процесс его не грузит,
+    # а повторные рендеры в том же процессе не платят за импорт
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    days = series["days"]
+    x = range(len(days))
+
+    def values(name):
+        return [math.nan if v is None else v for v in series[name]]
+
+    if chart_type == "finance":
+        fig, axes = plt.subplots(1, 1, figsize=(CHART_WIDTH, 4))
+        axes = [axes]
+        width = 0.4
+        axes[0].bar([i - width / 2 for i in x], values("expense"), width, color=EXPENSE_COLOR, label="Расходы")
+        axes[0].bar([i + width / 2 for i in x], values("income"), width, color=INCOME_COLOR, label="Доходы")
+        axes[0].set_ylabel("₽")
+        axes[0].legend(loc="upper left")
+    else:
+        fig, axes = plt.subplots(4, 1, figsize=(CHART_WIDTH, 10), sharex=True)
+        axes[0].bar(x, values("water"), color="#5bc0de")
+        axes[0].set_ylabel("Вода, мл")
+        axes[1].plot(x, values("mood"), marker="o", label="Настроение")
+        axes[1].plot(x, values("energy"), marker="s", label="Энергия")
+        axes[1].set_ylabel("Баллы")
+        axes[1].legend(loc="upper left")
+        axes[2].bar(x, values("calories"), color="#f0ad4e")
+        axes[2].set_ylabel("Ккал")
+        axes[3].bar(x, values("expenses"), color=EXPENSE_COLOR)
+        axes[3].set_ylabel("Расходы, ₽")
+
+    # Подписи дат: не больше ~15 на оси, чтобы месяц не слипался
+    step = max(1, math.ceil(len(days) / 15))
+    axes[-1].set_xticks(list(x)[::step])
+    axes[-1].set_xticklabels([f"{d[8:10]}.{d[5:7]}" for d in days[::step]], rotation=45)
+    for ax in axes:
+        ax.grid(axis="y", alpha=0.3)
+    axes[0].set_title(title)
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=CHART_DPI)
+    plt.close(fig)
+    return buffer.getvalue()
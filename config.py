@@ -10,6 +10,29 @@ TOKEN = os.getenv("BOT_TOKEN")
 OWNER_ID = int(os.getenv("OWNER_ID"))
 GROUP_CHAT_ID = int(os.getenv("GROUP_CHAT_ID"))
 
+# 🧠 Где хранить состояния FSM: "sqlite" (fsm.db, переживает перезапуск) или "memory"
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+# Несколько процессов бота без маршрутизации апдейтов по user_id: "1" — состояния
+# читаются и пишутся мимо кэша процесса, кэши сводок и графиков выключены
+# (медленнее, но без устаревших чтений)
+FSM_SHARED = os.getenv("FSM_SHARED", "0") == "1"
+
+# 🌐 Режим получения апдейтов: "polling" (по умолчанию) или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+
+# 🧵 Параллельная обработка апдейтов: число шардов по user_id и глубина очереди шарда
+UPDATE_SHARDS = int(os.getenv("UPDATE_SHARDS", "8"))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "100"))
+
+# 📊 Метрики в формате Prometheus на локальном порту (пусто — эндпоинт выключен)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT") or 0)
+
 # ⚙️ aiogram 3.7+ поддерживает только default=
 bot = Bot(
     token=TOKEN,
@@ -1,15 +1,15 @@
-import sqlite3
 import json
-import os
-import zipfile
-from datetime import datetime, date
-from openpyxl import Workbook
+from datetime import datetime, date, timedelta
 
-DB_PATH = "habits.db"
+import habit_stats
+from backup import BACKUP_DIR, create_backup
+from db_pool import DB_PATH, get_connection
+from migrations import apply_migrations
+from summary_cache import summary_cache
 
 # === ИНИЦИАЛИЗАЦИЯ БАЗЫ ДАННЫХ ===
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         c = conn.cursor()
 
         # Напоминания по времени (один на пользователя)
@@ -40,16 +40,49 @@ def init_db():
             )
         """)
 
-        # Сутевые логи: всё, что вводится по команде /день
+        # Серии выполнения привычек (см. habit_stats.py)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS habit_streaks (
+                user_id INTEGER,
+                habit_name TEXT,
+                repeat TEXT,
+                first_period TEXT,
+                last_period TEXT,
+                current_streak INTEGER NOT NULL DEFAULT 0,
+                best_streak INTEGER NOT NULL DEFAULT 0,
+                periods_done INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, habit_name)
+            ) WITHOUT ROWID
+        """)
+
+        # Сутевые логи: всё, что вводится по команде /день (по колонке на метрику)
         c.execute("""
             CREATE TABLE IF NOT EXISTS daily_logs (
                 user_id INTEGER,
                 date TEXT,
-                data TEXT,
+                water REAL,
+                cigarettes INTEGER,
+                exercise TEXT,
+                expenses REAL,
+                income REAL,
+                mood INTEGER,
+                energy INTEGER,
+                thoughts TEXT,
                 PRIMARY KEY (user_id, date)
             )
         """)
 
+        # Значения кастомных полей за день (ключ-значение)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS daily_custom_values (
+                user_id INTEGER,
+                date TEXT,
+                field_name TEXT,
+                value,
+                PRIMARY KEY (user_id, date, field_name)
+            ) WITHOUT ROWID
+        """)
+
         # Кастомные поля (определяются пользователем)
         c.execute("""
             CREATE TABLE IF NOT EXISTS custom_fields (
@@ -60,6 +93,23 @@ def init_db():
             )
         """)
 
+        # Суммы питания по дням: считаются один раз и сбрасываются при записи в этот день
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS daily_summaries (
+                user_id INTEGER,
+                date TEXT,
+                entries INTEGER NOT NULL,
+                calories REAL,
+                protein REAL,
+                fat REAL,
+                carbs REAL,
+                salt REAL,
+                sugar REAL,
+                fiber REAL,
+                PRIMARY KEY (user_id, date)
+            ) WITHOUT ROWID
+        """)
+
         # Питание: каждый продукт, по каждому приёму пищи
         c.execute("""
             CREATE TABLE IF NOT EXISTS nutrition_logs (
@@ -79,11 +129,95 @@ def init_db():
             )
         """)
 
+        # Справочник продуктов (общий для всех пользователей)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS products (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                calories REAL,
+                protein REAL,
+                fat REAL,
+                carbs REAL,
+                salt REAL,
+                sugar REAL
+            )
+        """)
+
+        # Приёмы пищи со ссылкой на продукт
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS meals (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                date TEXT,
+                meal_name TEXT,
+                product_id INTEGER,
+                grams REAL,
+                FOREIGN KEY(product_id) REFERENCES products(id)
+            )
+        """)
+
+        # Как часто пользователь ест продукт (ранжирование поиска продуктов)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS product_usage (
+                user_id INTEGER,
+                product_id INTEGER,
+                uses INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, product_id)
+            ) WITHOUT ROWID
+        """)
+
+        # Категории финансов
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS finance_categories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                name TEXT,
+                type TEXT  -- 'expense' или 'income'
+            )
+        """)
+
+        # Финансовые операции
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS finance_operations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                date TEXT,
+                category_id INTEGER,
+                amount REAL,
+                type TEXT,  -- 'expense' или 'income'
+                FOREIGN KEY(category_id) REFERENCES finance_categories(id)
+            )
+        """)
+
+        # Итоги по финансам: пользователь × день × категория (обновляются при каждой операции).
+        # Ключ WITHOUT ROWID не допускает NULL: операции без категории идут под category_id = 0
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS finance_daily_rollups (
+                user_id INTEGER,
+                date TEXT,
+                category_id INTEGER,
+                type TEXT,
+                total REAL NOT NULL DEFAULT 0,
+                ops INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, date, category_id, type)
+            ) WITHOUT ROWID
+        """)
+
         conn.commit()
 
+        # Индексы и прочие изменения схемы поверх базовых таблиц
+        apply_migrations(conn)
+
 # === ДОБАВЛЕНИЕ И СОХРАНЕНИЕ ДАННЫХ ===
+def _touch_day(conn, user_id, day):
+    """
+    Запись в день сбрасывает его сводку: в таблице — в той же транзакции,
+    в памяти — после commit (см. SummaryCache).
+    """
+    conn.execute("DELETE FROM daily_summaries WHERE user_id = ? AND date = ?", (user_id, day))
+
 def save_habit(user_id, habit_name, data):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         conn.execute("""
             INSERT OR REPLACE INTO habits (user_id, habit_name, data)
             VALUES (?, ?, ?)
@@ -91,24 +225,64 @@ def save_habit(user_id, habit_name, data):
         conn.commit()
 
 def log_habit_value(user_id, habit_name, value):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with sqlite3.connect(DB_PATH) as conn:
+    now = datetime.now()
+    with get_connection() as conn:
         conn.execute("""
             INSERT INTO habit_logs (user_id, habit_name, value, timestamp)
             VALUES (?, ?, ?, ?)
-        """, (user_id, habit_name, value, timestamp))
+        """, (user_id, habit_name, value, now.strftime("%Y-%m-%d %H:%M:%S")))
+        # Серия обновляется в той же транзакции, без чтения habit_logs
+        habit_stats.record(conn, user_id, habit_name, value, now.date())
         conn.commit()
 
+# Метрики дня, которые лежат в собственных колонках daily_logs
+DAILY_COLUMNS = ("water", "cigarettes", "exercise", "expenses", "income", "mood", "energy", "thoughts")
+# Старые ключи лога дня → колонки
+DAILY_ALIASES = {
+    "вода": "water",
+    "smoke": "cigarettes",
+    "activity": "exercise",
+}
+
+def _split_day_data(data):
+    core, custom = {}, {}
+    for key, value in data.items():
+        column = DAILY_ALIASES.get(key, key)
+        if column in DAILY_COLUMNS:
+            core[column] = value
+        elif isinstance(value, (int, float, str)) or value is None:
+            custom[key] = value
+        else:
+            custom[key] = json.dumps(value, ensure_ascii=False)
+    return core, custom
+
 def save_daily_log(user_id, date, data):
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute("""
-            INSERT OR REPLACE INTO daily_logs (user_id, date, data)
-            VALUES (?, ?, ?)
-        """, (user_id, date, json.dumps(data)))
+    """
+    Сохраняет лог дня: известные метрики — в колонки daily_logs,
+    остальное (кастомные поля) — в daily_custom_values.
+    Переданные значения дополняют уже сохранённый день, а не затирают его.
+    """
+    core, custom = _split_day_data(data)
+    with get_connection() as conn:
+        if core:
+            columns = list(core)
+            conn.execute(f"""
+                INSERT INTO daily_logs (user_id, date, {", ".join(columns)})
+                VALUES (?, ?, {", ".join("?" * len(columns))})
+                ON CONFLICT (user_id, date) DO UPDATE SET
+                    {", ".join(f"{c} = excluded.{c}" for c in columns)}
+            """, (user_id, date, *core.values()))
+        else:
+            conn.execute("INSERT OR IGNORE INTO daily_logs (user_id, date) VALUES (?, ?)", (user_id, date))
+        conn.executemany("""
+            INSERT OR REPLACE INTO daily_custom_values (user_id, date, field_name, value)
+            VALUES (?, ?, ?, ?)
+        """, [(user_id, date, name, value) for name, value in custom.items()])
         conn.commit()
+    summary_cache.invalidate(user_id, date)
 
 def save_custom_field(user_id, field_name, field_type):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         conn.execute("""
             INSERT OR REPLACE INTO custom_fields (user_id, field_name, field_type)
             VALUES (?, ?, ?)
@@ -116,111 +290,709 @@ def save_custom_field(user_id, field_name, field_type):
         conn.commit()
 
 def save_nutrition_entry(user_id, date, meal_name, product_name, grams, calories, protein, fat, carbs, salt, sugar, fiber):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         conn.execute("""
             INSERT INTO nutrition_logs (
                 user_id, date, meal_name, product_name, weight_grams,
                 calories, protein, fat, carbs, salt, sugar, fiber
             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (user_id, date, meal_name, product_name, grams, calories, protein, fat, carbs, salt, sugar, fiber))
+        _touch_day(conn, user_id, date)
         conn.commit()
+    summary_cache.invalidate(user_id, date)
 
-# === ПОЛУЧЕНИЕ СУММАРНЫХ НУТРИЕНТОВ ===
-def get_nutrition_summary(user_id: int):
-    today = date.today().isoformat()
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT 
-                COALESCE(SUM(calories), 0),
-                COALESCE(SUM(protein), 0),
-                COALESCE(SUM(fat), 0),
-                COALESCE(SUM(carbs), 0),
-                COALESCE(SUM(salt), 0),
-                COALESCE(SUM(sugar), 0),
-                COALESCE(SUM(fiber), 0)
+def log_food(user_id, date, meal_name, product_name, grams):
+    """
+    Добавляет продукт в приём пищи одной вставкой в nutrition_logs.
+    Нутриенты берутся из справочника products (значения на 100 г);
+    если продукта там нет — запись сохраняется без них.
+    Никаких чтений-перезаписей дня: параллельные вызовы не теряют записи.
+    """
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT INTO nutrition_logs (
+                user_id, date, meal_name, product_name, weight_grams,
+                calories, protein, fat, carbs, salt, sugar
+            )
+            SELECT
+                ?, ?, ?, ?, ?,
+                p.calories * ? / 100.0,
+                p.protein * ? / 100.0,
+                p.fat * ? / 100.0,
+                p.carbs * ? / 100.0,
+                p.salt * ? / 100.0,
+                p.sugar * ? / 100.0
+            FROM (SELECT 1)
+            LEFT JOIN (
+                SELECT calories, protein, fat, carbs, salt, sugar
+                FROM products WHERE name = ? LIMIT 1
+            ) AS p
+        """, (user_id, date, meal_name, product_name, grams, *[grams] * 6, product_name))
+        conn.execute("""
+            INSERT INTO product_usage (user_id, product_id, uses)
+            SELECT ?, id, 1 FROM products WHERE name = ? ORDER BY id LIMIT 1
+            ON CONFLICT (user_id, product_id) DO UPDATE SET uses = uses + 1
+        """, (user_id, product_name))
+        _touch_day(conn, user_id, date)
+        conn.commit()
+    summary_cache.invalidate(user_id, date)
+
+def get_food_log(user_id, date):
+    """
+    Еда за день, собранная из nutrition_logs и сгруппированная по приёмам пищи:
+    {приём пищи: [(продукт, граммы, ккал), ...]} в порядке добавления.
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT meal_name, product_name, weight_grams, calories
             FROM nutrition_logs
             WHERE user_id = ? AND date = ?
-        """, (user_id, today))
-        row = cursor.fetchone()
-        return {
-            'calories': row[0],
-            'protein': row[1],
-            'fat': row[2],
-            'carbs': row[3],
-            'salt': row[4],
-            'sugar': row[5],
-            'fiber': row[6]
-        }
-
-# === ЭКСПОРТ В EXCEL ===
-def export_to_excel(user_id, output_path):
-    wb = Workbook()
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
+            ORDER BY id
+        """, (user_id, date)).fetchall()
+    meals = {}
+    for meal_name, product_name, grams, calories in rows:
+        meals.setdefault(meal_name, []).append((product_name, grams, calories))
+    return meals
 
-        # Привычки
-        c.execute("SELECT habit_name, value, timestamp FROM habit_logs WHERE user_id = ?", (user_id,))
-        habits_data = c.fetchall()
-        ws_habits = wb.active
-        ws_habits.title = "Привычки"
-        ws_habits.append(["Название", "Значение", "Время"])
-        for row in habits_data:
-            ws_habits.append(row)
-
-        # Логи дня
-        c.execute("SELECT date, data FROM daily_logs WHERE user_id = ?", (user_id,))
-        logs_data = c.fetchall()
-        ws_logs = wb.create_sheet("Логи дня")
-        ws_logs.append(["Дата", "Данные"])
-        for row in logs_data:
-            ws_logs.append([row[0], json.loads(row[1])])
-
-        # Питание
-        c.execute("""
-            SELECT date, meal_name, product_name, weight_grams, calories, protein, fat, carbs, salt, sugar, fiber
-            FROM nutrition_logs WHERE user_id = ?
-        """, (user_id,))
-        food_data = c.fetchall()
-        ws_nutrition = wb.create_sheet("Питание")
-        ws_nutrition.append([
-            "Дата", "Приём пищи", "Продукт", "Граммы", "Ккал",
-            "Белки", "Жиры", "Углеводы", "Соль", "Сахар", "Клетчатка"
-        ])
-        for row in food_data:
-            ws_nutrition.append(row)
-
-    wb.save(output_path)
+# === ПОЛУЧЕНИЕ СУММАРНЫХ НУТРИЕНТОВ ===
+NUTRIENTS = ("calories", "protein", "fat", "carbs", "salt", "sugar", "fiber")
+
+def empty_nutrition():
+    return dict.fromkeys(NUTRIENTS, 0)
+
+def get_nutrition_summary(user_id: int, day=None):
+    day = day or date.today().isoformat()
+    return get_nutrition_summary_range(user_id, day, day).get(day, empty_nutrition())
+
+def get_nutrition_summary_range(user_id: int, start, end):
+    """
+    Суммы нутриентов по каждому дню периода [start, end].
+    Возвращает {дата: {'calories': ..., 'protein': ..., ...}};
+    дней без записей в словаре нет — для них брать empty_nutrition().
+    """
+    return {
+        day: nutrition
+        for day, (_, nutrition) in get_day_summaries(user_id, start, end).items()
+        if nutrition
+    }
+
+def _date_range(start, end):
+    # end может быть «2025-02-31» (конец месяца в /month) — сравниваем строки
+    day = date.fromisoformat(start)
+    while day.isoformat() <= end:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+def _nutrition_summaries(conn, user_id, days):
+    """
+    Суммы питания по дням из daily_summaries. Дни, которых там нет,
+    считаются по nutrition_logs обычным чтением (без блокировки записи) и сохраняются.
+    Записи питания только добавляются, поэтому их число за день — версия дня:
+    сумма сохраняется, только если к моменту вставки число не изменилось,
+    иначе её пересчитает следующее чтение. Будущие дни не сохраняются.
+    """
+    if not days:
+        return {}
+    lo, hi = min(days), max(days)
+    result = {}
+    for row in conn.execute(f"""
+        SELECT date, entries, {", ".join(NUTRIENTS)} FROM daily_summaries
+        WHERE user_id = ? AND date BETWEEN ? AND ?
+    """, (user_id, lo, hi)):
+        result[row[0]] = row[1:]
+    missing = [day for day in days if day not in result]
+    if not missing:
+        return result
+
+    fresh = {day: (0, *[0] * len(NUTRIENTS)) for day in missing}
+    for row in conn.execute(f"""
+        SELECT date, COUNT(*), {", ".join(f"COALESCE(SUM({n}), 0)" for n in NUTRIENTS)}
+        FROM nutrition_logs
+        WHERE user_id = ? AND date IN ({", ".join("?" * len(missing))})
+        GROUP BY date
+    """, (user_id, *missing)):
+        fresh[row[0]] = row[1:]
+
+    today = date.today().isoformat()
+    rows = [(user_id, day, *values, user_id, day, values[0]) for day, values in fresh.items() if day <= today]
+    if rows:
+        # Блокировка записи берётся только на эти вставки; проверка числа записей — под ней
+        with conn:
+            conn.executemany(f"""
+                INSERT OR IGNORE INTO daily_summaries (user_id, date, entries, {", ".join(NUTRIENTS)})
+                SELECT ?, ?, ?, {", ".join("?" * len(NUTRIENTS))}
+                WHERE (SELECT COUNT(*) FROM nutrition_logs WHERE user_id = ? AND date = ?) = ?
+            """, rows)
+    result.update(fresh)
+    return result
+
+def get_day_summaries(user_id, start, end):
+    """
+    Сводки по каждому дню периода [start, end]: {дата: (лог дня, питание)}.
+    Лог — строка как у get_daily_logs или None, питание — словарь или None,
+    если в этот день ничего не записано.
+    Сначала смотрит в summary_cache; базу читает только для недостающих дней,
+    а суммы питания берёт из daily_summaries.
+    """
+    days = list(_date_range(start, end))
+    found, missing = summary_cache.get_many(user_id, days)
+    if missing:
+        version = summary_cache.version(user_id)
+        lo, hi = missing[0], missing[-1]
+        with get_connection() as conn:
+            logs = {
+                row[0]: row for row in conn.execute("""
+                    SELECT date, water, cigarettes, exercise, expenses, income, mood, energy, thoughts
+                    FROM daily_logs
+                    WHERE user_id = ? AND date BETWEEN ? AND ?
+                """, (user_id, lo, hi))
+            }
+            custom = _get_custom_values(conn, user_id, lo, hi) if logs else {}
+            nutrition = _nutrition_summaries(conn, user_id, missing)
+        loaded = {}
+        for day in missing:
+            log = logs.get(day)
+            values = nutrition[day]
+            loaded[day] = (
+                log + (custom.get(day, {}),) if log else None,
+                dict(zip(NUTRIENTS, values[1:])) if values[0] else None,
+            )
+        summary_cache.put_many(user_id, loaded, version)
+        found.update(loaded)
+    return found
+
+def get_daily_report(user_id, start, end):
+    """
+    То же, что get_daily_logs(start, end) + get_nutrition_summary_range,
+    но через кэш сводок: повторный отчёт за тот же период не ходит в базу.
+    Возвращает (строки логов новые сверху, {дата: питание}).
+    """
+    days = get_day_summaries(user_id, start, end)
+    rows = [days[day][0] for day in sorted(days, reverse=True) if days[day][0]]
+    summaries = {day: nutrition for day, (_, nutrition) in days.items() if nutrition}
+    return rows, summaries
+
+def get_data_version(user_id):
+    """
+    Версия данных пользователя для кэша графиков: меняется при любой записи в день
+    (счётчик summary_cache) и при новой финансовой операции (операции только добавляются).
+    """
+    with get_connection() as conn:
+        last_operation = conn.execute(
+            "SELECT MAX(id) FROM finance_operations WHERE user_id = ?", (user_id,)
+        ).fetchone()[0]
+    return summary_cache.version(user_id), last_operation or 0
 
 # === РЕЗЕРВНАЯ КОПИЯ ===
-def backup_database(zip_name="backup.zip"):
-    with zipfile.ZipFile(zip_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        zipf.write(DB_PATH)
+def backup_database(backup_dir=BACKUP_DIR):
+    """
+    Инкрементальный снимок базы (см. backup.py). Возвращает отчёт create_backup.
+    """
+    return create_backup(DB_PATH, backup_dir)
 
 # === ЗАГРУЗКА ПОЛЕЙ И ДАННЫХ ===
 def get_custom_fields(user_id):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         c = conn.cursor()
         c.execute("SELECT field_name, field_type FROM custom_fields WHERE user_id = ?", (user_id,))
         return c.fetchall()
 
 def get_daily_log(user_id, date):
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("SELECT data FROM daily_logs WHERE user_id = ? AND date = ?", (user_id, date))
-        row = c.fetchone()
-        return json.loads(row[0]) if row else {}
+    """
+    Лог за один день: {метрика: значение} + значения кастомных полей.
+    """
+    with get_connection() as conn:
+        row = conn.execute(f"""
+            SELECT {", ".join(DAILY_COLUMNS)} FROM daily_logs
+            WHERE user_id = ? AND date = ?
+        """, (user_id, date)).fetchone()
+        if not row:
+            return {}
+        data = {name: value for name, value in zip(DAILY_COLUMNS, row) if value is not None}
+        data.update(_get_custom_values(conn, user_id, date, date).get(date, {}))
+        return data
 
 def get_latest_water_log(user_id):
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("""
-            SELECT data FROM daily_logs
+    with get_connection() as conn:
+        row = conn.execute("""
+            SELECT water FROM daily_logs
             WHERE user_id = ?
             ORDER BY date DESC LIMIT 1
-        """, (user_id,))
-        row = c.fetchone()
-        if row:
-            data = json.loads(row[0])
-            return data.get("вода")
-        return None
\ No newline at end of file
+        """, (user_id,)).fetchone()
+        return row[0] if row else None
+
+def _get_custom_values(conn, user_id, start, end):
+    rows = conn.execute("""
+        SELECT date, field_name, value FROM daily_custom_values
+        WHERE user_id = ? AND date BETWEEN ? AND ?
+    """, (user_id, start, end)).fetchall()
+    result = {}
+    for day, name, value in rows:
+        result.setdefault(day, {})[name] = value
+    return result
+
+def get_daily_logs(user_id, start=None, end=None, limit=None):
+    """
+    Логи дня пользователя (новые сверху), опционально за период [start, end]
+    и/или не больше limit записей. Последний элемент каждой строки —
+    словарь значений кастомных полей за этот день.
+    """
+    query = """
+        SELECT date, water, cigarettes, exercise, expenses, income, mood, energy, thoughts
+        FROM daily_logs
+        WHERE user_id = ?
+    """
+    params = [user_id]
+    if start:
+        query += " AND date >= ?"
+        params.append(start)
+    if end:
+        query += " AND date <= ?"
+        params.append(end)
+    query += " ORDER BY date DESC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    with get_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+        if not rows:
+            return []
+        custom = _get_custom_values(conn, user_id, rows[-1][0], rows[0][0])
+    return [row + (custom.get(row[0], {}),) for row in rows]
+
+def get_daily_aggregates(user_id, start, end):
+    """
+    Итоги по логам дня за период [start, end], посчитанные в SQL.
+    """
+    with get_connection() as conn:
+        row = conn.execute("""
+            SELECT
+                COUNT(*),
+                COALESCE(SUM(water), 0),
+                AVG(water),
+                COALESCE(SUM(cigarettes), 0),
+                AVG(mood),
+                AVG(energy),
+                COALESCE(SUM(expenses), 0),
+                COALESCE(SUM(income), 0)
+            FROM daily_logs
+            WHERE user_id = ? AND date BETWEEN ? AND ?
+        """, (user_id, start, end)).fetchone()
+    return dict(zip(
+        ("days", "water_total", "water_avg", "cigarettes_total",
+         "mood_avg", "energy_avg", "expenses_total", "income_total"),
+        row
+    ))
+
+# === ПРИВЫЧКИ ===
+def load_habits(user_id):
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT habit_name, data FROM habits WHERE user_id = ?", (user_id,)
+        ).fetchall()
+    return {name: json.loads(data) for name, data in rows}
+
+def delete_habit(user_id, habit_name):
+    with get_connection() as conn:
+        conn.execute("DELETE FROM habits WHERE user_id = ? AND habit_name = ?", (user_id, habit_name))
+        conn.execute("DELETE FROM habit_streaks WHERE user_id = ? AND habit_name = ?", (user_id, habit_name))
+        conn.commit()
+
+def get_habit_streaks(user_id):
+    """
+    Серии по привычкам пользователя из habit_streaks: {название: отчёт habit_stats.summarize}.
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT habit_name, repeat, first_period, last_period, current_streak, best_streak, periods_done
+            FROM habit_streaks WHERE user_id = ?
+            ORDER BY habit_name
+        """, (user_id,)).fetchall()
+    today = date.today()
+    return {row[0]: habit_stats.summarize(row[1:], today) for row in rows}
+
+def rebuild_habit_streaks(user_id=None):
+    """
+    Пересчёт серий по habit_logs (заполнение задним числом). Возвращает число привычек.
+    """
+    with get_connection() as conn:
+        count = habit_stats.rebuild(conn, user_id)
+        conn.commit()
+    return count
+
+# === КАСТОМНЫЕ ПОЛЯ ===
+def delete_custom_field(user_id, field_name):
+    with get_connection() as conn:
+        conn.execute("DELETE FROM custom_fields WHERE user_id = ? AND field_name = ?", (user_id, field_name))
+        conn.commit()
+
+# === НАПОМИНАНИЯ ===
+def set_reminder(user_id, time):
+    with get_connection() as conn:
+        conn.execute("INSERT OR REPLACE INTO reminders (user_id, time) VALUES (?, ?)", (user_id, time))
+        conn.commit()
+
+def delete_reminder(user_id):
+    with get_connection() as conn:
+        conn.execute("DELETE FROM reminders WHERE user_id = ?", (user_id,))
+        conn.commit()
+
+def get_all_reminders():
+    with get_connection() as conn:
+        return conn.execute("SELECT user_id, time FROM reminders").fetchall()
+
+# === ПРОДУКТЫ И ПРИЁМЫ ПИЩИ ===
+def get_products():
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT id, name, calories, protein, fat, carbs, salt, sugar FROM products ORDER BY name"
+        ).fetchall()
+
+def get_product_by_name(name):
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT id, name, calories, protein, fat, carbs, salt, sugar FROM products WHERE name = ?",
+            (name,)
+        ).fetchone()
+
+def add_product(name, calories, protein, fat, carbs, salt, sugar):
+    with get_connection() as conn:
+        cur = conn.execute("""
+            INSERT INTO products (name, calories, protein, fat, carbs, salt, sugar)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (name, calories, protein, fat, carbs, salt, sugar))
+        conn.commit()
+        return cur.lastrowid
+
+def update_product(product_id, calories, protein, fat, carbs, salt, sugar):
+    with get_connection() as conn:
+        conn.execute("""
+            UPDATE products
+            SET calories = ?, protein = ?, fat = ?, carbs = ?, salt = ?, sugar = ?
+            WHERE id = ?
+        """, (calories, protein, fat, carbs, salt, sugar, product_id))
+        conn.commit()
+
+def delete_product(product_id):
+    with get_connection() as conn:
+        conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
+        conn.execute("DELETE FROM product_usage WHERE product_id = ?", (product_id,))
+        conn.commit()
+
+def add_meal(user_id, date, meal_name, product_id, grams):
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT INTO meals (user_id, date, meal_name, product_id, grams)
+            VALUES (?, ?, ?, ?, ?)
+        """, (user_id, date, meal_name, product_id, grams))
+        conn.execute("""
+            INSERT INTO product_usage (user_id, product_id, uses) VALUES (?, ?, 1)
+            ON CONFLICT (user_id, product_id) DO UPDATE SET uses = uses + 1
+        """, (user_id, product_id))
+        _touch_day(conn, user_id, date)
+        conn.commit()
+    summary_cache.invalidate(user_id, date)
+
+# === ПОИСК ПРОДУКТОВ ===
+# Индекс products_fts (FTS5, триграммы) ведут триггеры на products — см. migrations.py
+SEARCH_LIMIT = 10
+# Сколько кандидатов брать из базы перед ранжированием
+SEARCH_CANDIDATES = 200
+# Какая доля триграмм запроса должна совпасть для нечёткого совпадения
+FUZZY_THRESHOLD = 0.5
+
+_PRODUCT_SEARCH_SQL = """
+    SELECT p.id, p.name, p.calories, p.protein, p.fat, p.carbs, p.salt, p.sugar,
+           COALESCE(u.uses, 0)
+    FROM {source}
+    LEFT JOIN product_usage u ON u.user_id = ? AND u.product_id = p.id
+    WHERE {where}
+    ORDER BY {order}
+    LIMIT ?
+"""
+_FTS_SOURCE = "products_fts f JOIN products p ON p.id = f.rowid"
+
+_products_fts = None
+
+def _has_products_fts(conn):
+    global _products_fts
+    if _products_fts is None:
+        _products_fts = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+        ).fetchone() is not None
+    return _products_fts
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+def search_products(query, user_id=None, limit=SEARCH_LIMIT):
+    """
+    Ищет продукты по началу названия, подстроке и с опечатками.
+    Сначала идут совпадения по началу, затем по подстроке, затем нечёткие;
+    внутри группы — чем чаще пользователь ел продукт, тем выше.
+    Пустой запрос возвращает самые частые продукты пользователя.
+    Строки как у get_products: (id, name, calories, protein, fat, carbs, salt, sugar).
+    """
+    query = query.strip()
+    q = query.lower()
+    with get_connection() as conn:
+        if not q:
+            rows = conn.execute(
+                _PRODUCT_SEARCH_SQL.format(source="products p", where="1", order="9 DESC, p.name"),
+                (user_id, limit)
+            ).fetchall()
+            return [row[:8] for row in rows]
+
+        if len(q) < 3:
+            # Триграмм ещё нет — диапазон по индексу idx_products_name для вариантов регистра
+            variants = sorted({query, q, q.capitalize(), q.upper()})
+            where = " OR ".join(["(p.name >= ? AND p.name < ?)"] * len(variants))
+            params = [bound for v in variants for bound in (v, v + "\U0010ffff")]
+            rows = conn.execute(
+                _PRODUCT_SEARCH_SQL.format(source="products p", where=where, order="9 DESC, p.name"),
+                (user_id, *params, SEARCH_CANDIDATES)
+            ).fetchall()
+        elif _has_products_fts(conn):
+            rows = conn.execute(
+                _PRODUCT_SEARCH_SQL.format(source=_FTS_SOURCE, where="products_fts MATCH ?", order="9 DESC, p.name"),
+                (user_id, _fts_phrase(q), SEARCH_CANDIDATES)
+            ).fetchall()
+            if not rows:
+                # Подстроки нет (скорее всего опечатка) — кандидаты по любой общей триграмме
+                fuzzy = " OR ".join(_fts_phrase(t) for t in sorted(_trigrams(q)))
+                rows = conn.execute(
+                    _PRODUCT_SEARCH_SQL.format(source=_FTS_SOURCE, where="products_fts MATCH ?", order="f.rank"),
+                    (user_id, fuzzy, SEARCH_CANDIDATES)
+                ).fetchall()
+        else:
+            # SQLite без FTS5: подстрока через LIKE (без учёта регистра только для латиницы)
+            rows = conn.execute(
+                _PRODUCT_SEARCH_SQL.format(source="products p", where="p.name LIKE ?", order="9 DESC, p.name"),
+                (user_id, f"%{query}%", SEARCH_CANDIDATES)
+            ).fetchall()
+
+    grams = _trigrams(q)
+    ranked = []
+    for row in rows:
+        name = row[1].lower()
+        if name.startswith(q):
+            group, similarity = 0, 1.0
+        elif q in name:
+            group, similarity = 1, 1.0
+        else:
+            similarity = len(grams & _trigrams(name)) / len(grams) if grams else 0.0
+            if similarity < FUZZY_THRESHOLD:
+                continue
+            group = 2
+        ranked.append((group, -row[8], -similarity, row[1], row[:8]))
+    ranked.sort(key=lambda r: r[:4])
+    return [r[4] for r in ranked[:limit]]
+
+# === СТРАНИЦЫ ДЛЯ ВЫБОРА ИЗ СПИСКА (keyset-пагинация) ===
+PAGE_SIZE = 8
+
+def _keyset_page(table, label, scope, params, after_id, before_id, limit):
+    """
+    Страница (rowid, label) в порядке (label, rowid) после after_id или перед before_id.
+    Курсор — только rowid крайней строки: её позиция берётся подзапросом,
+    OFFSET не нужен, и страница стоит одинаково на любой глубине списка.
+    Возвращает (строки, есть ли ещё строки в направлении листания).
+    """
+    backward = before_id is not None
+    cursor_id = before_id if backward else after_id
+    sql = f"SELECT rowid, {label} FROM {table} WHERE {scope}"
+    args = list(params)
+    if cursor_id is not None:
+        sql += f" AND ({label}, rowid) {'<' if backward else '>'} (SELECT {label}, rowid FROM {table} WHERE rowid = ?)"
+        args.append(cursor_id)
+    order = "DESC" if backward else "ASC"
+    sql += f" ORDER BY {label} {order}, rowid {order} LIMIT ?"
+    with get_connection() as conn:
+        rows = conn.execute(sql, (*args, limit + 1)).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    return rows, has_more
+
+def get_products_page(after_id=None, before_id=None, limit=PAGE_SIZE):
+    return _keyset_page("products", "name", "1", (), after_id, before_id, limit)
+
+def get_habits_page(user_id, after_id=None, before_id=None, limit=PAGE_SIZE):
+    return _keyset_page("habits", "habit_name", "user_id = ?", (user_id,), after_id, before_id, limit)
+
+def get_custom_fields_page(user_id, after_id=None, before_id=None, limit=PAGE_SIZE):
+    return _keyset_page("custom_fields", "field_name", "user_id = ?", (user_id,), after_id, before_id, limit)
+
+def get_habit_name(user_id, habit_id):
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT habit_name FROM habits WHERE user_id = ? AND rowid = ?", (user_id, habit_id)
+        ).fetchone()
+    return row[0] if row else None
+
+def get_custom_field_name(user_id, field_id):
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT field_name FROM custom_fields WHERE user_id = ? AND rowid = ?", (user_id, field_id)
+        ).fetchone()
+    return row[0] if row else None
+
+# === ФИНАНСЫ ===
+def get_finance_categories(user_id, type_):
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT id, name FROM finance_categories WHERE user_id = ? AND type = ? ORDER BY id",
+            (user_id, type_)
+        ).fetchall()
+
+def add_finance_category(user_id, name, type_):
+    """
+    Добавляет категорию и возвращает её id.
+    """
+    with get_connection() as conn:
+        cur = conn.execute(
+            "INSERT INTO finance_categories (user_id, name, type) VALUES (?, ?, ?)",
+            (user_id, name, type_)
+        )
+        conn.commit()
+        return cur.lastrowid
+
+def add_finance_operation(user_id, date, category_id, amount, type_):
+    """
+    Добавляет операцию и в той же транзакции увеличивает дневной итог по категории.
+    """
+    with get_connection() as conn:
+        cur = conn.execute("""
+            INSERT INTO finance_operations (user_id, date, category_id, amount, type)
+            VALUES (?, ?, ?, ?, ?)
+        """, (user_id, date, category_id, amount, type_))
+        conn.execute("""
+            INSERT INTO finance_daily_rollups (user_id, date, category_id, type, total, ops)
+            VALUES (?, ?, COALESCE(?, 0), ?, ?, 1)
+            ON CONFLICT (user_id, date, category_id, type) DO UPDATE SET
+                total = total + excluded.total,
+                ops = ops + 1
+        """, (user_id, date, category_id, type_, amount))
+        conn.commit()
+        return cur.lastrowid
+
+def get_finance_operations(user_id, start, end):
+    """
+    Операции за период [start, end]: (id, date, amount, category_id, type).
+    """
+    with get_connection() as conn:
+        return conn.execute("""
+            SELECT id, date, amount, category_id, type
+            FROM finance_operations
+            WHERE user_id = ? AND date BETWEEN ? AND ?
+            ORDER BY date
+        """, (user_id, start, end)).fetchall()
+
+# === ИТОГИ ПО ФИНАНСАМ (из finance_daily_rollups) ===
+def get_finance_totals(user_id, start, end):
+    """
+    Суммы расходов и доходов за период: {'expense': ..., 'income': ...}.
+    Читает дневные итоги, а не все операции.
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT type, SUM(total) FROM finance_daily_rollups
+            WHERE user_id = ? AND date BETWEEN ? AND ?
+            GROUP BY type
+        """, (user_id, start, end)).fetchall()
+    totals = {"expense": 0, "income": 0}
+    totals.update(rows)
+    return totals
+
+def get_finance_totals_by_category(user_id, start, end):
+    """
+    Итоги по категориям за период: [(type, название категории, сумма)], крупные сверху.
+    Операции без категории — одной строкой с названием None.
+    """
+    with get_connection() as conn:
+        return conn.execute("""
+            SELECT r.type, c.name, SUM(r.total) AS total
+            FROM finance_daily_rollups r
+            LEFT JOIN finance_categories c ON c.id = r.category_id
+            WHERE r.user_id = ? AND r.date BETWEEN ? AND ?
+            GROUP BY r.type, r.category_id
+            ORDER BY total DESC
+        """, (user_id, start, end)).fetchall()
+
+def get_finance_daily_totals(user_id, start, end):
+    """
+    Итоги по дням за период (для графика /баланс): [(date, type, сумма)].
+    """
+    with get_connection() as conn:
+        return conn.execute("""
+            SELECT date, type, SUM(total) FROM finance_daily_rollups
+            WHERE user_id = ? AND date BETWEEN ? AND ?
+            GROUP BY date, type
+        """, (user_id, start, end)).fetchall()
+
+def get_balance(user_id):
+    """
+    Баланс за всю историю: доходы минус расходы.
+    """
+    with get_connection() as conn:
+        row = conn.execute("""
+            SELECT COALESCE(SUM(CASE WHEN type = 'income' THEN total ELSE -total END), 0)
+            FROM finance_daily_rollups
+            WHERE user_id = ?
+        """, (user_id,)).fetchone()
+    return row[0]
+
+def get_last_finance_operations(user_id, limit=10, before_id=None):
+    """
+    Последние операции (новые сверху) с keyset-пагинацией:
+    следующую страницу брать с before_id = id последней строки.
+    Возвращает [(id, date, amount, type, название категории)].
+    """
+    with get_connection() as conn:
+        return conn.execute("""
+            SELECT o.id, o.date, o.amount, o.type, c.name
+            FROM finance_operations o
+            LEFT JOIN finance_categories c ON c.id = o.category_id
+            WHERE o.user_id = ? AND o.id < ?
+            ORDER BY o.id DESC
+            LIMIT ?
+        """, (user_id, before_id if before_id is not None else 2 ** 63 - 1, limit)).fetchall()
+
+def rebuild_finance_rollups(user_id=None):
+    """
+    Проверка согласованности: пересчитывает дневные итоги из finance_operations
+    (для одного пользователя или для всех) и заменяет ими сохранённые.
+    Возвращает число строк итогов, которые расходились с сырыми данными.
+    """
+    where, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
+    with get_connection() as conn:
+        conn.execute("DROP TABLE IF EXISTS temp.fresh_rollups")
+        conn.execute(f"""
+            CREATE TEMP TABLE fresh_rollups AS
+            SELECT user_id, date, COALESCE(category_id, 0) AS category_id, type,
+                   SUM(amount) AS total, COUNT(*) AS ops
+            FROM finance_operations {where}
+            GROUP BY user_id, date, COALESCE(category_id, 0), type
+        """, params)
+        mismatched = conn.execute(f"""
+            SELECT COUNT(*) FROM (
+                SELECT user_id, date, category_id, type, total, ops FROM fresh_rollups
+                EXCEPT
+                SELECT user_id, date, category_id, type, total, ops FROM finance_daily_rollups {where}
+            )
+        """, params).fetchone()[0] + conn.execute(f"""
+            SELECT COUNT(*) FROM (
+                SELECT user_id, date, category_id, type FROM finance_daily_rollups {where}
+                EXCEPT
+                SELECT user_id, date, category_id, type FROM fresh_rollups
+            )
+        """, params).fetchone()[0]
+        conn.execute(f"DELETE FROM finance_daily_rollups {where}", params)
+        conn.execute("INSERT INTO finance_daily_rollups SELECT * FROM fresh_rollups")
+        conn.execute("DROP TABLE temp.fresh_rollups")
+        conn.commit()
+    return mismatched
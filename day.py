@@ -4,8 +4,9 @@ from aiogram.fsm.context import FSMContext
 from aiogram.filters import Command
 from fsm import DayLog
 from datetime import datetime
+from html import escape
 
-from database import get_or_create_daily_log, save_daily_log
+from db_async import get_daily_log, get_food_log, save_daily_log
 
 router = Router(name="day")
 
@@ -67,16 +68,14 @@ async def finish_day_log(message: Message, state: FSMContext):
     thoughts = message.text.strip()
     data = await state.get_data()
 
-    db_data = await get_or_create_daily_log(message.from_user.id)
-    db_data.update({
+    today = datetime.now().strftime("%Y-%m-%d")
+    await save_daily_log(message.from_user.id, today, {
         "water": data["water"],
-        "smoke": data["smoke"],
-        "activity": data["activity"],
+        "cigarettes": data["smoke"],
+        "exercise": data["activity"],
         "mood": data["mood"],
         "thoughts": thoughts
     })
-
-    await save_daily_log(message.from_user.id, db_data)
     await state.clear()
 
     await message.answer("✅ Лог за сегодня сохранён. Возвращайся завтра.")
@@ -85,17 +84,26 @@ async def finish_day_log(message: Message, state: FSMContext):
 # 🧾 /отчёт — вывести лог за сегодня
 @router.message(Command("отчёт"))
 async def show_day_log(message: Message):
-    data = await get_or_create_daily_log(message.from_user.id)
-    if not data:
+    today = datetime.now().strftime("%Y-%m-%d")
+    data = await get_daily_log(message.from_user.id, today)
+    food = await get_food_log(message.from_user.id, today)
+    if not data and not food:
         await message.answer("Нет данных за сегодня.")
         return
 
+    # Ответ уходит с parse_mode=HTML: всё, что ввёл пользователь, экранируется
     text = (
         f"🧾 Отчёт за день:\n"
         f"💧 Вода: {data.get('water', 0)} мл\n"
-        f"🚬 Сигареты: {data.get('smoke', 0)}\n"
-        f"🏃 Активность: {data.get('activity', 'нет')}\n"
+        f"🚬 Сигареты: {data.get('cigarettes', 0)}\n"
+        f"🏃 Активность: {escape(str(data.get('exercise', 'нет')))}\n"
         f"🙂 Настроение: {data.get('mood', '-')}\n"
-        f"🧠 Мысли: {data.get('thoughts', '—')}"
+        f"🧠 Мысли: {escape(str(data.get('thoughts', '—')))}"
     )
+    if food:
+        text += "\n🍽 Еда:"
+        for meal_name, items in food.items():
+            text += f"\n<b>{escape(str(meal_name))}</b>: " + ", ".join(
+                f"{escape(str(product))} ({grams}г)" for product, grams, _ in items
+            )
     await message.answer(text)
\ No newline at end of file
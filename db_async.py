@@ -0,0 +1,150 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import analytics
+import charts
+import database
+import exporter
+import importer
+from metrics import metrics
+
+# Потоки для работы с SQLite: у каждого своё соединение из db_pool,
+# в режиме WAL читатели не мешают друг другу
+DB_WORKERS = 4
+# Процессы для тяжёлых задач (экспорт, графики), чтобы не держать GIL основного процесса
+PROCESS_WORKERS = 2
+
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+_process_pool = None
+
+
+# === ВЫПОЛНЕНИЕ ЗАПРОСА ВНЕ ЦИКЛА СОБЫТИЙ ===
+async def run_db(func, *args, **kwargs):
+    """
+    Запускает синхронную функцию работы с базой в пуле потоков,
+    чтобы поллинг и остальные хендлеры не ждали запрос.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(_timed, func, *args, **kwargs))
+
+
+def _timed(func, *args, **kwargs):
+    # Время самого запроса в потоке, без ожидания свободного потока
+    started = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        metrics.inc("bot_db_errors_total", {"name": func.__name__})
+        raise
+    finally:
+        metrics.observe("bot_db_duration_seconds", {"name": func.__name__}, time.perf_counter() - started)
+
+
+async def run_in_process(func, *args):
+    """
+    Запускает функцию в отдельном процессе. Функция и аргументы
+    должны быть picklable (функции уровня модуля, простые значения).
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS)
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_process_pool, func, *args)
+    finally:
+        metrics.observe("bot_process_duration_seconds", {"name": func.__name__}, time.perf_counter() - started)
+
+
+def _to_async(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_db(func, *args, **kwargs)
+    return wrapper
+
+
+def _to_process(func):
+    @functools.wraps(func)
+    async def wrapper(*args):
+        return await run_in_process(func, *args)
+    return wrapper
+
+
+def shutdown():
+    _executor.shutdown(wait=True)
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True)
+
+
+# === АСИНХРОННЫЕ ВЕРСИИ ФУНКЦИЙ database.py ===
+init_db = _to_async(database.init_db)
+
+save_habit = _to_async(database.save_habit)
+load_habits = _to_async(database.load_habits)
+delete_habit = _to_async(database.delete_habit)
+log_habit_value = _to_async(database.log_habit_value)
+get_habits_page = _to_async(database.get_habits_page)
+get_habit_name = _to_async(database.get_habit_name)
+get_habit_streaks = _to_async(database.get_habit_streaks)
+rebuild_habit_streaks = _to_async(database.rebuild_habit_streaks)
+
+save_daily_log = _to_async(database.save_daily_log)
+get_daily_log = _to_async(database.get_daily_log)
+get_daily_logs = _to_async(database.get_daily_logs)
+get_daily_aggregates = _to_async(database.get_daily_aggregates)
+get_latest_water_log = _to_async(database.get_latest_water_log)
+
+save_custom_field = _to_async(database.save_custom_field)
+get_custom_fields = _to_async(database.get_custom_fields)
+delete_custom_field = _to_async(database.delete_custom_field)
+get_custom_fields_page = _to_async(database.get_custom_fields_page)
+get_custom_field_name = _to_async(database.get_custom_field_name)
+
+save_nutrition_entry = _to_async(database.save_nutrition_entry)
+log_food = _to_async(database.log_food)
+get_food_log = _to_async(database.get_food_log)
+get_nutrition_summary = _to_async(database.get_nutrition_summary)
+get_nutrition_summary_range = _to_async(database.get_nutrition_summary_range)
+get_day_summaries = _to_async(database.get_day_summaries)
+get_daily_report = _to_async(database.get_daily_report)
+get_data_version = _to_async(database.get_data_version)
+
+set_reminder = _to_async(database.set_reminder)
+delete_reminder = _to_async(database.delete_reminder)
+get_all_reminders = _to_async(database.get_all_reminders)
+
+get_products = _to_async(database.get_products)
+get_product_by_name = _to_async(database.get_product_by_name)
+add_product = _to_async(database.add_product)
+update_product = _to_async(database.update_product)
+delete_product = _to_async(database.delete_product)
+search_products = _to_async(database.search_products)
+get_products_page = _to_async(database.get_products_page)
+add_meal = _to_async(database.add_meal)
+
+get_finance_categories = _to_async(database.get_finance_categories)
+add_finance_category = _to_async(database.add_finance_category)
+add_finance_operation = _to_async(database.add_finance_operation)
+get_finance_operations = _to_async(database.get_finance_operations)
+get_finance_totals = _to_async(database.get_finance_totals)
+get_finance_totals_by_category = _to_async(database.get_finance_totals_by_category)
+get_finance_daily_totals = _to_async(database.get_finance_daily_totals)
+get_balance = _to_async(database.get_balance)
+get_last_finance_operations = _to_async(database.get_last_finance_operations)
+rebuild_finance_rollups = _to_async(database.rebuild_finance_rollups)
+
+backup_database = _to_async(database.backup_database)
+
+# === ЭКСПОРТ И ИМПОРТ (exporter.py, importer.py) ===
+export_data = _to_process(exporter.export_data)
+# В потоке, а не в процессе: прогресс передаётся через обычный callback
+import_file = _to_async(importer.import_file)
+
+# === АНАЛИТИКА (analytics.py) ===
+# Расчёт на NumPy занимает миллисекунды, поэтому идёт в потоке базы, а не в процессе
+get_trends = _to_async(analytics.compute_trends)
+
+# === ГРАФИКИ (charts.py) ===
+render_chart = _to_process(charts.render_chart)
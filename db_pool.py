@@ -0,0 +1,61 @@
+import sqlite3
+import threading
+
+DB_PATH = "habits.db"
+
+# Сколько подготовленных выражений держит каждое соединение
+STATEMENT_CACHE_SIZE = 256
+# Сколько миллисекунд ждать, если база занята другим писателем
+BUSY_TIMEOUT_MS = 5000
+
+_local = threading.local()
+_connections = []
+_lock = threading.Lock()
+
+
+# === НАСТРОЙКА СОЕДИНЕНИЯ (один раз на соединение) ===
+def _configure(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+
+# === ВЫДАЧА ДОЛГОЖИВУЩЕГО СОЕДИНЕНИЯ ===
+def get_connection(path=None):
+    """
+    Возвращает переиспользуемое соединение для текущего потока.
+    Соединение открывается и настраивается один раз, дальше берётся из кэша.
+    Использовать так же, как sqlite3.connect: `with get_connection() as conn:`
+    (коммит/откат при выходе, но без закрытия).
+    """
+    path = path or DB_PATH
+    pool = getattr(_local, "connections", None)
+    if pool is None:
+        pool = _local.connections = {}
+
+    conn = pool.get(path)
+    if conn is None:
+        conn = sqlite3.connect(
+            path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        _configure(conn)
+        pool[path] = conn
+        with _lock:
+            _connections.append(conn)
+    return conn
+
+
+# === ЗАКРЫТИЕ ВСЕХ СОЕДИНЕНИЙ (при остановке бота) ===
+def close_all():
+    with _lock:
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Соединение принадлежит другому потоку — его закроет сборщик мусора
+                pass
+        _connections.clear()
+    _local.connections = {}
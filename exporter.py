@@ -0,0 +1,220 @@
+import csv
+import gzip
+import json
+import os
+from itertools import islice
+
+import numpy as np
+from openpyxl import Workbook
+
+from db_pool import get_connection
+
+# Сколько строк за раз забирать из курсора
+EXPORT_CHUNK_SIZE = 1000
+# Уровень gzip: 6 почти не уступает 9 в размере, но заметно быстрее
+GZIP_LEVEL = 6
+
+HABIT_COLUMNS = [
+    ("name", "Название"), ("habit_type", "Тип"), ("tracking_type", "Трек"),
+    ("unit", "Единица"), ("deadline", "Дедлайн"), ("repeat", "Повтор"),
+]
+HABIT_LOG_COLUMNS = [("habit_name", "Название"), ("value", "Значение"), ("timestamp", "Время")]
+DAY_COLUMNS = [
+    ("date", "Дата"), ("water", "Вода (мл)"), ("cigarettes", "Сигареты"), ("exercise", "Зарядка"),
+    ("expenses", "Расходы"), ("income", "Доход"), ("mood", "Настроение"), ("energy", "Энергия"),
+    ("thoughts", "Мысли"),
+]
+NUTRITION_COLUMNS = [
+    ("date", "Дата"), ("meal_name", "Приём пищи"), ("product_name", "Продукт"), ("weight_grams", "Граммы"),
+    ("calories", "Ккал"), ("protein", "Белки"), ("fat", "Жиры"), ("carbs", "Углеводы"),
+    ("salt", "Соль"), ("sugar", "Сахар"), ("fiber", "Клетчатка"),
+]
+
+
+# === ИСТОЧНИК СТРОК (общий для всех форматов) ===
+def _iter_chunked(cursor, chunk_size=EXPORT_CHUNK_SIZE):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield from rows
+
+
+def _habit_rows(conn, user_id):
+    cursor = conn.execute("SELECT habit_name, data FROM habits WHERE user_id = ?", (user_id,))
+    for name, data in _iter_chunked(cursor):
+        h = json.loads(data)
+        yield (
+            name,
+            "Полезная" if h.get("habit_type") == "good" else "Вредная",
+            "Да/нет" if h.get("tracking_type") == "bool" else "Количество",
+            h.get("unit", ""),
+            h.get("deadline", ""),
+            h.get("repeat", ""),
+        )
+
+
+def _day_rows(conn, user_id, custom_names):
+    days = conn.execute("""
+        SELECT date, water, cigarettes, exercise, expenses, income, mood, energy, thoughts
+        FROM daily_logs WHERE user_id = ? ORDER BY date DESC
+    """, (user_id,))
+    # Оба курсора идут по дате в одном порядке — сливаем их без словаря на всю историю
+    values = _iter_chunked(conn.execute("""
+        SELECT date, field_name, value
+        FROM daily_custom_values WHERE user_id = ? ORDER BY date DESC
+    """, (user_id,)))
+    pending = next(values, None)
+    for row in _iter_chunked(days):
+        custom_dict = {}
+        while pending and pending[0] >= row[0]:
+            if pending[0] == row[0]:
+                custom_dict[pending[1]] = pending[2]
+            pending = next(values, None)
+        yield row + tuple(custom_dict.get(name) for name in custom_names)
+
+
+def iter_tables(conn, user_id):
+    """
+    Все данные пользователя таблица за таблицей:
+    (имя, название листа, [(ключ колонки, заголовок)], итератор строк).
+    Строки читаются из курсора порциями, поэтому память не растёт вместе с историей;
+    следующая таблица открывается, когда писатель дочитал предыдущую.
+    Пустые значения — None.
+    """
+    yield "habits", "Привычки", HABIT_COLUMNS, _habit_rows(conn, user_id)
+    yield "habit_logs", "История привычек", HABIT_LOG_COLUMNS, _iter_chunked(conn.execute(
+        "SELECT habit_name, value, timestamp FROM habit_logs WHERE user_id = ? ORDER BY habit_name, timestamp",
+        (user_id,)
+    ))
+    custom_names = [name for (name,) in conn.execute(
+        "SELECT field_name FROM custom_fields WHERE user_id = ?", (user_id,)
+    )]
+    columns = DAY_COLUMNS + [(f"custom.{name}", name) for name in custom_names]
+    yield "daily_logs", "Логи дня", columns, _day_rows(conn, user_id, custom_names)
+    yield "nutrition_logs", "Питание", NUTRITION_COLUMNS, _iter_chunked(conn.execute(f"""
+        SELECT {", ".join(key for key, _ in NUTRITION_COLUMNS)}
+        FROM nutrition_logs WHERE user_id = ? ORDER BY date
+    """, (user_id,)))
+
+
+# === ФОРМАТЫ ===
+# Писатель получает iter_tables и каталог, возвращает пути созданных файлов.
+# xlsx и csv — с русскими заголовками, как их читает /import;
+# jsonl и npz — для программ, с ключами колонок.
+
+def write_xlsx(tables, directory):
+    # Режим write_only: строки уходят в файл, а не копятся в книге
+    path = os.path.join(directory, "export.xlsx")
+    wb = Workbook(write_only=True)
+    for _, title, columns, rows in tables:
+        ws = wb.create_sheet(title)
+        ws.append([header for _, header in columns])
+        for row in rows:
+            ws.append(row)
+    wb.save(path)
+    return [path]
+
+
+def write_csv(tables, directory):
+    # По файлу на таблицу; utf-8 с BOM и «;» — чтобы Excel открыл кириллицу и колонки
+    paths = []
+    for name, _, columns, rows in tables:
+        path = os.path.join(directory, f"{name}.csv.gz")
+        with gzip.open(path, "wt", encoding="utf-8-sig", newline="", compresslevel=GZIP_LEVEL) as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow([header for _, header in columns])
+            writer.writerows(rows)
+        paths.append(path)
+    return paths
+
+
+def write_jsonl(tables, directory):
+    # Одна строка — одна запись: {"table": имя, ключ колонки: значение, ...}
+    path = os.path.join(directory, "export.jsonl.gz")
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=GZIP_LEVEL) as f:
+        for name, _, columns, rows in tables:
+            keys = ["table", *(key for key, _ in columns)]
+            for row in rows:
+                f.write(json.dumps(dict(zip(keys, (name, *row))), ensure_ascii=False))
+                f.write("\n")
+    return [path]
+
+
+def _encode_column(values):
+    """
+    Числа — одним массивом (NaN вместо пустых), остальное — словарём:
+    коды минимальной ширины (-1 — пусто) и массив различных значений.
+    """
+    types = set(map(type, values))
+    if types <= {int, type(None)} and type(None) not in types:
+        return np.array(values, dtype=np.int64), None
+    if types <= {int, float, type(None)}:
+        return np.array(values, dtype=np.float64), None
+    index = {}
+    codes = [-1 if v is None else index.setdefault(str(v), len(index)) for v in values]
+    dtype = np.int8 if len(index) < 2 ** 7 else np.int16 if len(index) < 2 ** 15 else np.int32
+    return np.array(codes, dtype=dtype), np.array(list(index), dtype=str)
+
+
+def write_columnar(tables, directory):
+    """
+    Колоночный формат на NumPy: один .npz (zip с deflate), открывается np.load без pickle.
+    "<таблица>.columns" — ключи колонок по порядку, "<таблица>.<ключ>" — значения колонки,
+    для текста ещё "<таблица>.<ключ>.dict" — словарь, в который указывают коды.
+    В отличие от остальных форматов таблица целиком собирается в памяти (как массивы).
+    """
+    path = os.path.join(directory, "export.npz")
+    arrays = {}
+    for name, _, columns, rows in tables:
+        data = [[] for _ in columns]
+        while chunk := list(islice(rows, EXPORT_CHUNK_SIZE)):
+            for values, column in zip(data, zip(*chunk)):
+                values.extend(column)
+        arrays[f"{name}.columns"] = np.array([key for key, _ in columns], dtype=str)
+        for (key, _), values in zip(columns, data):
+            array, dictionary = _encode_column(values)
+            arrays[f"{name}.{key}"] = array
+            if dictionary is not None:
+                arrays[f"{name}.{key}.dict"] = dictionary
+    np.savez_compressed(path, **arrays)
+    return [path]
+
+
+def read_columnar(path):
+    """
+    Обратно из write_columnar: {таблица: {ключ колонки: список значений}}.
+    """
+    result = {}
+    with np.load(path) as npz:
+        for name in npz.files:
+            if not name.endswith(".columns"):
+                continue
+            table = name[:-len(".columns")]
+            result[table] = {}
+            for key in npz[name].tolist():
+                values = npz[f"{table}.{key}"]
+                if f"{table}.{key}.dict" in npz.files:
+                    dictionary = npz[f"{table}.{key}.dict"]
+                    result[table][key] = [None if c < 0 else str(dictionary[c]) for c in values]
+                elif values.dtype.kind == "f":
+                    result[table][key] = [None if np.isnan(v) else float(v) for v in values]
+                else:
+                    result[table][key] = values.tolist()
+    return result
+
+
+FORMATS = {
+    "xlsx": write_xlsx,
+    "csv": write_csv,
+    "jsonl": write_jsonl,
+    "npz": write_columnar,
+}
+
+
+def export_data(user_id, directory, fmt="xlsx"):
+    """
+    Выгружает все данные пользователя в directory в формате fmt (см. FORMATS).
+    Возвращает пути файлов. Рассчитан на запуск в отдельном процессе (см. db_async.export_data).
+    """
+    return FORMATS[fmt](iter_tables(get_connection(), user_id), directory)
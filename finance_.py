@@ -5,7 +5,8 @@ from aiogram.filters import Command
 from fsm import FinanceLog
 from datetime import datetime
 
-from database import add_finance_entry, get_finance_entries, get_balance, get_categories, add_category
+from database import add_finance_entry, get_categories, add_category
+from db_async import get_balance, get_last_finance_operations
 
 router = Router(name="finance")
 
@@ -63,15 +64,15 @@ async def save_money_entry(message: Message, state: FSMContext):
 # 📋 /финансы — показать все записи
 @router.message(Command("финансы"))
 async def show_finances(message: Message):
-    entries = await get_finance_entries(message.from_user.id)
+    entries = await get_last_finance_operations(message.from_user.id, limit=10)
     if not entries:
         await message.answer("Нет записей о финансах.")
         return
 
     text = "💸 Финансовые записи:\n\n"
-    for e in entries[-10:]:  # последние 10
-        sign = "+" if e["type"] == "доход" else "-"
-        text += f"{e['date']}: {sign}{e['amount']}₽ — {e['category']}\n"
+    for _, date, amount, type_, category in reversed(entries):  # последние 10, старые сверху
+        sign = "+" if type_ == "income" else "-"
+        text += f"{date}: {sign}{amount}₽ — {category or '—'}\n"
     await message.answer(text)
 
 
@@ -5,7 +5,8 @@ from aiogram.filters import Command
 from fsm import DayLog
 from datetime import datetime
 
-from database import get_or_create_daily_log, save_daily_log, load_products_from_db, save_product_to_db, delete_product_from_db, update_product_in_db
+from database import load_products_from_db, save_product_to_db, delete_product_from_db, update_product_in_db
+from db_async import log_food
 
 router = Router(name="food")
 
@@ -43,17 +44,10 @@ async def finish_food_log(message: Message, state: FSMContext):
     product = data.get("product_name")
     food_type = data.get("food_type")
 
-    db_data = await get_or_create_daily_log(message.from_user.id)
     date = datetime.now().strftime("%Y-%m-%d")
 
-    food_entry = {
-        "type": food_type,
-        "product": product,
-        "grams": grams
-    }
-
-    db_data.setdefault("food", []).append(food_entry)
-    await save_daily_log(message.from_user.id, db_data)
+    # Одна вставка в nutrition_logs вместо перезаписи всего дня
+    await log_food(message.from_user.id, date, food_type, product, grams)
 
     await message.answer(f"🍽 Добавлено: {food_type} — {product} ({grams}г)")
     await state.clear()
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+
+from db_async import run_db
+from db_pool import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Отдельный файл, чтобы состояния диалогов не мешали основной базе
+FSM_DB_PATH = "fsm.db"
+# Сколько записей держать в кэше процесса
+CACHE_SIZE = 10000
+# Сколько секунд доверять кэшу (см. shared в SQLiteStorage)
+CACHE_TTL = 30
+# Как часто и какими пачками сбрасывать изменения в базу
+FLUSH_INTERVAL = 0.5
+FLUSH_BATCH_SIZE = 500
+# Брошенные диалоги старше суток удаляются, проверка — раз в час
+DIALOG_TTL = 24 * 60 * 60
+EVICTION_INTERVAL = 60 * 60
+
+
+# === РАБОТА С ФАЙЛОМ СОСТОЯНИЙ (выполняется в потоках db_async) ===
+def _init(path):
+    with get_connection(path) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS fsm_states (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT,
+                updated_at REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_fsm_states_updated ON fsm_states (updated_at)")
+        conn.commit()
+
+
+def _load(path, key, min_updated_at):
+    with get_connection(path) as conn:
+        row = conn.execute(
+            "SELECT state, data FROM fsm_states WHERE key = ? AND updated_at >= ?",
+            (key, min_updated_at)
+        ).fetchone()
+    if not row:
+        return None, {}
+    return row[0], json.loads(row[1]) if row[1] else {}
+
+
+def _flush(path, records):
+    upserts = [
+        (key, state, json.dumps(data, ensure_ascii=False), updated_at)
+        for key, (state, data, updated_at) in records.items()
+        if state is not None or data
+    ]
+    deletes = [
+        (key, updated_at) for key, (state, data, updated_at) in records.items()
+        if state is None and not data
+    ]
+    # Более старая запись не затирает более новую (другой процесс мог успеть раньше)
+    with get_connection(path) as conn:
+        conn.executemany("""
+            INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+            WHERE excluded.updated_at >= fsm_states.updated_at
+        """, upserts)
+        conn.executemany("DELETE FROM fsm_states WHERE key = ? AND updated_at <= ?", deletes)
+        conn.commit()
+
+
+def _state_counts(path):
+    with get_connection(path) as conn:
+        return conn.execute(
+            "SELECT state, COUNT(*) FROM fsm_states WHERE state IS NOT NULL GROUP BY state"
+        ).fetchall()
+
+
+def _evict_expired(path, min_updated_at):
+    with get_connection(path) as conn:
+        deleted = conn.execute("DELETE FROM fsm_states WHERE updated_at < ?", (min_updated_at,)).rowcount
+        conn.commit()
+    return deleted
+
+
+# === ХРАНИЛИЩЕ FSM ПОВЕРХ SQLITE ===
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в SQLite вместо MemoryStorage.
+    Переживает перезапуски и может быть общим для нескольких процессов бота.
+
+    - чтения идут через LRU-кэш процесса (запись живёт CACHE_TTL секунд);
+    - записи копятся и сбрасываются пачкой раз в FLUSH_INTERVAL секунд,
+      одновременно идёт не больше одного сброса;
+    - диалоги, не менявшиеся DIALOG_TTL секунд, удаляются раз в EVICTION_INTERVAL
+      секунд своим циклом (работает и при shared=True, где цикла сброса нет).
+
+    Кэш и отложенная запись верны, пока апдейты одного пользователя приходят
+    в один процесс (один процесс бота или маршрутизация по user_id).
+    Если процессы получают апдейты вперемешку, нужен shared=True:
+    каждое чтение идёт в базу, каждая запись сбрасывается сразу.
+    """
+
+    def __init__(self, path=FSM_DB_PATH, cache_size=CACHE_SIZE, cache_ttl=CACHE_TTL,
+                 flush_interval=FLUSH_INTERVAL, dialog_ttl=DIALOG_TTL,
+                 eviction_interval=EVICTION_INTERVAL, shared=False):
+        self.path = path
+        self.cache_size = cache_size
+        self.cache_ttl = 0 if shared else cache_ttl
+        self.shared = shared
+        self.flush_interval = flush_interval
+        self.dialog_ttl = dialog_ttl
+        self.eviction_interval = eviction_interval
+        self.key_builder = DefaultKeyBuilder(with_destiny=True)
+        self._cache = OrderedDict()   # key -> (state, data, время загрузки)
+        self._dirty = {}              # key -> (state, data, время изменения)
+        self._flush_task = None
+        self._eviction_task = None
+        self._flush_lock = asyncio.Lock()
+        self._initialized = False
+        self.hits = 0
+        self.misses = 0
+
+    # --- Интерфейс BaseStorage ---
+    async def set_state(self, key, state=None):
+        state = state.state if isinstance(state, State) else state
+        _, data = await self._read(self.key_builder.build(key))
+        self._write(self.key_builder.build(key), state, data)
+        if self.shared:
+            await self.flush()
+
+    async def get_state(self, key):
+        state, _ = await self._read(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key, data):
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+        state, _ = await self._read(self.key_builder.build(key))
+        self._write(self.key_builder.build(key), state, data.copy())
+        if self.shared:
+            await self.flush()
+
+    async def get_data(self, key):
+        _, data = await self._read(self.key_builder.build(key))
+        return data.copy()
+
+    async def close(self):
+        for task in (self._flush_task, self._eviction_task):
+            if task:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._flush_task = self._eviction_task = None
+        await self.flush()
+
+    # --- Кэш и отложенная запись ---
+    async def _read(self, key):
+        if key in self._dirty:
+            state, data, _ = self._dirty[key]
+            self.hits += 1
+            return state, data
+
+        cached = self._cache.get(key)
+        if cached and time.time() - cached[2] < self.cache_ttl:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached[0], cached[1]
+
+        self.misses += 1
+        await self._ensure_initialized()
+        state, data = await run_db(_load, self.path, key, time.time() - self.dialog_ttl)
+        self._remember(key, state, data)
+        return state, data
+
+    def _write(self, key, state, data):
+        now = time.time()
+        self._dirty[key] = (state, data, now)
+        self._remember(key, state, data)
+        if self.shared:
+            return
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        elif len(self._dirty) >= FLUSH_BATCH_SIZE and not self._flush_lock.locked():
+            asyncio.create_task(self.flush())
+
+    def _remember(self, key, state, data):
+        self._cache[key] = (state, data, time.time())
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _ensure_initialized(self):
+        if not self._initialized:
+            await run_db(_init, self.path)
+            self._initialized = True
+            if self._eviction_task is None:
+                self._eviction_task = asyncio.create_task(self._eviction_loop())
+
+    async def flush(self):
+        # Под замком: иначе пачка, снятая раньше, могла бы закоммититься после более новой
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            records, self._dirty = self._dirty, {}
+            await self._ensure_initialized()
+            try:
+                await run_db(_flush, self.path, records)
+            except Exception:
+                # Не теряем изменения: возвращаем их в очередь (новые важнее старых)
+                for key, record in records.items():
+                    self._dirty.setdefault(key, record)
+                raise
+
+    async def state_counts(self):
+        """
+        {состояние: число диалогов в нём} — для метрик.
+        """
+        await self.flush()
+        await self._ensure_initialized()
+        return dict(await run_db(_state_counts, self.path))
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception(f"[FSM] ошибка записи состояний: {e}")
+
+    async def _eviction_loop(self):
+        # Не зависит от цикла сброса: при shared=True тот не запускается вовсе
+        while True:
+            try:
+                deleted = await run_db(_evict_expired, self.path, time.time() - self.dialog_ttl)
+                if deleted:
+                    logger.info(f"[FSM] удалено брошенных диалогов: {deleted}")
+            except Exception as e:
+                logger.exception(f"[FSM] ошибка удаления брошенных диалогов: {e}")
+            await asyncio.sleep(self.eviction_interval)
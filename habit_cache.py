@@ -0,0 +1,73 @@
+import time
+from collections import OrderedDict
+
+from db_async import load_habits, save_habit, delete_habit
+
+# Сколько пользователей держать в памяти и сколько секунд доверять записи
+CACHE_SIZE = 10000
+CACHE_TTL = 60 * 60
+
+
+# === КЭШ ПРИВЫЧЕК ПОЛЬЗОВАТЕЛЕЙ ===
+class HabitCache:
+    """
+    LRU-кэш привычек {user_id: {название: данные}} с TTL.
+    - Ленивая загрузка: первый запрос пользователя читает базу, /start не нужен.
+    - Write-through: save/delete пишут в базу и тут же правят кэш без перечитывания.
+    - Размер ограничен: самые давние пользователи вытесняются.
+    """
+
+    def __init__(self, max_users=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (привычки, время загрузки)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry and time.monotonic() - entry[1] < self.ttl:
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(entry[0])
+
+        self.misses += 1
+        habits = await load_habits(user_id)
+        self._store(user_id, habits)
+        return dict(habits)
+
+    async def save(self, user_id, habit_name, data):
+        await save_habit(user_id, habit_name, data)
+        entry = self._entries.get(user_id)
+        if entry:
+            entry[0][habit_name] = data
+
+    async def delete(self, user_id, habit_name):
+        await delete_habit(user_id, habit_name)
+        entry = self._entries.get(user_id)
+        if entry:
+            entry[0].pop(habit_name, None)
+
+    def invalidate(self, user_id):
+        self._entries.pop(user_id, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "users": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+    def _store(self, user_id, habits):
+        self._entries[user_id] = (habits, time.monotonic())
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+habit_cache = HabitCache()
@@ -1,12 +1,11 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.filters import Command
 from datetime import datetime, timedelta
 
 from fsm import AddHabit
-from database import save_habits_to_db, delete_habit_from_db, load_habits_from_db
-from utils import user_habits
+from habit_cache import habit_cache
 
 router = Router(name="habit")
 
@@ -137,7 +136,7 @@ async def repeat_chosen(callback: CallbackQuery, state: FSMContext):
     user_id = callback.from_user.id
 
     # 🧾 Сохраняем привычку
-    await save_habits_to_db(user_id, data["habit_name"], {
+    await habit_cache.save(user_id, data["habit_name"], {
         "habit_type": data["habit_type"],
         "tracking_type": data["tracking_type"],
         "unit": data.get("unit", ""),
@@ -145,7 +144,6 @@ async def repeat_chosen(callback: CallbackQuery, state: FSMContext):
         "repeat": data.get("repeat", "")
     })
 
-    user_habits[user_id] = await load_habits_from_db(user_id)
     await callback.message.answer(f"✅ Привычка '{data['habit_name']}' добавлена.")
     await state.clear()
     await callback.answer()
@@ -155,7 +153,7 @@ async def repeat_chosen(callback: CallbackQuery, state: FSMContext):
 @router.message(Command("report"))
 async def report_cmd(message: Message):
     user_id = message.from_user.id
-    habits = user_habits.get(user_id, {})
+    habits = await habit_cache.get(user_id)
 
     if not habits:
         await message.answer("У тебя пока нет привычек. Добавь с помощью /add")
@@ -171,31 +169,4 @@ async def report_cmd(message: Message):
     await message.answer(text)
 
 
-# ❌ /deletehabit — удалить привычку
-@router.message(Command("deletehabit"))
-async def delete_habit_start(message: Message):
-    user_id = message.from_user.id
-    habits = user_habits.get(user_id, {})
-
-    if not habits:
-        await message.answer("У тебя нет привычек для удаления.")
-        return
-
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text=name, callback_data=f"delete:{name}")]
-            for name in habits
-        ]
-    )
-    await message.answer("Выбери привычку, которую хочешь удалить:", reply_markup=keyboard)
-
-
-@router.callback_query(F.data.startswith("delete:"))
-async def confirm_delete(callback: CallbackQuery):
-    user_id = callback.from_user.id
-    name = callback.data.split(":")[1]
-
-    await delete_habit_from_db(user_id, name)
-    user_habits[user_id] = await load_habits_from_db(user_id)
-    await callback.message.edit_text(f"❌ Привычка '{name}' удалена.")
-    await callback.answer()
\ No newline at end of file
+# ❌ /deletehabit — в handlers_logic.py (выбор через habit_picker: callback_data по id, а не по названию)
@@ -0,0 +1,137 @@
+import json
+from datetime import date, datetime, timedelta
+
+# === СЕРИИ ВЫПОЛНЕНИЯ ПРИВЫЧЕК ===
+# Состояние каждой привычки лежит в habit_streaks и обновляется за O(1)
+# при каждой отметке (log_habit_value), без пересчёта habit_logs.
+# Период зависит от повтора привычки: день (daily), неделя с понедельника (weekly),
+# у привычки без повтора (none) период один на всё время.
+
+ONCE = "once"
+
+
+def period_key(day, repeat):
+    if repeat == "weekly":
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if repeat == "none":
+        return ONCE
+    return day.isoformat()
+
+
+def _step(repeat):
+    return timedelta(days=7 if repeat == "weekly" else 1)
+
+
+def _next_period(period, repeat):
+    return (date.fromisoformat(period) + _step(repeat)).isoformat()
+
+
+def _periods_between(first, last, repeat):
+    # Сколько периодов от first до last включительно
+    if repeat == "none":
+        return 1
+    return (date.fromisoformat(last) - date.fromisoformat(first)) // _step(repeat) + 1
+
+
+def _habit_repeat(conn, user_id, habit_name):
+    row = conn.execute(
+        "SELECT data FROM habits WHERE user_id = ? AND habit_name = ?", (user_id, habit_name)
+    ).fetchone()
+    repeat = json.loads(row[0]).get("repeat") if row else None
+    return repeat if repeat in ("daily", "weekly", "none") else "daily"
+
+
+def _advance(state, period, repeat):
+    """
+    Новое состояние (first, last, current, best, done) после выполнения в period.
+    Повторная отметка в том же периоде ничего не меняет.
+    """
+    if state is None:
+        return period, period, 1, 1, 1
+    first, last, current, best, done = state
+    if period <= last:
+        return state
+    current = current + 1 if repeat != "none" and period == _next_period(last, repeat) else 1
+    return first, period, current, max(best, current), done + 1
+
+
+def _save(conn, user_id, habit_name, repeat, state):
+    conn.execute("""
+        INSERT OR REPLACE INTO habit_streaks (
+            user_id, habit_name, repeat, first_period, last_period,
+            current_streak, best_streak, periods_done
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (user_id, habit_name, repeat, *state))
+
+
+def record(conn, user_id, habit_name, value, day=None):
+    """
+    Учитывает отметку привычки в её состоянии; вызывается в транзакции записи лога.
+    Выполнением считается значение больше нуля.
+    Если у привычки сменился повтор, её состояние пересчитывается по логам.
+    """
+    if not value or value <= 0:
+        return
+    repeat = _habit_repeat(conn, user_id, habit_name)
+    row = conn.execute("""
+        SELECT repeat, first_period, last_period, current_streak, best_streak, periods_done
+        FROM habit_streaks WHERE user_id = ? AND habit_name = ?
+    """, (user_id, habit_name)).fetchone()
+    if row and row[0] != repeat:
+        rebuild(conn, user_id, habit_name)
+        return
+    state = _advance(row[1:] if row else None, period_key(day or date.today(), repeat), repeat)
+    _save(conn, user_id, habit_name, repeat, state)
+
+
+def rebuild(conn, user_id=None, habit_name=None):
+    """
+    Пересчитывает состояния по всему habit_logs (заполнение, смена повтора).
+    Без аргументов — для всех пользователей. Возвращает число привычек.
+    """
+    scope, params = "1", []
+    if user_id is not None:
+        scope += " AND user_id = ?"
+        params.append(user_id)
+    if habit_name is not None:
+        scope += " AND habit_name = ?"
+        params.append(habit_name)
+    conn.execute(f"DELETE FROM habit_streaks WHERE {scope}", params)
+
+    states = {}
+    repeats = {}
+    for uid, name, timestamp in conn.execute(f"""
+        SELECT user_id, habit_name, timestamp FROM habit_logs
+        WHERE {scope} AND value > 0
+        ORDER BY user_id, habit_name, timestamp
+    """, params).fetchall():
+        key = (uid, name)
+        if key not in repeats:
+            repeats[key] = _habit_repeat(conn, uid, name)
+        day = datetime.strptime(timestamp[:10], "%Y-%m-%d").date()
+        states[key] = _advance(states.get(key), period_key(day, repeats[key]), repeats[key])
+    for (uid, name), state in states.items():
+        _save(conn, uid, name, repeats[(uid, name)], state)
+    return len(states)
+
+
+def summarize(row, today=None):
+    """
+    Отчёт по строке habit_streaks (repeat, first, last, current, best, done) — только из состояния.
+    Серия обнуляется, если пропущен целый период; текущий незакрытый период не считается пропуском.
+    """
+    repeat, first, last, current, best, done = row
+    current_period = period_key(today or date.today(), repeat)
+    if repeat != "none" and last != current_period and _next_period(last, repeat) != current_period:
+        current = 0
+    total = _periods_between(first, current_period, repeat)
+    return {
+        "repeat": repeat,
+        "current": current,
+        "best": best,
+        "last_period": last,
+        "done": done,
+        "periods": total,
+        "ratio": done / total if total else 0.0,
+        "done_this_period": last == current_period,
+    }
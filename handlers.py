@@ -13,8 +13,7 @@ from .finance_ import router as finance_router
 from .food import router as food_router
 
 # 🧠 Вспомогательные модули
-from utils import user_habits
-from database import load_habits_from_db
+from habit_cache import habit_cache
 
 # 📦 Роутер текущего файла
 router = Router()
@@ -23,7 +22,7 @@ router = Router()
 @router.message(Command("start"))
 async def start_handler(message: Message):
     user_id = message.from_user.id
-    user_habits[user_id] = await load_habits_from_db(user_id)
+    await habit_cache.get(user_id)  # прогрев кэша
     await message.answer(
         "Привет! Я бот, который помогает тебе отслеживать свою жизнь.\n\n"
         "🧭 Используй /help, чтобы посмотреть все команды."
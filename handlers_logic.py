@@ -1,45 +1,81 @@
+import asyncio
 import logging
-import sqlite3
 import tempfile
 import os
+import shutil
+from html import escape
 from datetime import datetime, timedelta
 
 from aiogram import F, Router
 from aiogram.types import (
     Message, CallbackQuery, InlineKeyboardButton,
-    InlineKeyboardMarkup, FSInputFile
+    InlineKeyboardMarkup, FSInputFile, BufferedInputFile, InputMediaDocument
 )
 from aiogram.fsm.context import FSMContext
-from aiogram.filters import Command
-from openpyxl import Workbook
+from aiogram.filters import Command, CommandObject
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
 
-from fsm import AddHabit, DayLog, AddCustomField, FinanceLog
+from fsm import AddHabit, DayLog, AddCustomField, FinanceLog, CustomFieldInput
 from config import bot, OWNER_ID, GROUP_CHAT_ID
-from database import (
+from database import PAGE_SIZE
+from db_async import (
     save_custom_field,
-    get_nutrition_summary,
-    get_product_by_name,
-    add_product,
-    get_products,
-    add_meal,
+    get_custom_fields,
+    delete_custom_field,
+    get_custom_fields_page,
+    get_custom_field_name,
+    get_habits_page,
+    get_habit_name,
+    get_habit_streaks,
+    get_trends,
+    get_daily_logs,
+    export_data,
+    import_file,
+    get_nutrition_summary_range,
+    get_daily_report,
+    get_data_version,
+    render_chart,
+    search_products,
+    get_products_page,
+    delete_product,
     update_product,
-    get_finance_categories,
     add_finance_operation,
-    add_finance_category
+    get_finance_totals,
+    get_finance_daily_totals,
+    set_reminder,
+    delete_reminder,
+    backup_database
 )
 
 
-from utils import user_habits
+from habit_cache import habit_cache
+from chart_cache import chart_cache
+from charts import day_series, finance_series
+from category_index import category_index
+from metrics import metrics
+from reminder_engine import reminder_engine
+from picker import Picker
+from analytics import MAX_TRENDS_DAYS, TRENDS_DAYS
+from exporter import FORMATS as EXPORT_FORMATS
+from reports import render_report, render_trends, send_report
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+# Постраничные клавиатуры выбора: курсор — id строки в callback_data
+habit_picker = Picker("pgh", "delhabit", get_habits_page)
+custom_field_picker = Picker("pgc", "delcustom", get_custom_fields_page)
+delete_product_picker = Picker("pgdp", "delprod", lambda _, *page: get_products_page(*page))
+edit_product_picker = Picker("pgep", "editprod", lambda _, *page: get_products_page(*page))
+for _picker in (habit_picker, custom_field_picker, delete_product_picker, edit_product_picker):
+    _picker.register(router)
+
 # Команда /start — приветствие и загрузка привычек
 @router.message(Command('start'))
 async def start_handler(message: Message):
     user_id = message.from_user.id
     logger.info(f"✅ Пользователь {user_id} нажал /start")
-    user_habits[user_id] = await load_habits_from_db(user_id)
+    await habit_cache.get(user_id)  # прогрев кэша
 
     await message.answer(
         "Привет! Я бот, который помогает тебе отслеживать свою жизнь.\n\n"
@@ -54,12 +90,15 @@ async def help_cmd(message: Message):
         "• /add — добавить привычку (полезную или вредную)\n"
         "• /day — заполнить лог дня (вода, еда, сигареты, мысли...)\n"
         "• /report — показать текущие привычки\n"
-        "• /export — экспорт в Excel\n"
+        "• /streaks — серии и выполнение привычек\n"
+        "• /export — экспорт (xlsx, csv, jsonl, npz)\n"
+        "• /import — загрузить историю из CSV/XLSX\n"
         "• /deletehabit — удалить привычку\n\n"
         "📅 Логи:\n"
         "• /history — последние 7 записей\n"
         "• /week — отчёт за неделю\n"
-        "• /month — отчёт за месяц\n\n"
+        "• /month — отчёт за месяц\n"
+        "• /trends — тренды и связи между показателями\n\n"
         "💡 Кастом:\n"
         "• /custom — добавить своё поле в дневник\n"
         "• /delcustom — удалить кастомное поле\n\n"
@@ -212,7 +251,7 @@ async def repeat_chosen(callback: CallbackQuery, state: FSMContext):
     repeat_value = repeat
 
     # Сохраняем в базу данных
-    await save_habits_to_db(user_id, name, {
+    await habit_cache.save(user_id, name, {
         "habit_type": habit_type,
         "tracking_type": tracking,
         "unit": unit,
@@ -220,9 +259,6 @@ async def repeat_chosen(callback: CallbackQuery, state: FSMContext):
         "repeat": repeat_value
     })
 
-    # Обновляем кэш привычек
-    user_habits[user_id] = await load_habits_from_db(user_id)
-
     await callback.message.answer(f"✅ Привычка '{name}' добавлена.")
     await state.clear()
     await callback.answer()
@@ -231,7 +267,7 @@ async def repeat_chosen(callback: CallbackQuery, state: FSMContext):
 @router.message(Command("report"))
 async def report_cmd(message: Message):
     user_id = message.from_user.id
-    habits = user_habits.get(user_id, {})
+    habits = await habit_cache.get(user_id)
 
     if not habits:
         await message.answer("У тебя пока нет привычек. Добавь с помощью /add")
@@ -246,117 +282,224 @@ async def report_cmd(message: Message):
 
     await message.answer(text)
 
+# ===== /streaks — серии выполнения привычек (из habit_streaks, без чтения логов) =====
+REPEAT_LABELS = {"daily": "дн.", "weekly": "нед.", "none": "разово"}
+
+@router.message(Command("streaks"))
+async def streaks_cmd(message: Message):
+    streaks = await get_habit_streaks(message.from_user.id)
+    if not streaks:
+        await message.answer("Пока нет отметок привычек.")
+        return
+
+    lines = ["🔥 Серии привычек:\n"]
+    for name, s in streaks.items():
+        mark = "✅" if s["done_this_period"] else "⏳"
+        if s["repeat"] == "none":
+            lines.append(f"{mark} {escape(name)} — выполнено")
+            continue
+        unit = REPEAT_LABELS[s["repeat"]]
+        lines.append(
+            f"{mark} {escape(name)} — серия {s['current']} {unit}, лучшая {s['best']}, "
+            f"выполнено {s['done']}/{s['periods']} ({s['ratio']:.0%})"
+        )
+    await message.answer("\n".join(lines))
+
+# ===== /trends — тренды, средние и корреляции за период =====
+@router.message(Command("trends"))
+async def trends_cmd(message: Message, command: CommandObject):
+    # /trends [дней]; по умолчанию TRENDS_DAYS
+    days = TRENDS_DAYS
+    if command.args:
+        if not command.args.strip().isdigit() or int(command.args) < 1:
+            await message.answer("Формат: /trends [дней], например /trends 365")
+            return
+        days = min(int(command.args), MAX_TRENDS_DAYS)
+
+    trends = await get_trends(message.from_user.id, days)
+    await send_report(message, render_trends(trends))
+
 # ===== /deletehabit — удаление привычки =====
 @router.message(Command("deletehabit"))
 async def delete_habit_start(message: Message):
     user_id = message.from_user.id
-    habits = user_habits.get(user_id, {})
-
-    if not habits:
+    # Клавиатура с выбором привычки для удаления (по страницам)
+    keyboard = await habit_picker.keyboard(user_id)
+    if keyboard is None:
         await message.answer("У тебя нет привычек для удаления.")
         return
-
-    # Клавиатура с выбором привычки для удаления
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text=name, callback_data=f"delete:{name}")]
-            for name in habits
-        ]
-    )
     await message.answer("Выбери привычку, которую хочешь удалить:", reply_markup=keyboard)
 
-@router.callback_query(F.data.startswith("delete:"))
+@router.callback_query(F.data.startswith("delhabit:"))
 async def confirm_delete(callback: CallbackQuery):
     user_id = callback.from_user.id
-    name = callback.data.split(":")[1]
+    name = await get_habit_name(user_id, int(callback.data.split(":")[1]))
+    if name is None:
+        await callback.answer("Привычка уже удалена.")
+        return
 
-    # Удаляем из БД и обновляем кэш
-    await delete_habit_from_db(user_id, name)
-    user_habits[user_id] = await load_habits_from_db(user_id)
+    # Удаляем из БД и из кэша (без перечитывания)
+    await habit_cache.delete(user_id, name)
 
     await callback.message.edit_text(f"❌ Привычка '{name}' удалена.")
     await callback.answer()
 
-# ===== /export — экспорт привычек и логов в Excel =====
+# ===== /export — экспорт привычек и логов: /export [xlsx|csv|jsonl|npz] =====
 @router.message(Command("export"))
-async def export_to_excel(message: Message):
-    import json
-    from database import get_custom_fields
-
+async def export_handler(message: Message, command: CommandObject):
     user_id = message.from_user.id
-    habits = user_habits.get(user_id, {})
-
-    # Создаём Excel-файл
-    wb = Workbook()
-    ws_habits = wb.active
-    ws_habits.title = "Привычки"
-    ws_habits.append(["Название", "Тип", "Трек", "Единица", "Дедлайн", "Повтор"])
-
-    # Заполняем лист привычек
-    for name, h in habits.items():
-        ws_habits.append([
-            name,
-            "Полезная" if h.get("habit_type") == "good" else "Вредная",
-            "Да/нет" if h.get("tracking_type") == "bool" else "Количество",
-            h.get("unit", ""),
-            h.get("deadline", ""),
-            h.get("repeat", "")
-        ])
-
-    # Получаем кастомные поля для логов
-    custom_fields = get_custom_fields(user_id)
-    custom_names = [f[0] for f in custom_fields]
+    fmt = (command.args or "xlsx").strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        await message.answer(f"Формат: /export {'|'.join(EXPORT_FORMATS)} (по умолчанию xlsx)")
+        return
 
-    # Создаём лист логов дня
-    ws_logs = wb.create_sheet("Логи дня")
-    headers = ["Дата", "Вода (мл)", "Сигареты", "Зарядка", "Расходы", "Доход", "Настроение", "Энергия", "Мысли"] + custom_names
-    ws_logs.append(headers)
-
-    # Загружаем логи из базы
-    with sqlite3.connect("habits.db") as conn:
-        rows = conn.execute("""
-            SELECT date, water, cigarettes, exercise, expenses, income, mood, energy, thoughts, custom_data
-            FROM daily_logs WHERE user_id = ? ORDER BY date DESC
-        """, (user_id,)).fetchall()
-
-        for row in rows:
-            (
-                date, water, cigs, exercise, expenses,
-                income, mood, energy, thoughts, custom_json
-            ) = row
-            try:
-                custom_dict = json.loads(custom_json) if custom_json else {}
-            except:
-                custom_dict = {}
-
-            # Значения по всем кастомным полям
-            custom_values = [custom_dict.get(name, "") for name in custom_names]
-
-            ws_logs.append([
-                date, water, cigs, exercise, expenses,
-                income, mood, energy, thoughts
-            ] + custom_values)
-
-    # Сохраняем во временный файл
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-        wb.save(tmp.name)
+    # Временный каталог под выгрузку: csv — по файлу на таблицу
+    directory = tempfile.mkdtemp(prefix="export-")
+    try:
+        # Файлы собираются в отдельном процессе, цикл событий не блокируется
+        paths = await export_data(user_id, directory, fmt)
+
+        # Отправляем пользователю файлы (загружаются в Telegram один раз)
+        files = [FSInputFile(path, filename=os.path.basename(path)) for path in paths]
+        if len(files) == 1:
+            sent = [await message.answer_document(files[0])]
+        else:
+            sent = await message.answer_media_group([InputMediaDocument(media=f) for f in files])
+
+        # Если отправитель — владелец, дублируем в группу по file_id без повторной загрузки
+        if user_id == OWNER_ID:
+            caption = f"📊 Экспорт от @{message.from_user.username or user_id}"
+            if len(sent) == 1:
+                await bot.send_document(GROUP_CHAT_ID, sent[0].document.file_id, caption=caption)
+            else:
+                await bot.send_media_group(GROUP_CHAT_ID, [
+                    InputMediaDocument(media=m.document.file_id, caption=caption if i == len(sent) - 1 else None)
+                    for i, m in enumerate(sent)
+                ])
+    except Exception as e:
+        logger.exception(f"[EXPORT] user={user_id} format={fmt}")
+        await message.answer(f"❌ Экспорт не выполнен: {escape(str(e))}")
+        return
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    logger.info(f"[EXPORT_DONE] user={user_id} format={fmt} → {len(paths)} файл(ов) удалено")
+
+# ===== /import — загрузка истории из CSV/XLSX =====
+# Не чаще раза в столько секунд правим сообщение о прогрессе (лимиты Telegram)
+IMPORT_PROGRESS_INTERVAL = 3
+
+IMPORT_KINDS = {"days": "логи дня", "nutrition": "питание", "habit_logs": "привычки", "finance": "финансы"}
+
+@router.message(Command("import"))
+async def import_handler(message: Message):
+    document = message.document
+    if document is None or not (document.file_name or "").lower().endswith((".csv", ".csv.gz", ".xlsx")):
+        await message.answer(
+            "Пришли файл .csv, .csv.gz или .xlsx с подписью /import.\n"
+            "Листы и колонки — как в /export («Логи дня», «Питание», «История привычек»), "
+            "для финансов — «Дата», «Тип», «Категория», «Сумма»."
+        )
+        return
+
+    user_id = message.from_user.id
+    status = await message.answer("⏳ Импорт: загружаю файл…")
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(document.file_name)[1].lower()) as tmp:
         path = tmp.name
 
-    # Отправляем пользователю файл
-    file_for_user = FSInputFile(path, filename="export.xlsx")
-    await message.answer_document(file_for_user)
-
-    # Если отправитель — владелец, дублируем в группу
-    if user_id == OWNER_ID:
-        file_for_group = FSInputFile(path, filename="export.xlsx")
-        await bot.send_document(
-            GROUP_CHAT_ID,
-            file_for_group,
-            caption=f"📊 Экспорт от @{message.from_user.username or user_id}"
-        )
+    read = 0
 
-    os.remove(path)
-    logger.info(f"[EXPORT_DONE] user={user_id} → export.xlsx удалён")
+    def progress(rows):
+        # Вызывается из потока импорта: только запоминаем, сообщение правит ticker
+        nonlocal read
+        read = rows
+
+    async def ticker():
+        shown = 0
+        while True:
+            await asyncio.sleep(IMPORT_PROGRESS_INTERVAL)
+            if read != shown:
+                shown = read
+                try:
+                    await status.edit_text(f"⏳ Импорт: прочитано {shown} строк…")
+                except TelegramAPIError as e:
+                    logger.warning(f"[IMPORT] прогресс не обновлён: {e}")
+
+    try:
+        await bot.download(document, destination=path)
+        task = asyncio.create_task(ticker())
+        try:
+            report = await import_file(user_id, path, progress=progress)
+        finally:
+            task.cancel()
+    except Exception as e:
+        logger.exception(f"[IMPORT] user={user_id} {document.file_name}")
+        await status.edit_text(f"❌ Импорт не выполнен, ничего не сохранено: {escape(str(e))}")
+        return
+    finally:
+        os.remove(path)
+
+    # Новые категории финансов и дни в кэшах
+    category_index.invalidate(user_id)
+    lines = [f"✅ Импорт за {report['duration']:.1f} с:"]
+    lines += [f"• {IMPORT_KINDS[kind]}: {count}" for kind, count in report["rows"].items()]
+    if report["skipped"]:
+        lines.append(f"\n⚠️ Пропущено строк с ошибками: {report['skipped']}")
+        lines += [f"• {escape(error)}" for error in report["errors"]]
+    if report["ignored"]:
+        lines.append("\nНезнакомые колонки: " + escape(", ".join(report["ignored"])))
+    if report["tables_skipped"]:
+        lines.append("Пропущены листы: " + escape(", ".join(report["tables_skipped"])))
+    await status.edit_text("\n".join(lines))
+
+# ===== /backup — инкрементальный снимок базы (только владелец) =====
+@router.message(Command("backup"))
+async def backup_handler(message: Message):
+    if message.from_user.id != OWNER_ID:
+        return
+    report = await backup_database()
+    await message.answer(
+        f"💾 Снимок {os.path.basename(report['manifest'])}\n"
+        f"База: {report['size'] / 1024 / 1024:.1f} МБ, "
+        f"записано {report['written'] / 1024:.1f} КБ "
+        f"({report['new_chunks']}/{report['chunks']} новых кусков)\n"
+        f"Время: {report['duration']:.2f} с"
+    )
+
+# ===== /stats — горячие пути, база, цикл событий, кэши (только владелец) =====
+STATS_TOP = 10
+
+def _ms(seconds):
+    return "∞" if seconds == float("inf") else f"{seconds * 1000:.0f} мс"
+
+@router.message(Command("stats"))
+async def stats_handler(message: Message):
+    if message.from_user.id != OWNER_ID:
+        return
+
+    lines = ["📊 <b>Команды</b> (вызовов, p50 / p95):"]
+    handlers = metrics.histograms("bot_handler_duration_seconds")
+    for name, h in sorted(handlers.items(), key=lambda item: -item[1].count)[:STATS_TOP]:
+        lines.append(f"{escape(name)} — {h.count}, {_ms(h.quantile(0.5))} / {_ms(h.quantile(0.95))}")
+
+    lines.append("\n🗄 <b>База</b> (суммарное время, вызовов, p95):")
+    queries = metrics.histograms("bot_db_duration_seconds")
+    for name, h in sorted(queries.items(), key=lambda item: -item[1].sum)[:STATS_TOP]:
+        lines.append(f"{name} — {h.sum:.2f} с, {h.count}, {_ms(h.quantile(0.95))}")
+
+    lag = metrics.histograms("bot_event_loop_lag_seconds").get("")
+    if lag:
+        lines.append(f"\n⏱ Лаг цикла событий: p95 {_ms(lag.quantile(0.95))}")
+
+    gauges = await metrics.gauges()
+    states = [(dict(labels)["state"], value) for (name, labels), value in gauges.items() if name == "bot_fsm_states"]
+    if states:
+        lines.append("\n🧭 <b>Диалоги FSM</b>:")
+        lines.extend(f"{escape(state)} — {count}" for state, count in sorted(states, key=lambda s: -s[1]))
+    caches = [(dict(labels)["cache"], value) for (name, labels), value in gauges.items() if name == "bot_cache_hit_ratio"]
+    if caches:
+        lines.append("\n💾 Попадания в кэши: " + ", ".join(f"{cache} {ratio:.0%}" for cache, ratio in caches))
+
+    await message.answer("\n".join(lines), parse_mode="HTML")
 
 
 # --- Напоминания ---
@@ -366,7 +509,6 @@ async def save_reminder(message: Message):
     Устанавливает напоминание для пользователя на определённое время.
     Формат команды: /remind HH:MM
     """
-    from database import set_reminder
     import re
 
     user_id = message.from_user.id
@@ -384,7 +526,8 @@ async def save_reminder(message: Message):
         return
 
     formatted_time = f"{hours:02d}:{minutes:02d}"
-    set_reminder(user_id, formatted_time)
+    await set_reminder(user_id, formatted_time)
+    reminder_engine.schedule(user_id, formatted_time)
     await message.answer(f"🔔 Напоминание установлено на {formatted_time}")
 
 @router.message(Command("remind_off"))
@@ -392,10 +535,9 @@ async def turn_off_reminder(message: Message):
     """
     Отключает напоминание для пользователя.
     """
-    from database import delete_reminder
-
     user_id = message.from_user.id
-    delete_reminder(user_id)
+    await delete_reminder(user_id)
+    reminder_engine.cancel(user_id)
     await message.answer("🔕 Напоминание отключено")
 
 
@@ -433,8 +575,6 @@ async def custom_field_type(callback: CallbackQuery, state: FSMContext):
     """
     Сохраняет выбранный тип кастомного поля и добавляет его в базу.
     """
-    from database import add_custom_field
-
     field_type = callback.data.split("_")[1]  # type_bool -> bool
     data = await state.get_data()
     field_name = data.get("field_name")
@@ -443,7 +583,7 @@ async def custom_field_type(callback: CallbackQuery, state: FSMContext):
         await callback.message.answer("❌ Ошибка: не удалось получить имя поля.")
         return
 
-    add_custom_field(callback.from_user.id, field_name, field_type)
+    await save_custom_field(callback.from_user.id, field_name, field_type)
     await callback.message.answer(f"✅ Кастомное поле «{field_name}» ({field_type}) добавлено.")
     await state.clear()
     await callback.answer()
@@ -453,19 +593,11 @@ async def delete_custom_field_start(message: Message):
     """
     Запускает процесс удаления кастомного поля.
     """
-    from database import get_custom_fields
     user_id = message.from_user.id
-    fields = get_custom_fields(user_id)
-    if not fields:
+    keyboard = await custom_field_picker.keyboard(user_id)
+    if keyboard is None:
         await message.answer("У тебя нет кастомных полей.")
         return
-
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text=name, callback_data=f"delcustom:{name}")]
-            for name, _ in fields
-        ]
-    )
     await message.answer("Выбери поле, которое хочешь удалить:", reply_markup=keyboard)
 
 @router.callback_query(F.data.startswith("delcustom:"))
@@ -473,18 +605,17 @@ async def delete_custom_field_confirm(callback: CallbackQuery):
     """
     Удаляет выбранное кастомное поле из базы.
     """
-    from database import delete_custom_field
     user_id = callback.from_user.id
-    field_name = callback.data.split(":", 1)[1]
+    field_name = await get_custom_field_name(user_id, int(callback.data.split(":")[1]))
+    if field_name is None:
+        await callback.answer("Поле уже удалено.")
+        return
 
-    delete_custom_field(user_id, field_name)
+    await delete_custom_field(user_id, field_name)
     await callback.message.edit_text(f"❌ Поле '{field_name}' удалено.")
     await callback.answer()
 
 
-from fsm import CustomFieldInput
-import json
-
 @router.message(CustomFieldInput.waiting_for_bool_value)
 async def handle_bool_field(message: Message, state: FSMContext):
     """
@@ -548,213 +679,112 @@ async def handle_next_custom_field(message: Message, state: FSMContext, value):
 
 
 
+# --- Графики к отчётам ---
+async def send_chart(message, key, version, chart_type, title, series):
+    """
+    Отправляет график после текстового отчёта. key — (user_id, отчёт, начало, конец).
+    Если при этой версии данных график уже отправлялся — повторно по file_id,
+    иначе рендерит в процессе (db_async.render_chart) и запоминает file_id.
+    """
+    file_id = chart_cache.get(key, version)
+    if file_id:
+        try:
+            await message.answer_photo(file_id)
+            return
+        except TelegramBadRequest:
+            # Telegram больше не принимает этот file_id — рендерим заново
+            chart_cache.invalidate(key)
+    try:
+        png = await render_chart(chart_type, title, series)
+    except Exception:
+        logger.exception(f"[CHART] не удалось построить график {key}")
+        return
+    sent = await message.answer_photo(BufferedInputFile(png, filename=f"{key[1]}.png"))
+    chart_cache.put(key, version, sent.photo[-1].file_id)
+
 # --- История логов ---
 @router.message(Command("history"))
 async def history_handler(message: Message):
     """
     Показывает последние 7 записей дневника пользователя.
     """
-    import json
-    from database import get_custom_fields
-
     user_id = message.from_user.id
-    custom_fields = get_custom_fields(user_id)
+    custom_fields = await get_custom_fields(user_id)
     custom_names = [f[0] for f in custom_fields]
 
-    with sqlite3.connect("habits.db") as conn:
-        rows = conn.execute("""
-            SELECT date, water, cigarettes, exercise, expenses, income, mood, energy, thoughts, custom_data
-            FROM daily_logs
-            WHERE user_id = ?
-            ORDER BY date DESC
-            LIMIT 7
-        """, (user_id,)).fetchall()
+    rows = await get_daily_logs(user_id, limit=7)
 
     if not rows:
         await message.answer("Нет записей за последние дни.")
         return
 
-    response = "🕓 Последние 7 записей:\n"
-    for row in rows:
-        (
-            date, water, cigs, exercise, expenses,
-            income, mood, energy, thoughts, custom_json
-        ) = row
-        response += f"\n📅 <b>{date}</b>\n"
-        response += f"💧 Вода: {water} мл\n"
-
-        nutrition = get_nutrition_summary(user_id, date)
-        response += (
-            f"🍽 Питание:\n"
-            f"  • Калории: {nutrition['calories']:.0f} ккал\n"
-            f"  • Белки: {nutrition['protein']:.1f} г\n"
-            f"  • Жиры: {nutrition['fat']:.1f} г\n"
-            f"  • Углеводы: {nutrition['carbs']:.1f} г\n"
-            f"  • Соль: {nutrition['salt']:.1f} г\n"
-            f"  • Сахар: {nutrition['sugar']:.1f} г\n"
-        )
+    # Питание за весь период — одним запросом
+    summaries = await get_nutrition_summary_range(user_id, rows[-1][0], rows[0][0])
 
-        response += f"🚬 Сигареты: {cigs}\n"
-        response += f"🏃 Активность: {exercise}\n"
-        response += f"💸 Расходы: {expenses} ₽ | Доход: {income} ₽\n"
-        response += f"🙂 Настроение: {mood} / ⚡ Энергия: {energy}\n"
-        response += f"🧠 Мысли: {thoughts or '—'}\n"
-
-        try:
-            custom_dict = json.loads(custom_json) if custom_json else {}
-        except:
-            custom_dict = {}
-
-        if custom_dict:
-            response += "🔧 Кастом:\n"
-            for name in custom_names:
-                value = custom_dict.get(name, "—")
-                response += f"• {name}: {value}\n"
-        response += "─" * 25 + "\n"
-
-    await message.answer(response, parse_mode="HTML")
+    await send_report(message, render_report("🕓 Последние 7 записей:", rows, summaries, custom_names))
 
 @router.message(Command("week"))
 async def week_handler(message: Message):
     """
     Показывает логи за последние 7 дней.
     """
-    import json
-    from database import get_custom_fields
-    from datetime import datetime, timedelta
-
     user_id = message.from_user.id
-    custom_fields = get_custom_fields(user_id)
+    custom_fields = await get_custom_fields(user_id)
     custom_names = [f[0] for f in custom_fields]
 
-    since_date = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
-    with sqlite3.connect("habits.db") as conn:
-        rows = conn.execute("""
-            SELECT date, water, cigarettes, exercise, expenses, income, mood, energy, thoughts, custom_data
-            FROM daily_logs
-            WHERE user_id = ? AND date >= ?
-            ORDER BY date DESC
-        """, (user_id, since_date)).fetchall()
+    today = datetime.now()
+    since_date = (today - timedelta(days=7)).strftime("%Y-%m-%d")
+    today_str = today.strftime("%Y-%m-%d")
+    # Версия берётся до чтения данных: запись посередине даст новую версию, а не устаревший график
+    version = await get_data_version(user_id)
+    # Логи и питание по дням — из кэша сводок, база только для новых дней
+    rows, summaries = await get_daily_report(user_id, since_date, today_str)
 
     if not rows:
         await message.answer("Нет записей за последние 7 дней.")
         return
 
-    response = "🗓️ Лог за последние 7 дней:\n"
-    for row in rows:
-        (
-            date, water, cigs, exercise, expenses,
-            income, mood, energy, thoughts, custom_json
-        ) = row
-        response += f"\n📅 <b>{date}</b>\n"
-        response += f"💧 Вода: {water} мл\n"
-
-        nutrition = get_nutrition_summary(user_id, date)
-        response += (
-            f"🍽 Питание:\n"
-            f"  • Калории: {nutrition['calories']:.0f} ккал\n"
-            f"  • Белки: {nutrition['protein']:.1f} г\n"
-            f"  • Жиры: {nutrition['fat']:.1f} г\n"
-            f"  • Углеводы: {nutrition['carbs']:.1f} г\n"
-            f"  • Соль: {nutrition['salt']:.1f} г\n"
-            f"  • Сахар: {nutrition['sugar']:.1f} г\n"
-        )
-
-        response += f"🚬 Сигареты: {cigs}\n"
-        response += f"🏃 Активность: {exercise}\n"
-        response += f"💸 Расходы: {expenses} ₽ | Доход: {income} ₽\n"
-        response += f"🙂 Настроение: {mood} / ⚡ Энергия: {energy}\n"
-        response += f"🧠 Мысли: {thoughts or '—'}\n"
-
-        try:
-            custom_dict = json.loads(custom_json) if custom_json else {}
-        except:
-            custom_dict = {}
-
-        if custom_dict:
-            response += "🔧 Кастом:\n"
-            for name in custom_names:
-                value = custom_dict.get(name, "—")
-                response += f"• {name}: {value}\n"
-        response += "─" * 25 + "\n"
-
-    await message.answer(response, parse_mode="HTML")
+    await send_report(message, render_report("🗓️ Лог за последние 7 дней:", rows, summaries, custom_names))
+    await send_chart(
+        message, (user_id, "week", since_date, today_str), version,
+        "days", f"Неделя {since_date} — {today_str}", day_series(since_date, today_str, rows, summaries),
+    )
 
 @router.message(Command("month"))
 async def month_handler(message: Message):
     """
     Показывает логи за текущий месяц.
     """
-    import json
-    from database import get_custom_fields
-    from datetime import datetime
-
     user_id = message.from_user.id
-    custom_fields = get_custom_fields(user_id)
+    custom_fields = await get_custom_fields(user_id)
     custom_names = [f[0] for f in custom_fields]
 
     today = datetime.now()
     month_str = today.strftime("%Y-%m")  # пример: "2025-07"
-    with sqlite3.connect("habits.db") as conn:
-        rows = conn.execute("""
-            SELECT date, water, cigarettes, exercise, expenses, income, mood, energy, thoughts, custom_data
-            FROM daily_logs
-            WHERE user_id = ? AND date LIKE ?
-            ORDER BY date DESC
-        """, (user_id, f"{month_str}-%")).fetchall()
+    start, end = f"{month_str}-01", f"{month_str}-31"
+    version = await get_data_version(user_id)
+    rows, summaries = await get_daily_report(user_id, start, end)
 
     if not rows:
         await message.answer("Нет записей за этот месяц.")
         return
 
-    response = f"📅 Лог за {month_str}:\n"
-    for row in rows:
-        (
-            date, water, cigs, exercise, expenses,
-            income, mood, energy, thoughts, custom_json
-        ) = row
-        response += f"\n📅 <b>{date}</b>\n"
-        response += f"💧 Вода: {water} мл\n"
-
-        nutrition = get_nutrition_summary(user_id, date)
-        response += (
-            f"🍽 Питание:\n"
-            f"  • Калории: {nutrition['calories']:.0f} ккал\n"
-            f"  • Белки: {nutrition['protein']:.1f} г\n"
-            f"  • Жиры: {nutrition['fat']:.1f} г\n"
-            f"  • Углеводы: {nutrition['carbs']:.1f} г\n"
-            f"  • Соль: {nutrition['salt']:.1f} г\n"
-            f"  • Сахар: {nutrition['sugar']:.1f} г\n"
-        )
-
-        response += f"🚬 Сигареты: {cigs}\n"
-        response += f"🏃 Активность: {exercise}\n"
-        response += f"💸 Расходы: {expenses} ₽ | Доход: {income} ₽\n"
-        response += f"🙂 Настроение: {mood} / ⚡ Энергия: {energy}\n"
-        response += f"🧠 Мысли: {thoughts or '—'}\n"
-
-        try:
-            custom_dict = json.loads(custom_json) if custom_json else {}
-        except:
-            custom_dict = {}
-
-        if custom_dict:
-            response += "🔧 Кастом:\n"
-            for name in custom_names:
-                value = custom_dict.get(name, "—")
-                response += f"• {name}: {value}\n"
-        response += "─" * 25 + "\n"
-
-    await message.answer(response, parse_mode="HTML")
+    await send_report(message, render_report(f"📅 Лог за {month_str}:", rows, summaries, custom_names))
+    # Ось графика кончается сегодняшним днём: с ним и ключ, иначе вчерашний кэш без новой даты
+    last_day = min(end, today.strftime("%Y-%m-%d"))
+    await send_chart(
+        message, (user_id, "month", start, last_day), version,
+        "days", f"Месяц {month_str}", day_series(start, end, rows, summaries),
+    )
 
 @router.message(Command("продукты"))
-async def show_products(message: Message):
-    from database import get_products
-    products = get_products()
+async def show_products(message: Message, command: CommandObject):
+    # Без аргумента — самые частые продукты пользователя, с аргументом — поиск
+    products = await search_products(command.args or "", message.from_user.id)
     if not products:
-        await message.answer("База продуктов пуста.")
+        await message.answer("Ничего не найдено." if command.args else "База продуктов пуста.")
         return
-    text = "🍏 Список продуктов:\n"
+    text = "🍏 Продукты:\n" if command.args else "🍏 Частые продукты (поиск: /продукты название):\n"
     for p in products:
         text += (
             f"• {p[1]} — "
@@ -764,48 +794,36 @@ async def show_products(message: Message):
         )
     await message.answer(text)
 
+async def _product_keyboard(picker, query, user_id):
+    # С запросом — одна страница результатов поиска, без него — весь справочник по страницам
+    if query:
+        products = await search_products(query, user_id, PAGE_SIZE)
+        return picker.markup([(p[0], p[1]) for p in products]) if products else None
+    return await picker.keyboard(user_id)
+
 @router.message(Command("delproduct"))
-async def delete_product_start(message: Message):
-    from database import get_products
-    products = get_products()
-    if not products:
-        await message.answer("Нет продуктов для удаления.")
+async def delete_product_start(message: Message, command: CommandObject):
+    keyboard = await _product_keyboard(delete_product_picker, command.args, message.from_user.id)
+    if keyboard is None:
+        await message.answer("Ничего не найдено." if command.args else "Нет продуктов для удаления.")
         return
-
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text=p[1], callback_data=f"delprod:{p[0]}")]
-            for p in products
-        ]
-    )
-    await message.answer("Выбери продукт для удаления:", reply_markup=keyboard)
+    await message.answer("Выбери продукт для удаления (или /delproduct название):", reply_markup=keyboard)
 
 @router.callback_query(F.data.startswith("delprod:"))
 async def delete_product_confirm(callback: CallbackQuery):
-    from database import delete_product
     prod_id = int(callback.data.split(":")[1])
-    delete_product(prod_id)
+    await delete_product(prod_id)
     await callback.message.edit_text("❌ Продукт удалён.")
     await callback.answer()
 
 # --- Редактирование продуктов ---
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from database import get_products, update_product
-
 @router.message(Command("editproduct"))
-async def edit_product_start(message: Message):
-    products = get_products()
-    if not products:
-        await message.answer("Нет продуктов для редактирования.")
+async def edit_product_start(message: Message, command: CommandObject):
+    keyboard = await _product_keyboard(edit_product_picker, command.args, message.from_user.id)
+    if keyboard is None:
+        await message.answer("Ничего не найдено." if command.args else "Нет продуктов для редактирования.")
         return
-
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text=p[1], callback_data=f"editprod:{p[0]}")]
-            for p in products
-        ]
-    )
-    await message.answer("Выбери продукт для редактирования:", reply_markup=keyboard)
+    await message.answer("Выбери продукт для редактирования (или /editproduct название):", reply_markup=keyboard)
 
 @router.callback_query(F.data.startswith("editprod:"))
 async def edit_product_select(callback: CallbackQuery, state: FSMContext):
@@ -825,7 +843,7 @@ async def edit_product_save(message: Message, state: FSMContext):
         if len(parts) != 6:
             raise ValueError
         calories, protein, fat, carbs, salt, sugar = map(float, parts)
-        update_product(prod_id, calories, protein, fat, carbs, salt, sugar)
+        await update_product(prod_id, calories, protein, fat, carbs, salt, sugar)
         await message.answer("✅ Продукт обновлён!")
         await state.clear()
     except Exception:
@@ -845,7 +863,7 @@ async def finance_type_received(message: Message, state: FSMContext):
         return
     await state.update_data(type=type_)
     user_id = message.from_user.id
-    categories = get_finance_categories(user_id, "expense" if type_ == "расход" else "income")
+    categories = await category_index.get(user_id, "expense" if type_ == "расход" else "income")
     if categories:
         cat_list = "\n".join([f"{c[0]}. {c[1]}" for c in categories])
         await message.answer(f"Выбери категорию:\n{cat_list}\nИли напиши новую категорию.")
@@ -859,17 +877,11 @@ async def finance_category_received(message: Message, state: FSMContext):
     user_id = message.from_user.id
     data = await state.get_data()
     type_ = data["type"]
-    categories = get_finance_categories(user_id, "expense" if type_ == "расход" else "income")
-    cat_id = None
-    for c in categories:
-        if cat_text == str(c[0]) or cat_text.lower() == c[1].lower():
-            cat_id = c[0]
-            break
+    cat_type = "expense" if type_ == "расход" else "income"
+    cat_id = await category_index.resolve(user_id, cat_type, cat_text)
     if not cat_id:
         # Добавляем новую категорию
-        add_finance_category(user_id, cat_text, "expense" if type_ == "расход" else "income")
-        categories = get_finance_categories(user_id, "expense" if type_ == "расход" else "income")
-        cat_id = categories[-1][0]
+        cat_id = await category_index.add(user_id, cat_type, cat_text)
         await message.answer(f"✅ Категория '{cat_text}' добавлена.")
     await state.update_data(category_id=cat_id)
     await message.answer("Введи сумму (например, 1500):")
@@ -887,15 +899,15 @@ async def finance_amount_received(message: Message, state: FSMContext):
     data = await state.get_data()
     user_id = message.from_user.id
     date = datetime.now().strftime("%Y-%m-%d")
-    add_finance_operation(user_id, date, data["category_id"], amount, "expense" if data["type"] == "расход" else "income")
+    await add_finance_operation(user_id, date, data["category_id"], amount, "expense" if data["type"] == "расход" else "income")
     await message.answer(f"✅ {data['type'].capitalize()} добавлен: {amount} ₽")
     await state.clear()
 
 @router.message(Command("категории"))
 async def show_finance_categories(message: Message):
     user_id = message.from_user.id
-    expenses = get_finance_categories(user_id, "expense")
-    incomes = get_finance_categories(user_id, "income")
+    expenses = await category_index.get(user_id, "expense")
+    incomes = await category_index.get(user_id, "income")
     text = "💸 Категории расходов:\n"
     text += "\n".join([f"• {c[1]}" for c in expenses]) or "—"
     text += "\n\n💰 Категории доходов:\n"
@@ -904,25 +916,30 @@ async def show_finance_categories(message: Message):
 
 @router.message(Command("баланс"))
 async def finance_report(message: Message):
-    from database import get_finance_operations
     user_id = message.from_user.id
     today = datetime.now()
     week_ago = (today - timedelta(days=7)).strftime("%Y-%m-%d")
     today_str = today.strftime("%Y-%m-%d")
-    ops = get_finance_operations(user_id, week_ago, today_str)
+    version = await get_data_version(user_id)
+    totals = await get_finance_totals(user_id, week_ago, today_str)
 
-    if not ops:
+    if not totals["expense"] and not totals["income"]:
         await message.answer("Нет финансовых записей за последние 7 дней.")
         return
 
-    expenses = sum(op[2] for op in ops if op[4] == "expense")
-    incomes = sum(op[2] for op in ops if op[4] == "income")
+    expenses = totals["expense"]
+    incomes = totals["income"]
     text = (
         f"💸 Расходы за неделю: {expenses:.2f} ₽\n"
         f"💰 Доходы за неделю: {incomes:.2f} ₽\n"
         f"📊 Баланс: {incomes - expenses:.2f} ₽"
     )
     await message.answer(text)
+    daily = await get_finance_daily_totals(user_id, week_ago, today_str)
+    await send_chart(
+        message, (user_id, "balance", week_ago, today_str), version,
+        "finance", f"Финансы {week_ago} — {today_str}", finance_series(week_ago, today_str, daily),
+    )
     from utils import last_activity_time
 from datetime import datetime
 
@@ -0,0 +1,482 @@
+import csv
+import functools
+import gzip
+import logging
+import os
+import tempfile
+import time
+from datetime import date, datetime
+
+from openpyxl import load_workbook
+
+import habit_stats
+from db_pool import get_connection
+from summary_cache import summary_cache
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк отдавать в один executemany
+BATCH_SIZE = 5000
+# Через сколько прочитанных строк сообщать о прогрессе
+PROGRESS_EVERY = 10000
+# Сколько ошибок в строках показывать в отчёте
+MAX_ERRORS = 10
+
+
+# === ФОРМАТ ФАЙЛА ===
+# Те же листы и заголовки, что пишет /export, плюс лист финансов.
+# Таблица узнаётся по заголовку (первой строке), порядок колонок любой,
+# незнакомые колонки пропускаются. CSV — одна такая таблица.
+# Логи дня и кастомные поля дополняют уже сохранённые дни; журналы
+# (питание, привычки, финансы) дописываются — повторный импорт их задвоит.
+
+DAY_HEADERS = {
+    "Дата": "date", "Вода (мл)": "water", "Сигареты": "cigarettes", "Зарядка": "exercise",
+    "Расходы": "expenses", "Доход": "income", "Настроение": "mood", "Энергия": "energy",
+    "Мысли": "thoughts",
+}
+NUTRITION_HEADERS = {
+    "Дата": "date", "Приём пищи": "meal_name", "Продукт": "product_name", "Граммы": "weight_grams",
+    "Ккал": "calories", "Белки": "protein", "Жиры": "fat", "Углеводы": "carbs",
+    "Соль": "salt", "Сахар": "sugar", "Клетчатка": "fiber",
+}
+HABIT_LOG_HEADERS = {"Название": "habit_name", "Значение": "value", "Время": "timestamp"}
+FINANCE_HEADERS = {"Дата": "date", "Тип": "type", "Категория": "category", "Сумма": "amount"}
+
+FINANCE_TYPES = {"расход": "expense", "расходы": "expense", "expense": "expense",
+                 "доход": "income", "доходы": "income", "income": "income"}
+BOOL_VALUES = {"да": True, "нет": False, "true": True, "false": False,
+               "1": True, "0": False, "yes": True, "no": False}
+
+
+# === ПРОВЕРКА И ПРИВЕДЕНИЕ ЗНАЧЕНИЙ ===
+# Ячейки xlsx уже типизированы (числа, datetime), CSV — строки; конвертеры понимают оба варианта
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return _date_text(str(value).strip()[:10])
+
+
+@functools.lru_cache(maxsize=4096)
+def _date_text(text):
+    # Даты в истории повторяются (десятки записей в день) — разбираем каждую один раз
+    try:
+        return date.fromisoformat(text).isoformat()
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(text, "%d.%m.%Y").date().isoformat()
+    except ValueError:
+        raise ValueError(f"не дата: {text!r}") from None
+
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return _date(text) + " 00:00:00"
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    # «12,5» и «1 500» из русской локали
+    try:
+        return float(str(value).replace(",", ".").replace(" ", ""))
+    except ValueError:
+        raise ValueError(f"не число: {value!r}") from None
+
+
+def _int(value):
+    number = _float(value)
+    if not number.is_integer():
+        raise ValueError(f"не целое число: {value!r}")
+    return int(number)
+
+
+def _text(value):
+    return str(value)
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    result = BOOL_VALUES.get(str(value).strip().lower())
+    if result is None:
+        raise ValueError(f"не да/нет: {value!r}")
+    return result
+
+
+def _finance_type(value):
+    result = FINANCE_TYPES.get(str(value).strip().lower())
+    if result is None:
+        raise ValueError(f"тип должен быть «расход» или «доход»: {value!r}")
+    return result
+
+
+COLUMN_TYPES = {
+    "date": _date, "water": _float, "cigarettes": _int, "exercise": _text, "expenses": _float,
+    "income": _float, "mood": _int, "energy": _int, "thoughts": _text,
+    "meal_name": _text, "product_name": _text, "weight_grams": _float, "calories": _float,
+    "protein": _float, "fat": _float, "carbs": _float, "salt": _float, "sugar": _float, "fiber": _float,
+    "habit_name": _text, "value": _float, "timestamp": _timestamp,
+    "type": _finance_type, "category": _text, "amount": _float,
+}
+# Типы кастомных полей (custom_fields.field_type)
+CUSTOM_TYPES = {"int": _int, "bool": _bool, "text": _text}
+
+
+# === ЧТЕНИЕ ФАЙЛА ===
+def _read_tables(path):
+    """
+    (название таблицы, итератор строк) для каждого листа xlsx или одна таблица CSV
+    (в том числе .csv.gz из /export csv).
+    Файл читается потоково: xlsx в режиме read_only, CSV построчно.
+    """
+    if path.lower().endswith(".xlsx"):
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                yield ws.title, ws.iter_rows(values_only=True)
+        finally:
+            wb.close()
+        return
+    opener = gzip.open if path.lower().endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8-sig", newline="") as f:
+        try:
+            dialect = csv.Sniffer().sniff(f.read(64 * 1024), delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        f.seek(0)
+        yield "CSV", csv.reader(f, dialect)
+
+
+def _detect(header):
+    titles = {str(t).strip() for t in header if t is not None}
+    if {"Продукт", "Ккал"} & titles:
+        return "nutrition"
+    if {"Название", "Время"} <= titles:
+        return "habit_logs"
+    if {"Категория", "Сумма"} <= titles:
+        return "finance"
+    if "Дата" in titles:
+        return "days"
+    return None
+
+
+def _columns(kind, header, custom_types):
+    """
+    [(номер колонки, имя, конвертер, заголовок)] и список пропущенных заголовков.
+    В логах дня колонки с именами кастомных полей проверяются по их типу.
+    """
+    names = IMPORTERS[kind][0]
+    columns, ignored = [], []
+    for index, title in enumerate(header):
+        title = str(title).strip() if title is not None else ""
+        if title in names:
+            columns.append((index, names[title], COLUMN_TYPES[names[title]], title))
+        elif kind == "days" and title in custom_types:
+            columns.append((index, title, CUSTOM_TYPES.get(custom_types[title], _text), title))
+        elif title:
+            ignored.append(title)
+    return columns, ignored
+
+
+# === ИМПОРТ ===
+# Два этапа: сначала файл разбирается и проверяется во временные таблицы отдельной
+# черновой базы (файл, подключённый через ATTACH: запись в неё не блокирует habits.db
+# и не копится в памяти — temp соединения из пула живёт в RAM), затем одна короткая
+# транзакция BEGIN IMMEDIATE переносит их в настоящие таблицы через INSERT … SELECT.
+# Пока файл читается, остальные писатели и чтения сводок не ждут импорт.
+
+# Имя, под которым черновая база подключается к соединению
+SCRATCH = "import_scratch"
+
+class _Import:
+    """
+    Состояние одного импорта: отчёт, прогресс, затронутые дни и временные таблицы.
+    Черновая база подключается при создании и удаляется в close().
+    """
+
+    def __init__(self, conn, user_id, progress):
+        self.conn = conn
+        self.user_id = user_id
+        self.progress = progress
+        self.read = 0
+        self.rows = {}
+        self.skipped = 0
+        self.errors = []
+        self.ignored = []
+        self.tables_skipped = []
+        self.days = set()
+        self.stages = []  # [(временная таблица, перенос в базу (conn, user_id, таблица))]
+        fd, self.scratch_path = tempfile.mkstemp(prefix="import_", suffix=".db")
+        os.close(fd)
+        conn.execute(f"ATTACH DATABASE ? AS {SCRATCH}", (self.scratch_path,))
+        # Черновик не переживает сбой и удаляется после импорта — fsync не нужен
+        conn.execute(f"PRAGMA {SCRATCH}.synchronous=OFF")
+
+    def parse(self, title, columns, required, rows):
+        """
+        Строки таблицы → {имя: значение}. Пустые строки пропускаются молча,
+        строки с неверными значениями — с записью в отчёт.
+        """
+        for line, row in enumerate(rows, start=2):
+            self.read += 1
+            if self.progress and self.read % PROGRESS_EVERY == 0:
+                self.progress(self.read)
+            values = {}
+            try:
+                for index, name, convert, header in columns:
+                    cell = row[index] if index < len(row) else None
+                    if cell is not None and cell != "":
+                        values[name] = convert(cell)
+            except ValueError as e:
+                self.error(title, line, f"{header}: {e}")
+                continue
+            missing = [name for name in required if name not in values]
+            if missing:
+                if any(cell not in (None, "") for cell in row):
+                    self.error(title, line, f"нет значения: {', '.join(TITLES[name] for name in missing)}")
+                continue
+            yield values
+
+    def error(self, title, line, text):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"{title}, строка {line}: {text}")
+
+    def stage(self, columns, copy):
+        """
+        Создаёт в черновой базе таблицу с колонками columns (без типов — значения
+        хранятся как есть) и запоминает, как перенести её в базу.
+        Возвращает SQL вставки строки в неё.
+        """
+        table = f"{SCRATCH}.stage_{len(self.stages)}"
+        self.conn.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+        self.stages.append((table, copy))
+        return f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})"
+
+    def insert(self, sql, batch):
+        if batch:
+            self.conn.executemany(sql, batch)
+            batch.clear()
+
+    def count(self, kind, n):
+        self.rows[kind] = self.rows.get(kind, 0) + n
+
+    def close(self):
+        self.stages = []
+        self.conn.execute(f"DETACH DATABASE {SCRATCH}")
+        os.remove(self.scratch_path)
+
+
+def _import_days(job, title, columns, rows):
+    core = [c[1] for c in columns if c[1] in DAY_HEADERS.values() and c[1] != "date"]
+    custom = [c[1] for c in columns if c[1] not in DAY_HEADERS.values()]
+    day_sql = job.stage(["date", *core], functools.partial(_copy_days, core=core))
+    custom_sql = job.stage(["date", "field_name", "value"], _copy_custom_values)
+    days, custom_rows = [], []
+    for values in job.parse(title, columns, ("date",), rows):
+        day = values["date"]
+        job.days.add(day)
+        days.append((day, *[values.get(c) for c in core]))
+        custom_rows.extend((day, name, values[name]) for name in custom if name in values)
+        if len(days) >= BATCH_SIZE:
+            job.count("days", len(days))
+            job.insert(day_sql, days)
+            job.insert(custom_sql, custom_rows)
+    job.count("days", len(days))
+    job.insert(day_sql, days)
+    job.insert(custom_sql, custom_rows)
+
+
+def _copy_days(conn, user_id, table, core):
+    if not core:
+        conn.execute(f"""
+            INSERT OR IGNORE INTO daily_logs (user_id, date) SELECT ?, date FROM {table}
+        """, (user_id,))
+        return
+    # Строки переносятся в порядке файла: у дублей дня побеждает последняя непустая ячейка
+    conn.execute(f"""
+        INSERT INTO daily_logs (user_id, date, {", ".join(core)})
+        SELECT ?, date, {", ".join(core)} FROM {table} WHERE true ORDER BY rowid
+        ON CONFLICT (user_id, date) DO UPDATE SET
+            {", ".join(f"{c} = COALESCE(excluded.{c}, {c})" for c in core)}
+    """, (user_id,))
+
+
+def _copy_custom_values(conn, user_id, table):
+    conn.execute(f"""
+        INSERT OR REPLACE INTO daily_custom_values (user_id, date, field_name, value)
+        SELECT ?, date, field_name, value FROM {table} ORDER BY rowid
+    """, (user_id,))
+
+
+def _import_nutrition(job, title, columns, rows):
+    names = list(NUTRITION_HEADERS.values())
+    sql = job.stage(names, functools.partial(_copy_rows, target="nutrition_logs", names=names))
+    batch = []
+    for values in job.parse(title, columns, ("date", "product_name"), rows):
+        job.days.add(values["date"])
+        batch.append([values.get(n) for n in names])
+        if len(batch) >= BATCH_SIZE:
+            job.count("nutrition", len(batch))
+            job.insert(sql, batch)
+    job.count("nutrition", len(batch))
+    job.insert(sql, batch)
+
+
+def _import_habit_logs(job, title, columns, rows):
+    names = ["habit_name", "value", "timestamp"]
+    sql = job.stage(names, functools.partial(_copy_rows, target="habit_logs", names=names))
+    batch = []
+    for values in job.parse(title, columns, names, rows):
+        batch.append((values["habit_name"], values["value"], values["timestamp"]))
+        if len(batch) >= BATCH_SIZE:
+            job.count("habit_logs", len(batch))
+            job.insert(sql, batch)
+    job.count("habit_logs", len(batch))
+    job.insert(sql, batch)
+
+
+def _copy_rows(conn, user_id, table, target, names):
+    conn.execute(f"""
+        INSERT INTO {target} (user_id, {", ".join(names)})
+        SELECT ?, {", ".join(names)} FROM {table} ORDER BY rowid
+    """, (user_id,))
+
+
+def _import_finance(job, title, columns, rows):
+    names = ["date", "type", "category", "amount"]
+    sql = job.stage(names, _copy_finance)
+    batch = []
+    for values in job.parse(title, columns, names, rows):
+        batch.append([values[n] for n in names])
+        if len(batch) >= BATCH_SIZE:
+            job.count("finance", len(batch))
+            job.insert(sql, batch)
+    job.count("finance", len(batch))
+    job.insert(sql, batch)
+
+
+def _copy_finance(conn, user_id, table):
+    # Новые категории — в порядке первого упоминания в файле
+    conn.execute(f"""
+        INSERT INTO finance_categories (user_id, name, type)
+        SELECT ?, category, type FROM {table} s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM finance_categories c
+            WHERE c.user_id = ? AND c.type = s.type AND c.name = s.category
+        )
+        GROUP BY category, type
+        ORDER BY MIN(rowid)
+    """, (user_id, user_id))
+    category = """(
+        SELECT MIN(c.id) FROM finance_categories c
+        WHERE c.user_id = ? AND c.type = s.type AND c.name = s.category
+    )"""
+    conn.execute(f"""
+        INSERT INTO finance_operations (user_id, date, category_id, amount, type)
+        SELECT ?, date, {category}, amount, type FROM {table} s ORDER BY rowid
+    """, (user_id, user_id))
+    # Дневные итоги — как в add_finance_operation, но одной вставкой на (день, категория, тип)
+    conn.execute(f"""
+        INSERT INTO finance_daily_rollups (user_id, date, category_id, type, total, ops)
+        SELECT ?, date, {category} AS category_id, type, SUM(amount), COUNT(*)
+        FROM {table} s
+        WHERE true
+        GROUP BY date, category_id, type
+        ON CONFLICT (user_id, date, category_id, type) DO UPDATE SET
+            total = total + excluded.total,
+            ops = ops + excluded.ops
+    """, (user_id, user_id))
+
+
+# вид таблицы -> (заголовки, функция импорта)
+IMPORTERS = {
+    "days": (DAY_HEADERS, _import_days),
+    "nutrition": (NUTRITION_HEADERS, _import_nutrition),
+    "habit_logs": (HABIT_LOG_HEADERS, _import_habit_logs),
+    "finance": (FINANCE_HEADERS, _import_finance),
+}
+# имя колонки -> заголовок (для сообщений об ошибках)
+TITLES = {name: title for headers, _ in IMPORTERS.values() for title, name in headers.items()}
+
+
+def import_file(user_id, path, progress=None):
+    """
+    Импортирует CSV/XLSX: разбор во временные таблицы, затем перенос одной транзакцией.
+    При любой ошибке чтения не сохраняется ничего, а строки с неверными значениями
+    пропускаются и попадают в отчёт. progress(прочитано строк) вызывается из потока импорта.
+    Возвращает отчёт: rows {вид: строк}, read, skipped, errors, ignored, tables_skipped, duration.
+    """
+    started = time.monotonic()
+    conn = get_connection()
+    custom_types = dict(conn.execute(
+        "SELECT field_name, field_type FROM custom_fields WHERE user_id = ?", (user_id,)
+    ))
+    job = _Import(conn, user_id, progress)
+
+    try:
+        # Этап 1: разбор и проверка — пишет только в черновую базу
+        try:
+            for title, rows in _read_tables(path):
+                header = next(rows, None)
+                kind = _detect(header) if header else None
+                if kind is None:
+                    job.tables_skipped.append(title)
+                    continue
+                columns, ignored = _columns(kind, header, custom_types)
+                job.ignored.extend(f"{title}: {name}" for name in ignored)
+                IMPORTERS[kind][1](job, title, columns, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        parsed = time.monotonic()
+
+        # Этап 2: перенос в базу — единственное место, где держится блокировка записи
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table, copy in job.stages:
+                copy(conn, user_id, table)
+            # Суммы затронутых дней пересчитаются при следующем чтении, серии — сразу
+            conn.executemany(
+                "DELETE FROM daily_summaries WHERE user_id = ? AND date = ?",
+                [(user_id, day) for day in job.days]
+            )
+            if job.rows.get("habit_logs"):
+                habit_stats.rebuild(conn, user_id)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        job.close()
+    if job.days:
+        summary_cache.invalidate_user(user_id)
+
+    report = {
+        "rows": job.rows,
+        "read": job.read,
+        "skipped": job.skipped,
+        "errors": job.errors,
+        "ignored": job.ignored,
+        "tables_skipped": job.tables_skipped,
+        "duration": time.monotonic() - started,
+    }
+    logger.info(
+        f"[IMPORT] user={user_id}: {job.rows}, пропущено {job.skipped} строк, "
+        f"{job.read / max(report['duration'], 1e-9):.0f} строк/с, "
+        f"запись {report['duration'] - (parsed - started):.2f} с"
+    )
+    return report
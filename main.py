@@ -7,7 +7,21 @@ from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
 
-from config import TOKEN
+from config import (
+    TOKEN, FSM_STORAGE, FSM_SHARED, BOT_MODE,
+    WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT,
+    UPDATE_SHARDS, UPDATE_QUEUE_SIZE, METRICS_HOST, METRICS_PORT
+)
+from fsm_storage import SQLiteStorage
+from db_pool import close_all
+from db_async import init_db, shutdown as shutdown_db
+from reminder_engine import reminder_engine
+from webhook import run_webhook
+from update_scheduler import UpdateSchedulerMiddleware
+from metrics import metrics, MetricsMiddleware, start_metrics_server
+from chart_cache import chart_cache
+from habit_cache import habit_cache
+from summary_cache import summary_cache
 from handlers.handlers_logic import register_handlers
 
 # 🫀 Настройка логгирования
@@ -20,32 +34,109 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+# 📊 Текущие значения для метрик: очереди шардов, кэши, состояния FSM
+def _register_collectors(storage, update_scheduler):
+    def queues():
+        return [
+            ("bot_update_queue_size", {"shard": s["shard"]}, s["queued"])
+            for s in update_scheduler.stats()
+        ]
+
+    def caches():
+        values = []
+        for cache, stats in (
+            ("habits", habit_cache.stats()),
+            ("summaries", summary_cache.stats()),
+            ("charts", chart_cache.stats()),
+        ):
+            values.append(("bot_cache_hit_ratio", {"cache": cache}, stats["hit_ratio"]))
+            values.append(("bot_cache_evictions", {"cache": cache}, stats["evictions"]))
+        if isinstance(storage, SQLiteStorage):
+            total = storage.hits + storage.misses
+            values.append(("bot_cache_hit_ratio", {"cache": "fsm"}, storage.hits / total if total else 0.0))
+        return values
+
+    async def fsm_states():
+        if isinstance(storage, SQLiteStorage):
+            counts = await storage.state_counts()
+        else:
+            counts = {}
+            for record in storage.storage.values():
+                if record.state:
+                    counts[record.state] = counts.get(record.state, 0) + 1
+        return [("bot_fsm_states", {"state": state}, count) for state, count in counts.items()]
+
+    for collector in (queues, caches, fsm_states):
+        metrics.add_collector(collector)
+
+
 # 🫀 Инициализация и запуск бота
 async def main():
     logger.info("Запуск бота...")
 
+    # 🗄 Таблицы и миграции схемы (индексы, новые таблицы) — до первого запроса к базе
+    await init_db()
+
     # 🔑 Создание экземпляра бота с токеном и HTML-парсингом
     bot = Bot(
         token=TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
 
-    # 🧠 Хранилище состояний в оперативной памяти
-    storage = MemoryStorage()
+    # 🧠 Хранилище состояний: SQLite (общее для процессов) или оперативная память
+    storage = SQLiteStorage(shared=FSM_SHARED) if FSM_STORAGE == "sqlite" else MemoryStorage()
+    # Несколько процессов пишут одну базу: кэши сводок и графиков одного процесса
+    # не видят чужих записей, поэтому читаем всегда из базы
+    if FSM_SHARED:
+        summary_cache.disable()
+        chart_cache.disable()
 
     # 🫂 Диспетчер событий
     dp = Dispatcher(storage=storage)
 
+    # 🧵 Порядок внутри пользователя, параллельность между пользователями
+    update_scheduler = UpdateSchedulerMiddleware(shards=UPDATE_SHARDS, queue_size=UPDATE_QUEUE_SIZE)
+    update_scheduler.install(dp)
+
+    # 📊 Время обработки по командам, задержка цикла событий, эндпоинт /metrics
+    dp.update.middleware(MetricsMiddleware())
+    _register_collectors(storage, update_scheduler)
+    metrics.start_loop_monitor()
+    metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+
     # 🔌 Регистрация всех хендлеров
     register_handlers(dp)
 
-    # 🚀 Запуск поллинга
+    # 🔔 Планировщик напоминаний (загружает все напоминания из базы)
+    await reminder_engine.start(bot)
+
+    # 🚀 Запуск: вебхук, если настроен, иначе поллинг
     try:
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            await run_webhook(
+                dp, bot,
+                base_url=WEBHOOK_BASE_URL,
+                path=WEBHOOK_PATH,
+                host=WEBAPP_HOST,
+                port=WEBAPP_PORT,
+                secret_token=WEBHOOK_SECRET
+            )
+        else:
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
     except Exception as e:
         logger.exception(f"Ошибка при запуске бота: {e}")
     finally:
+        await reminder_engine.stop()
+        await metrics.stop_loop_monitor()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await update_scheduler.close()
+        await storage.close()
         await bot.session.close()
+        shutdown_db()
+        close_all()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,225 @@
+import asyncio
+import bisect
+import logging
+import threading
+import time
+
+from aiogram import BaseMiddleware
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержки, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Как часто проверять задержку цикла событий
+LOOP_LAG_INTERVAL = 0.5
+# Сколько разных меток команд держать: случайные /xyz от пользователей уходят в "other"
+MAX_HANDLER_LABELS = 200
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Верхняя граница корзины, в которую попал q-й процентиль
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+# === РЕЕСТР МЕТРИК ===
+class Metrics:
+    """
+    Счётчики и гистограммы задержек с метками, общие для процесса.
+    Пишутся и из цикла событий, и из потоков db_async, поэтому под замком.
+    collectors — функции (в том числе async), которые при выгрузке
+    возвращают текущие значения [(имя, {метки}, значение)]: очереди, кэши, FSM.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # (имя, метки) -> число
+        self._histograms = {}  # (имя, метки) -> _Histogram
+        self._gauges = {}      # (имя, метки) -> значение
+        self._collectors = []
+        self._lag_task = None
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, labels=None, value=1):
+        key = self._key(name, labels or {})
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(value)
+
+    def set_gauge(self, name, labels, value):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def histograms(self, name):
+        """
+        {значение метки name: гистограмма} для отчётов (/stats).
+        """
+        with self._lock:
+            return {dict(k[1]).get("name", ""): h for k, h in self._histograms.items() if k[0] == name}
+
+    async def gauges(self):
+        """
+        {(имя, метки): значение} — сохранённые значения и результаты сборщиков.
+        """
+        with self._lock:
+            values = dict(self._gauges)
+        for collector in self._collectors:
+            try:
+                result = collector()
+                if asyncio.iscoroutine(result):
+                    result = await result
+            except Exception as e:
+                logger.warning(f"[METRICS] сборщик {collector} упал: {e}")
+                continue
+            for name, labels, value in result:
+                values[self._key(name, labels)] = value
+        return values
+
+    # --- Формат Prometheus (text exposition) ---
+    async def render_prometheus(self):
+        lines = []
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: (list(h.counts), h.sum, h.count) for k, h in self._histograms.items()}
+
+        def fmt(labels, extra=()):
+            pairs = [f'{k}="{_escape(v)}"' for k, v in (*labels, *extra)]
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+
+        for (name, labels), value in sorted(counters.items()):
+            lines.append(f"{name}{fmt(labels)} {value}")
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS + ("+Inf",), counts):
+                cumulative += bucket
+                lines.append(f"{name}_bucket{fmt(labels, (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{fmt(labels)} {total}")
+            lines.append(f"{name}_count{fmt(labels)} {count}")
+        for (name, labels), value in sorted((await self.gauges()).items()):
+            lines.append(f"{name}{fmt(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    # --- Задержка цикла событий ---
+    def start_loop_monitor(self, interval=LOOP_LAG_INTERVAL):
+        if self._lag_task is None:
+            self._lag_task = asyncio.create_task(self._monitor_loop(interval))
+
+    async def stop_loop_monitor(self):
+        if self._lag_task:
+            self._lag_task.cancel()
+            await asyncio.gather(self._lag_task, return_exceptions=True)
+            self._lag_task = None
+
+    async def _monitor_loop(self, interval):
+        # Насколько позже запланированного просыпается sleep — столько цикл был занят
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            lag = max(time.monotonic() - started - interval, 0.0)
+            self.set_gauge("bot_event_loop_lag_last_seconds", {}, lag)
+            self.observe("bot_event_loop_lag_seconds", {}, lag)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
+
+
+# === MIDDLEWARE: ЗАДЕРЖКА ОБРАБОТКИ ПО КОМАНДАМ ===
+def _handler_name(update):
+    """
+    Метка апдейта: команда (/history), префикс callback_data (delprod) или тип апдейта.
+    """
+    message = update.message or update.edited_message
+    if message is not None:
+        text = message.text or message.caption or ""
+        if text.startswith("/"):
+            return text.split(maxsplit=1)[0].split("@", 1)[0]
+        return "message"
+    if update.callback_query is not None:
+        return "callback:" + (update.callback_query.data or "").split(":", 1)[0]
+    return update.event_type
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Middleware на dp.update: время обработки каждого апдейта по командам
+    и число ошибок. Ставится внутренним (dp.update.middleware), чтобы
+    не считать время ожидания в очереди шарда.
+    """
+
+    def __init__(self, max_labels=MAX_HANDLER_LABELS):
+        self.max_labels = max_labels
+        self._labels = set()
+
+    async def __call__(self, handler, event, data):
+        name = _handler_name(event)
+        if name not in self._labels:
+            if len(self._labels) >= self.max_labels:
+                name = "other"
+            else:
+                self._labels.add(name)
+        state = data.get("raw_state")
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await handler(event, data)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            metrics.observe("bot_handler_duration_seconds", {"name": name}, time.perf_counter() - started)
+            metrics.inc("bot_updates_total", {"name": name, "status": status})
+            if state:
+                metrics.inc("bot_fsm_steps_total", {"state": state})
+
+
+# === HTTP-ЭНДПОИНТ ДЛЯ PROMETHEUS ===
+async def start_metrics_server(host, port, path="/metrics"):
+    """
+    Отдаёт метрики в текстовом формате Prometheus. Возвращает runner для cleanup().
+    """
+    async def handle(_request):
+        return web.Response(text=await metrics.render_prometheus(), content_type="text/plain")
+
+    app = web.Application()
+    app.router.add_get(path, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"[METRICS] http://{host}:{port}{path}")
+    return runner
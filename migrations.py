@@ -0,0 +1,249 @@
+import json
+import logging
+import sqlite3
+
+import habit_stats
+
+logger = logging.getLogger(__name__)
+
+
+# === МИГРАЦИИ СХЕМЫ ===
+# Версия схемы хранится в PRAGMA user_version. Каждая миграция — функция,
+# которая получает соединение; применяются по порядку, один раз.
+# Новые миграции только добавляются в конец списка, старые не меняются.
+
+def _v1_indexes(conn):
+    # Привычки: выборки по пользователю и конкретной привычке в хронологии
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_habit_logs_user_habit_ts
+        ON habit_logs (user_id, habit_name, timestamp, value)
+    """)
+    # Питание: суммы по дням — индекс покрывает все суммируемые колонки
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_nutrition_logs_user_date
+        ON nutrition_logs (user_id, date, calories, protein, fat, carbs, salt, sugar, fiber)
+    """)
+    # Логи дня: /history, /week, /month, /export
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_daily_logs_user_date
+        ON daily_logs (user_id, date)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_custom_fields_user
+        ON custom_fields (user_id, field_name, field_type)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_meals_user_date
+        ON meals (user_id, date)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_products_name
+        ON products (name)
+    """)
+    # Финансы: категории по типу и операции за период
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_finance_categories_user_type
+        ON finance_categories (user_id, type, name)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_finance_operations_user_date
+        ON finance_operations (user_id, date, type, amount, category_id)
+    """)
+
+
+# Ключи старого JSON-лога дня → колонки новой таблицы daily_logs
+_DAILY_COLUMNS = ("water", "cigarettes", "exercise", "expenses", "income", "mood", "energy", "thoughts")
+_DAILY_ALIASES = {
+    "вода": "water",
+    "smoke": "cigarettes",
+    "activity": "exercise",
+}
+
+
+def _v2_normalize_daily_logs(conn):
+    """
+    Разбирает daily_logs на типизированные колонки + таблицу daily_custom_values.
+    Поддерживает обе старые схемы: JSON в колонке data и колонки + custom_data (JSON).
+    Дубли за один день схлопываются: остаётся последняя запись.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(daily_logs)")]
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_custom_values (
+            user_id INTEGER,
+            date TEXT,
+            field_name TEXT,
+            value,
+            PRIMARY KEY (user_id, date, field_name)
+        ) WITHOUT ROWID
+    """)
+    if "data" not in columns and "custom_data" not in columns:
+        return
+
+    conn.execute("ALTER TABLE daily_logs RENAME TO daily_logs_old")
+    conn.execute("DROP INDEX IF EXISTS idx_daily_logs_user_date")
+    conn.execute("""
+        CREATE TABLE daily_logs (
+            user_id INTEGER,
+            date TEXT,
+            water REAL,
+            cigarettes INTEGER,
+            exercise TEXT,
+            expenses REAL,
+            income REAL,
+            mood INTEGER,
+            energy INTEGER,
+            thoughts TEXT,
+            PRIMARY KEY (user_id, date)
+        )
+    """)
+
+    if "data" in columns:
+        old_rows = conn.execute("SELECT user_id, date, data FROM daily_logs_old ORDER BY rowid")
+    else:
+        old_rows = conn.execute(f"""
+            SELECT user_id, date, custom_data, {", ".join(_DAILY_COLUMNS)}
+            FROM daily_logs_old ORDER BY rowid
+        """)
+
+    for row in old_rows.fetchall():
+        user_id, day, raw = row[:3]
+        try:
+            extra = json.loads(raw) if raw else {}
+        except ValueError:
+            extra = {}
+        core = dict(zip(_DAILY_COLUMNS, row[3:]))
+
+        custom = {}
+        for key, value in extra.items():
+            column = _DAILY_ALIASES.get(key, key)
+            if "data" in columns and column in _DAILY_COLUMNS:
+                core[column] = value
+            elif key == "food" and isinstance(value, list):
+                # Еда из старого JSON переезжает в nutrition_logs
+                conn.executemany("""
+                    INSERT INTO nutrition_logs (user_id, date, meal_name, product_name, weight_grams)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [(user_id, day, f.get("type"), f.get("product"), f.get("grams")) for f in value])
+            else:
+                custom[key] = value if isinstance(value, (int, float, str)) or value is None else json.dumps(value)
+
+        conn.execute(f"""
+            INSERT OR REPLACE INTO daily_logs (user_id, date, {", ".join(_DAILY_COLUMNS)})
+            VALUES (?, ?, {", ".join("?" * len(_DAILY_COLUMNS))})
+        """, (user_id, day, *(core.get(c) for c in _DAILY_COLUMNS)))
+        conn.execute("DELETE FROM daily_custom_values WHERE user_id = ? AND date = ?", (user_id, day))
+        conn.executemany(
+            "INSERT INTO daily_custom_values (user_id, date, field_name, value) VALUES (?, ?, ?, ?)",
+            [(user_id, day, name, value) for name, value in custom.items()]
+        )
+
+    conn.execute("DROP TABLE daily_logs_old")
+
+
+def _v3_finance_rollups(conn):
+    # Первичное заполнение дневных итогов по уже сохранённым операциям
+    conn.execute("DELETE FROM finance_daily_rollups")
+    # Операции без категории — под category_id = 0 (в ключе WITHOUT ROWID NULL нельзя)
+    conn.execute("""
+        INSERT INTO finance_daily_rollups (user_id, date, category_id, type, total, ops)
+        SELECT user_id, date, COALESCE(category_id, 0), type, SUM(amount), COUNT(*)
+        FROM finance_operations
+        GROUP BY user_id, date, COALESCE(category_id, 0), type
+    """)
+    # Keyset-пагинация «последних операций» по id
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_finance_operations_user_id
+        ON finance_operations (user_id, id)
+    """)
+
+
+def _v4_product_search(conn):
+    # Частота продуктов по уже записанной еде: meals по id, nutrition_logs по названию
+    conn.execute("DELETE FROM product_usage")
+    conn.execute("""
+        INSERT INTO product_usage (user_id, product_id, uses)
+        SELECT user_id, product_id, COUNT(*) FROM (
+            SELECT user_id, product_id FROM meals WHERE product_id IS NOT NULL
+            UNION ALL
+            SELECT user_id, (SELECT MIN(id) FROM products p WHERE p.name = n.product_name)
+            FROM nutrition_logs n
+        )
+        WHERE product_id IS NOT NULL
+        GROUP BY user_id, product_id
+    """)
+
+    # Триграммный полнотекстовый индекс по названиям (внешний контент — таблица products)
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts
+            USING fts5(name, content='products', content_rowid='id', tokenize='trigram')
+        """)
+    except sqlite3.OperationalError as e:
+        # Сборка SQLite без FTS5 или старше 3.34 — поиск работает через LIKE
+        logger.warning(f"[MIGRATION] FTS5 trigram недоступен, поиск продуктов без индекса: {e}")
+        return
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, name) VALUES (new.id, new.name);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO products_fts (rowid, name) VALUES (new.id, new.name);
+        END
+    """)
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+
+def _v5_habit_streaks(conn):
+    # Начальные серии по уже накопленным логам привычек
+    habit_stats.rebuild(conn)
+
+
+def _v6_drop_daily_logs_index(conn):
+    # После v2 у daily_logs всегда PRIMARY KEY (user_id, date) — индекс из v1 его дублирует.
+    # v2 удалял его только при пересборке старой таблицы; на новой базе он оставался
+    conn.execute("DROP INDEX IF EXISTS idx_daily_logs_user_date")
+
+
+MIGRATIONS = [
+    (1, "индексы по (user_id, date) и (user_id, habit_name, timestamp)", _v1_indexes),
+    (2, "daily_logs: JSON → типизированные колонки + daily_custom_values", _v2_normalize_daily_logs),
+    (3, "дневные итоги по финансам finance_daily_rollups", _v3_finance_rollups),
+    (4, "поиск продуктов: products_fts (триграммы) и частота product_usage", _v4_product_search),
+    (5, "серии привычек habit_streaks по habit_logs", _v5_habit_streaks),
+    (6, "daily_logs: без индекса, дублирующего первичный ключ", _v6_drop_daily_logs_index),
+]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn):
+    """
+    Применяет все миграции новее текущей версии схемы.
+    Каждая миграция выполняется в своей транзакции вместе с обновлением версии.
+    """
+    current = get_schema_version(conn)
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"[MIGRATION] v{version}: {description}")
+        # Явный BEGIN: DDL и DML миграции откатываются вместе при ошибке
+        conn.execute("BEGIN")
+        try:
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        current = version
+    return current
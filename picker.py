@@ -0,0 +1,70 @@
+from aiogram import F
+from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
+
+from database import PAGE_SIZE
+
+
+# === ПОСТРАНИЧНЫЙ ВЫБОР ИЗ СПИСКА ===
+class Picker:
+    """
+    Инлайн-клавиатура для выбора из списка любой длины, по странице за раз.
+    fetch(user_id, after_id, before_id, limit) -> (строки [(id, текст)], есть ли ещё)
+    Курсор в callback_data — id крайней строки страницы, поэтому данные кнопок
+    короткие (лимит Telegram — 64 байта), а запрос страницы не зависит от её номера.
+
+    Кнопка строки: "<select_prefix>:<id>", листание: "<name>:<n|p>:<id>".
+    """
+
+    def __init__(self, name, select_prefix, fetch, page_size=PAGE_SIZE):
+        self.name = name
+        self.select_prefix = select_prefix
+        self.fetch = fetch
+        self.page_size = page_size
+
+    def register(self, router):
+        router.callback_query(F.data.startswith(f"{self.name}:"))(self._navigate)
+
+    async def keyboard(self, user_id, after_id=None, before_id=None):
+        """
+        Клавиатура страницы или None, если список пуст.
+        """
+        rows, has_more = await self.fetch(user_id, after_id, before_id, self.page_size)
+        if not rows and (after_id is not None or before_id is not None):
+            # Строку-курсор удалили — начинаем с первой страницы
+            after_id = before_id = None
+            rows, has_more = await self.fetch(user_id, None, None, self.page_size)
+        if not rows:
+            return None
+
+        if before_id is not None:
+            return self.markup(rows, has_prev=has_more, has_next=True)
+        return self.markup(rows, has_prev=after_id is not None, has_next=has_more)
+
+    def markup(self, rows, has_prev=False, has_next=False):
+        """
+        Клавиатура из готовых строк [(id, текст)], например результатов поиска.
+        """
+        buttons = [
+            [InlineKeyboardButton(text=str(label), callback_data=f"{self.select_prefix}:{row_id}")]
+            for row_id, label in rows
+        ]
+        nav = []
+        if has_prev:
+            nav.append(InlineKeyboardButton(text="◀️", callback_data=f"{self.name}:p:{rows[0][0]}"))
+        if has_next:
+            nav.append(InlineKeyboardButton(text="▶️", callback_data=f"{self.name}:n:{rows[-1][0]}"))
+        if nav:
+            buttons.append(nav)
+        return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+    async def _navigate(self, callback: CallbackQuery):
+        _, direction, cursor = callback.data.split(":")
+        if direction == "p":
+            markup = await self.keyboard(callback.from_user.id, before_id=int(cursor))
+        else:
+            markup = await self.keyboard(callback.from_user.id, after_id=int(cursor))
+        if markup is None:
+            await callback.message.edit_text("Список пуст.")
+        else:
+            await callback.message.edit_reply_markup(reply_markup=markup)
+        await callback.answer()
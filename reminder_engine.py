@@ -0,0 +1,140 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from db_async import get_all_reminders
+
+logger = logging.getLogger(__name__)
+
+# Telegram пропускает около 30 сообщений в секунду на бота
+SEND_RATE_PER_SEC = 30
+REMINDER_TEXT = "🔔 Время заполнить дневник! Используй /day"
+
+
+def next_fire_time(time_str, now=None):
+    """
+    Ближайший момент HH:MM, строго позже now (сегодня или завтра).
+    """
+    now = now or datetime.now()
+    hours, minutes = map(int, time_str.split(":"))
+    fire = now.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+    if fire <= now:
+        fire += timedelta(days=1)
+    return fire
+
+
+# === ПЛАНИРОВЩИК НАПОМИНАНИЙ ===
+class ReminderEngine:
+    """
+    Куча напоминаний, упорядоченная по времени следующего срабатывания.
+    Цикл спит ровно до ближайшего напоминания (без опроса раз в минуту),
+    срабатывание и перепланирование стоят O(log n).
+    Отмена ленивая: у каждого пользователя есть номер поколения,
+    устаревшие записи кучи просто пропускаются.
+    """
+
+    def __init__(self, send_rate=SEND_RATE_PER_SEC):
+        self._heap = []          # (время срабатывания, user_id, поколение)
+        self._times = {}         # user_id -> "HH:MM"
+        self._generation = {}    # user_id -> номер актуальной записи в куче
+        self._send_interval = 1 / send_rate
+        self._wakeup = asyncio.Event()
+        self._send_queue = asyncio.Queue()
+        self._tasks = []
+        self._bot = None
+
+    async def start(self, bot):
+        self._bot = bot
+        for user_id, time_str in await get_all_reminders():
+            self.schedule(user_id, time_str)
+        logger.info(f"[REMINDERS] загружено напоминаний: {len(self._times)}")
+        self._tasks = [
+            asyncio.create_task(self._run()),
+            asyncio.create_task(self._sender()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # --- Синхронизация с /remind и /remind_off ---
+    def schedule(self, user_id, time_str):
+        generation = self._generation.get(user_id, 0) + 1
+        self._generation[user_id] = generation
+        self._times[user_id] = time_str
+        heapq.heappush(self._heap, (next_fire_time(time_str), user_id, generation))
+        self._compact()
+        self._wakeup.set()
+
+    def cancel(self, user_id):
+        if self._times.pop(user_id, None) is not None:
+            self._generation[user_id] = self._generation.get(user_id, 0) + 1
+            self._compact()
+
+    def __len__(self):
+        return len(self._times)
+
+    def _is_current(self, user_id, generation):
+        return user_id in self._times and self._generation.get(user_id) == generation
+
+    def _compact(self):
+        # Если устаревших записей стало больше половины — пересобираем кучу
+        if len(self._heap) > 2 * len(self._times) + 64:
+            self._heap = [e for e in self._heap if self._is_current(e[1], e[2])]
+            heapq.heapify(self._heap)
+
+    # --- Основной цикл ---
+    def pop_due(self, now):
+        """
+        Снимает с кучи все сработавшие напоминания и ставит их на ближайшее HH:MM после now.
+        Пропущенные сутки (сон машины, перевод часов) дают одно напоминание, а не по одному на день.
+        Возвращает список user_id, которым пора отправить напоминание.
+        """
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, user_id, generation = heapq.heappop(self._heap)
+            if not self._is_current(user_id, generation):
+                continue
+            due.append(user_id)
+            heapq.heappush(self._heap, (next_fire_time(self._times[user_id], now), user_id, generation))
+        return due
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            if self._heap:
+                timeout = max((self._heap[0][0] - datetime.now()).total_seconds(), 0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+                continue  # расписание поменялось — пересчитываем ближайшее время
+            except asyncio.TimeoutError:
+                pass
+            for user_id in self.pop_due(datetime.now()):
+                self._send_queue.put_nowait(user_id)
+
+    # --- Очередь отправки с ограничением скорости ---
+    async def _sender(self):
+        while True:
+            user_id = await self._send_queue.get()
+            try:
+                await self._bot.send_message(user_id, REMINDER_TEXT)
+            except TelegramRetryAfter as e:
+                logger.warning(f"[REMINDERS] лимит Telegram, ждём {e.retry_after} с")
+                await asyncio.sleep(e.retry_after)
+                self._send_queue.put_nowait(user_id)
+            except TelegramForbiddenError:
+                logger.info(f"[REMINDERS] user={user_id} заблокировал бота")
+            except Exception as e:
+                logger.exception(f"[REMINDERS] не удалось отправить user={user_id}: {e}")
+            finally:
+                self._send_queue.task_done()
+            await asyncio.sleep(self._send_interval)
+
+
+reminder_engine = ReminderEngine()
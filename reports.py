@@ -0,0 +1,227 @@
+import asyncio
+import logging
+from html import escape
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from database import empty_nutrition
+
+logger = logging.getLogger(__name__)
+
+# Лимит Telegram на длину одного сообщения
+MESSAGE_LIMIT = 4096
+# Сколько готовых сообщений держать в очереди отправки, пока рендерятся следующие
+SEND_QUEUE_SIZE = 2
+
+DAY_SEPARATOR = "─" * 25
+
+
+# === РЕНДЕР ОТЧЁТОВ ПО ДНЯМ ===
+def render_day(row, nutrition, custom_names):
+    """
+    Блок одного дня. row — строка get_daily_logs, nutrition — сумма за день.
+    Пользовательский текст экранируется: отчёт уходит с parse_mode=HTML.
+    """
+    (
+        date, water, cigs, exercise, expenses,
+        income, mood, energy, thoughts, custom_dict
+    ) = row
+    nutrition = nutrition or empty_nutrition()
+    lines = [
+        f"📅 <b>{date}</b>",
+        f"💧 Вода: {water} мл",
+        "🍽 Питание:",
+        f"  • Калории: {nutrition['calories']:.0f} ккал",
+        f"  • Белки: {nutrition['protein']:.1f} г",
+        f"  • Жиры: {nutrition['fat']:.1f} г",
+        f"  • Углеводы: {nutrition['carbs']:.1f} г",
+        f"  • Соль: {nutrition['salt']:.1f} г",
+        f"  • Сахар: {nutrition['sugar']:.1f} г",
+        f"🚬 Сигареты: {cigs}",
+        f"🏃 Активность: {escape(str(exercise))}",
+        f"💸 Расходы: {expenses} ₽ | Доход: {income} ₽",
+        f"🙂 Настроение: {mood} / ⚡ Энергия: {energy}",
+        f"🧠 Мысли: {escape(str(thoughts or '—'))}",
+    ]
+    if custom_dict:
+        lines.append("🔧 Кастом:")
+        lines.extend(
+            f"• {escape(name)}: {escape(str(custom_dict.get(name, '—')))}" for name in custom_names
+        )
+    lines.append(DAY_SEPARATOR)
+    return "\n".join(lines)
+
+
+def render_report(title, rows, summaries, custom_names, limit=MESSAGE_LIMIT):
+    """
+    Отчёт по дням, разбитый на сообщения не длиннее limit.
+    Граница сообщения всегда проходит между днями; день длиннее лимита
+    (огромные «мысли») режется по строкам. Генератор: первое сообщение
+    готово до того, как отрендерены остальные.
+    """
+    buffer, size = [title], len(title)
+    for row in rows:
+        block = render_day(row, summaries.get(row[0]), custom_names)
+        if len(block) > limit:
+            if buffer:
+                yield "\n\n".join(buffer)
+                buffer, size = [], 0
+            yield from _split_block(block, limit)
+            continue
+        # +2 — пустая строка между днями
+        if buffer and size + 2 + len(block) > limit:
+            yield "\n\n".join(buffer)
+            buffer, size = [], 0
+        size += len(block) + (2 if buffer else 0)
+        buffer.append(block)
+    if buffer:
+        yield "\n\n".join(buffer)
+
+
+def _split_block(block, limit):
+    chunk, size = [], 0
+    for line in block.split("\n"):
+        while len(line) > limit:
+            if chunk:
+                yield "\n".join(chunk)
+                chunk, size = [], 0
+            # Не разрезаем HTML-сущность вроде &amp;
+            cut = limit
+            amp = line.rfind("&", limit - 8, limit)
+            if amp > 0 and ";" not in line[amp:limit]:
+                cut = amp
+            yield line[:cut]
+            line = line[cut:]
+        if chunk and size + 1 + len(line) > limit:
+            yield "\n".join(chunk)
+            chunk, size = [], 0
+        size += len(line) + (1 if chunk else 0)
+        chunk.append(line)
+    if chunk:
+        yield "\n".join(chunk)
+
+
+# === РЕНДЕР ТРЕНДОВ (/trends) ===
+TREND_LABELS = {
+    "mood": "🙂 Настроение",
+    "energy": "⚡ Энергия",
+    "sleep": "😴 Сон",
+    "cigarettes": "🚬 Сигареты",
+    "water": "💧 Вода",
+    "calories": "🍽 Калории",
+    "expenses": "💸 Расходы",
+}
+# Сколько последних недель и месяцев показывать в разбивке
+TREND_WEEKS = 8
+TREND_MONTHS = 12
+
+
+def _num(value):
+    if value is None:
+        return "—"
+    return f"{value:.0f}" if abs(value) >= 100 else f"{value:.1f}"
+
+
+def _strength(r):
+    r = abs(r)
+    if r < 0.2:
+        return "нет связи"
+    if r < 0.4:
+        return "слабая"
+    if r < 0.7:
+        return "заметная"
+    return "сильная"
+
+
+def render_trends(trends, limit=MESSAGE_LIMIT):
+    """
+    Отчёт analytics.compute_trends: средние, разбивка по неделям и месяцам, корреляции.
+    """
+    averages = trends["averages"]
+    shown = [name for name in TREND_LABELS if name in averages]
+    lines = [
+        f"📈 <b>Тренды с {trends['start']} по {trends['end']}</b>",
+        f"Дней с записями: {trends['filled']} из {trends['days']}",
+    ]
+    if not shown:
+        lines.append("\nЗа этот период нет данных.")
+        yield from _split_block("\n".join(lines), limit)
+        return
+
+    lines.append("\n<b>Среднее: 7 дн. / 30 дн. / весь период</b>")
+    for name in shown:
+        a = averages[name]
+        arrow = ""
+        if a["week"] is not None and a["prev_week"] is not None and a["week"] != a["prev_week"]:
+            arrow = " ↑" if a["week"] > a["prev_week"] else " ↓"
+        lines.append(f"{TREND_LABELS[name]}: {_num(a['week'])}{arrow} / {_num(a['month'])} / {_num(a['total'])}")
+
+    for title, series, count in (
+        ("По неделям", trends["weekly"], TREND_WEEKS),
+        ("По месяцам", trends["monthly"], TREND_MONTHS),
+    ):
+        lines.append(f"\n<b>{title}</b>")
+        labels = [label for label, _ in series[shown[0]][-count:]]
+        for i, label in enumerate(labels, start=-len(labels)):
+            values = " ".join(
+                f"{TREND_LABELS[name].split()[0]}{_num(series[name][i][1])}" for name in shown
+            )
+            lines.append(f"{label}: {values}")
+
+    if trends["correlations"]:
+        lines.append("\n<b>Связи между показателями</b>")
+        for x, y, r, pairs in trends["correlations"]:
+            pair = f"{TREND_LABELS.get(x, x)} ↔ {TREND_LABELS.get(y, y)}"
+            if r is None:
+                lines.append(f"{pair}: мало данных ({pairs} дн.)")
+            else:
+                lines.append(f"{pair}: r = {r:+.2f}, {_strength(r)} ({pairs} дн.)")
+
+    yield from _split_block("\n".join(lines), limit)
+
+
+# === ОТПРАВКА ОТЧЁТА НЕСКОЛЬКИМИ СООБЩЕНИЯМИ ===
+async def send_report(message, chunks, parse_mode="HTML"):
+    """
+    Отправляет части отчёта по порядку. Рендер и отправка идут конвейером:
+    пока одно сообщение уходит в Telegram, следующее уже готовится.
+    При лимите Telegram (RetryAfter) ждёт и повторяет то же сообщение.
+    Возвращает число отправленных сообщений.
+    """
+    queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+    sent = 0
+    error = None
+
+    async def sender():
+        nonlocal sent, error
+        while (text := await queue.get()) is not None:
+            if error:
+                continue  # дочитываем очередь, чтобы рендер не завис на put
+            try:
+                await _answer(message, text, parse_mode)
+                sent += 1
+            except Exception as e:
+                error = e
+
+    task = asyncio.create_task(sender())
+    try:
+        for chunk in chunks:
+            if error:
+                break
+            await queue.put(chunk)
+        await queue.put(None)
+        await task
+    finally:
+        task.cancel()
+    if error:
+        raise error
+    return sent
+
+
+async def _answer(message, text, parse_mode):
+    while True:
+        try:
+            return await message.answer(text, parse_mode=parse_mode)
+        except TelegramRetryAfter as e:
+            logger.warning(f"[REPORT] лимит Telegram, ждём {e.retry_after} с")
+            await asyncio.sleep(e.retry_after)
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Сколько дней (пользователь × дата) держать в памяти и сколько секунд доверять записи
+CACHE_SIZE = 50000
+CACHE_TTL = 60 * 60
+# Сколько пользователей помнить в счётчиках версий, прежде чем начать их заново
+MAX_VERSIONS = 50000
+
+
+# === КЭШ СВОДОК ПО ДНЯМ ===
+class SummaryCache:
+    """
+    LRU-кэш сводок дня {(user_id, дата): сводка} с TTL.
+    Заполняется и сбрасывается из потоков db_async, поэтому под замком.
+
+    Чтобы не положить в кэш данные, прочитанные до записи, читатель берёт
+    version(user_id) до запроса в базу, а put_many отбрасывает результат,
+    если за это время у пользователя что-то инвалидировали.
+    Версия — (эпоха, счётчик пользователя): когда счётчиков больше max_versions,
+    они сбрасываются с новой эпохой, поэтому версия никогда не повторяется.
+
+    Кэш верен, только пока все записи идут через этот процесс. Если данные
+    пишут несколько процессов бота, его выключают (disable): инвалидация
+    в одном процессе не видна в другом.
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL, max_versions=MAX_VERSIONS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_versions = max_versions
+        self.enabled = True
+        self._entries = OrderedDict()  # (user_id, дата) -> (сводка, время загрузки)
+        self._versions = {}            # user_id -> счётчик инвалидаций
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, user_id, dates):
+        """
+        Возвращает ({дата: сводка} найденных, [даты, которых нет в кэше]).
+        """
+        if not self.enabled:
+            missing = list(dates)
+            with self._lock:
+                self.misses += len(missing)
+            return {}, missing
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for day in dates:
+                entry = self._entries.get((user_id, day))
+                if entry and now - entry[1] < self.ttl:
+                    self._entries.move_to_end((user_id, day))
+                    found[day] = entry[0]
+                else:
+                    missing.append(day)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def version(self, user_id):
+        with self._lock:
+            return self._epoch, self._versions.get(user_id, 0)
+
+    def put_many(self, user_id, summaries, version):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if (self._epoch, self._versions.get(user_id, 0)) != version:
+                return
+            for day, summary in summaries.items():
+                self._entries[(user_id, day)] = (summary, now)
+                self._entries.move_to_end((user_id, day))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id, day):
+        with self._lock:
+            self._bump(user_id)
+            self._entries.pop((user_id, day), None)
+
+    def invalidate_user(self, user_id):
+        # Массовая запись (импорт): сбросить все дни пользователя разом
+        with self._lock:
+            self._bump(user_id)
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def _bump(self, user_id):
+        # Вызывается под замком
+        if user_id not in self._versions and len(self._versions) >= self.max_versions:
+            self._versions.clear()
+            self._epoch += 1
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def disable(self):
+        with self._lock:
+            self.enabled = False
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "days": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+summary_cache = SummaryCache()
@@ -0,0 +1,198 @@
+"""
+Локальный «Telegram» для сравнения поллинга и вебхука без сети.
+
+Поднимает aiohttp-сервер с методами Bot API, которые нужны боту (getMe,
+getUpdates, sendMessage, setWebhook, deleteWebhook), и прогоняет одну и ту же
+пачку синтетических апдейтов через оба режима:
+- polling: апдейты отдаются через getUpdates, бот забирает их dp.start_polling;
+- webhook: апдейты POST-ятся в WebhookServer (run_webhook с register=False).
+Хендлер отвечает на каждое сообщение, апдейт считается обработанным,
+когда ответ дошёл до заглушки. Порядок шардов и FSM — как в main.py.
+
+    python telegram_stub.py --updates 5000 --users 200 --delay 0.005
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from aiohttp import ClientSession, TCPConnector, web
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from update_scheduler import UpdateSchedulerMiddleware
+from webhook import run_webhook
+
+TOKEN = "123456:stub"
+STUB_HOST = "127.0.0.1"
+STUB_PORT = 8081
+WEBHOOK_PORT = 8082
+# Сколько апдейтов отдавать за один getUpdates (как у Telegram)
+UPDATES_LIMIT = 100
+# Сколько POST-запросов держать в полёте при прогоне вебхука
+POST_CONCURRENCY = 50
+
+
+def make_update(update_id, user_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": f"сообщение {update_id}",
+        },
+    }
+
+
+# === ЗАГЛУШКА BOT API ===
+class TelegramStub:
+    def __init__(self):
+        self.pending = []
+        self.replies = 0
+        self.expected = 0
+        self.done = asyncio.Event()
+
+    def reset(self, updates):
+        self.pending = list(updates)
+        self.replies = 0
+        self.expected = len(updates)
+        self.done.clear()
+
+    def create_app(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        return app
+
+    async def _handle(self, request):
+        method = request.match_info["method"].lower()
+        params = dict(await request.post())
+        if method == "getupdates":
+            return await self._get_updates(params)
+        if method == "sendmessage":
+            self.replies += 1
+            if self.replies >= self.expected:
+                self.done.set()
+            return web.json_response({"ok": True, "result": {
+                "message_id": self.replies,
+                "date": int(time.time()),
+                "chat": {"id": int(params["chat_id"]), "type": "private"},
+                "text": params.get("text", ""),
+            }})
+        if method == "getme":
+            return web.json_response({"ok": True, "result": {
+                "id": 123456, "is_bot": True, "first_name": "stub", "username": "stub_bot",
+            }})
+        # setWebhook, deleteWebhook и прочее — просто «ок»
+        return web.json_response({"ok": True, "result": True})
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        if offset:
+            self.pending = [u for u in self.pending if u["update_id"] >= offset]
+        if not self.pending:
+            # Короткий long-poll: отпускаем бота, чтобы он мог остановиться
+            await asyncio.sleep(0.1)
+        return web.json_response({"ok": True, "result": self.pending[:UPDATES_LIMIT]})
+
+
+# === БОТ ДЛЯ ПРОГОНА ===
+def make_dispatcher(delay):
+    dp = Dispatcher()
+    scheduler = UpdateSchedulerMiddleware()
+    scheduler.install(dp)
+
+    @dp.message()
+    async def echo(message):
+        # Имитация работы хендлера (запрос к базе и т.п.)
+        await asyncio.sleep(delay)
+        await message.answer("ok")
+
+    return dp, scheduler
+
+
+def make_bot():
+    api = TelegramAPIServer.from_base(f"http://{STUB_HOST}:{STUB_PORT}")
+    return Bot(TOKEN, session=AiohttpSession(api=api))
+
+
+async def run_polling(stub, updates, delay):
+    (dp, scheduler), bot = make_dispatcher(delay), make_bot()
+    stub.reset(updates)
+    started = time.monotonic()
+    task = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+    await stub.done.wait()
+    elapsed = time.monotonic() - started
+    await dp.stop_polling()
+    await task
+    await scheduler.close()
+    return elapsed
+
+
+async def run_webhook_mode(stub, updates, delay):
+    (dp, scheduler), bot = make_dispatcher(delay), make_bot()
+    stub.reset(updates)
+    stop_event = asyncio.Event()
+    task = asyncio.create_task(run_webhook(
+        dp, bot, base_url="", path="/webhook", host=STUB_HOST, port=WEBHOOK_PORT,
+        register=False, stop_event=stop_event
+    ))
+    await asyncio.sleep(0.2)
+
+    url = f"http://{STUB_HOST}:{WEBHOOK_PORT}/webhook"
+    semaphore = asyncio.Semaphore(POST_CONCURRENCY)
+    rejected = 0
+
+    async def post(session, update):
+        nonlocal rejected
+        async with semaphore:
+            # 503 — очередь переполнена, Telegram в этом случае повторяет доставку
+            while True:
+                async with session.post(url, json=update) as response:
+                    if response.status != 503:
+                        return
+                rejected += 1
+                await asyncio.sleep(0.05)
+
+    started = time.monotonic()
+    async with ClientSession(connector=TCPConnector(limit=POST_CONCURRENCY)) as session:
+        await asyncio.gather(*(post(session, u) for u in updates))
+        await stub.done.wait()
+    elapsed = time.monotonic() - started
+    stop_event.set()
+    await task
+    await scheduler.close()
+    await bot.session.close()
+    return elapsed, rejected
+
+
+async def main(count, users, delay):
+    stub = TelegramStub()
+    runner = web.AppRunner(stub.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, STUB_HOST, STUB_PORT).start()
+
+    updates = [make_update(i + 1, 1000 + i % users) for i in range(count)]
+    try:
+        elapsed = await run_polling(stub, updates, delay)
+        print(f"polling: {count} апдейтов за {elapsed:.2f} с — {count / elapsed:.0f} апдейтов/с")
+        elapsed, rejected = await run_webhook_mode(stub, updates, delay)
+        print(
+            f"webhook: {count} апдейтов за {elapsed:.2f} с — {count / elapsed:.0f} апдейтов/с"
+            f" (повторов после 503: {rejected})"
+        )
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение поллинга и вебхука на локальной заглушке Telegram")
+    parser.add_argument("--updates", type=int, default=5000, help="сколько апдейтов прогнать")
+    parser.add_argument("--users", type=int, default=200, help="сколько разных пользователей")
+    parser.add_argument("--delay", type=float, default=0.005, help="время работы хендлера, с")
+    args = parser.parse_args()
+    # Отказы 503 считаются в итоге, по строке в лог на каждый не нужно
+    logging.getLogger("webhook").setLevel(logging.ERROR)
+    asyncio.run(main(args.updates, args.users, args.delay))
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import db_pool
+from summary_cache import summary_cache
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """
+    Временная база, созданная init_db (со всеми миграциями).
+    """
+    monkeypatch.setattr(db_pool, "DB_PATH", str(tmp_path / "habits.db"))
+    database.init_db()
+    yield db_pool.DB_PATH
+    db_pool.close_all()
+    # Кэш сводок — модульный синглтон, следующему тесту нужна пустая база и пустой кэш
+    summary_cache.__init__()
@@ -0,0 +1,34 @@
+import database
+import db_pool
+from migrations import _v3_finance_rollups
+
+USER = 1
+DAY = "2025-03-10"
+
+
+def test_operation_without_category(db):
+    category_id = database.add_finance_category(USER, "Еда", "expense")
+    database.add_finance_operation(USER, DAY, category_id, 300, "expense")
+    database.add_finance_operation(USER, DAY, None, 100, "expense")
+    database.add_finance_operation(USER, DAY, None, 50, "expense")
+
+    assert database.get_finance_totals(USER, DAY, DAY) == {"expense": 450, "income": 0}
+    assert sorted(database.get_finance_totals_by_category(USER, DAY, DAY), key=str) == [
+        ("expense", "Еда", 300), ("expense", None, 150),
+    ]
+    assert database.rebuild_finance_rollups(USER) == 0
+
+
+def test_backfill_with_null_categories(db):
+    conn = db_pool.get_connection()
+    conn.executemany(
+        "INSERT INTO finance_operations (user_id, date, category_id, amount, type) VALUES (?, ?, ?, ?, ?)",
+        [(USER, DAY, None, 100, "expense"), (USER, DAY, None, 20, "expense"), (USER, DAY, 7, 5, "income")]
+    )
+    _v3_finance_rollups(conn)
+    conn.commit()
+
+    assert conn.execute(
+        "SELECT category_id, type, total, ops FROM finance_daily_rollups ORDER BY category_id"
+    ).fetchall() == [(0, "expense", 120, 2), (7, "income", 5, 1)]
+    assert database.rebuild_finance_rollups() == 0
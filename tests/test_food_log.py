@@ -0,0 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+USER = 1
+DAY = "2025-03-10"
+THREADS = 8
+ENTRIES = 50
+
+
+def _log_many(worker):
+    for i in range(ENTRIES):
+        database.log_food(USER, DAY, f"Приём {worker % 3}", f"Продукт {worker}-{i}", 100)
+
+
+def test_parallel_log_food_keeps_every_entry(db):
+    # Каждый поток пишет через своё соединение (db_pool), как потоки db_async
+    database.add_product("Продукт 0-0", 200, 10, 5, 20, 0, 0)
+    with ThreadPoolExecutor(THREADS) as pool:
+        list(pool.map(_log_many, range(THREADS)))
+
+    food = database.get_food_log(USER, DAY)
+    logged = {product for items in food.values() for product, _, _ in items}
+    assert len(logged) == THREADS * ENTRIES
+    assert logged == {f"Продукт {w}-{i}" for w in range(THREADS) for i in range(ENTRIES)}
+    assert set(food) == {f"Приём {w % 3}" for w in range(THREADS)}
+
+
+def test_day_summary_follows_parallel_inserts(db):
+    database.add_product("Гречка", 300, 12, 3, 60, 0, 0)
+    # Сводка дня закэширована до записи — вставки должны её сбросить
+    assert database.get_nutrition_summary(USER, DAY)["calories"] == 0
+
+    def log(_):
+        database.log_food(USER, DAY, "Обед", "Гречка", 100)
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        list(pool.map(log, range(THREADS * ENTRIES)))
+
+    assert database.get_nutrition_summary(USER, DAY)["calories"] == 300 * THREADS * ENTRIES
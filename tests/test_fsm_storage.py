@@ -0,0 +1,48 @@
+import asyncio
+import sqlite3
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+
+from fsm_storage import SQLiteStorage
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+
+def _rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM fsm_states").fetchone()[0]
+
+
+def test_shared_mode_evicts_abandoned_dialogs(tmp_path):
+    path = str(tmp_path / "fsm.db")
+
+    async def scenario():
+        storage = SQLiteStorage(path, shared=True, dialog_ttl=0.2, eviction_interval=0.05)
+        await storage.set_data(KEY, {"step": 1})
+        written = _rows(path)
+        await asyncio.sleep(0.5)
+        await storage.close()
+        return written
+
+    # Цикла сброса в shared-режиме нет, удаление идёт своим циклом
+    assert asyncio.run(scenario()) == 1
+    assert _rows(path) == 0
+
+
+def test_shared_mode_writes_through(tmp_path):
+    path = str(tmp_path / "fsm.db")
+
+    async def scenario():
+        writer = SQLiteStorage(path, shared=True)
+        reader = SQLiteStorage(path, shared=True)
+        await writer.set_state(KEY, "Form:name")
+        await writer.set_data(KEY, {"name": "Аня", "at": time.time()})
+        state, data = await reader.get_state(KEY), await reader.get_data(KEY)
+        await writer.close()
+        await reader.close()
+        return state, data
+
+    state, data = asyncio.run(scenario())
+    assert state == "Form:name"
+    assert data["name"] == "Аня"
@@ -0,0 +1,55 @@
+import pytest
+
+import database
+import importer
+from db_pool import get_connection
+
+USER = 1
+
+
+def _write_csv(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def _attached():
+    return {name for _, name, _ in get_connection().execute("PRAGMA database_list")}
+
+
+def test_import_stages_in_scratch_file_and_cleans_up(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(importer.tempfile, "tempdir", str(tmp_path))
+    path = _write_csv(tmp_path / "food.csv", [
+        "Дата;Приём пищи;Продукт;Граммы;Ккал",
+        "2025-03-10;Обед;Гречка;150;200",
+        "2025-03-11;Ужин;Творог;100;120",
+        "2025-03-12;Ужин;Творог;сто;120",
+    ])
+    report = importer.import_file(USER, path)
+
+    assert report["rows"] == {"nutrition": 2}
+    assert report["skipped"] == 1
+    food = database.get_food_log(USER, "2025-03-10")
+    assert [product for items in food.values() for product, _, _ in items] == ["Гречка"]
+    # Черновая база отключена и удалена, в temp соединения ничего не осталось
+    assert importer.SCRATCH not in _attached()
+    assert not list(tmp_path.glob("import_*.db"))
+    assert get_connection().execute("SELECT COUNT(*) FROM temp.sqlite_master").fetchone()[0] == 0
+
+
+def test_failed_import_detaches_scratch(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(importer.tempfile, "tempdir", str(tmp_path))
+    path = _write_csv(tmp_path / "food.csv", [
+        "Дата;Приём пищи;Продукт;Граммы;Ккал",
+        "2025-03-10;Обед;Гречка;150;200",
+    ])
+
+    def broken_copy(conn, user_id, table, **kwargs):
+        raise RuntimeError("сбой переноса")
+
+    monkeypatch.setattr(importer, "_copy_rows", broken_copy)
+    with pytest.raises(RuntimeError):
+        importer.import_file(USER, path)
+
+    assert database.get_food_log(USER, "2025-03-10") == {}
+    assert importer.SCRATCH not in _attached()
+    assert not list(tmp_path.glob("import_*.db"))
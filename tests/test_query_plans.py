@@ -0,0 +1,155 @@
+import re
+import sqlite3
+
+import pytest
+
+import database
+import db_pool
+
+USER = 1
+DAY = "2025-03-10"
+
+# Запросы, которым полный проход положен по смыслу: они читают таблицу целиком
+# (все напоминания при старте, пересчёт по всем пользователям)
+FULL_SCAN_ALLOWED = {
+    "get_all_reminders": {"reminders"},
+    "rebuild_finance_rollups": {"finance_operations", "finance_daily_rollups"},
+    "rebuild_habit_streaks": {"habit_logs", "habits", "habit_streaks"},
+}
+
+
+def _seed():
+    database.save_habit(USER, "Бег", {"habit_type": "good", "tracking_type": "bool", "repeat": "daily"})
+    database.log_habit_value(USER, "Бег", 1)
+    database.save_custom_field(USER, "сон", "number")
+    database.save_daily_log(USER, DAY, {"water": 1500, "mood": 4, "сон": 7})
+    database.add_product("Гречка", 313, 12.6, 3.3, 62.1, 0, 0)
+    database.log_food(USER, DAY, "Завтрак", "Гречка", 150)
+    database.add_finance_category(USER, "Еда", "expense")
+    category_id = database.get_finance_categories(USER, "expense")[0][0]
+    database.add_finance_operation(USER, DAY, category_id, 500, "expense")
+    database.set_reminder(USER, "09:00")
+
+
+# Каждый вызов — (имя функции, аргументы); покрывают все запросы database.py,
+# которые выполняют хендлеры (в handlers_logic.py своих SQL больше нет)
+CALLS = [
+    ("load_habits", (USER,)),
+    ("get_habit_streaks", (USER,)),
+    ("get_habits_page", (USER,)),
+    ("get_habit_name", (USER, 1)),
+    ("get_custom_fields", (USER,)),
+    ("get_custom_fields_page", (USER,)),
+    ("get_custom_field_name", (USER, 1)),
+    ("get_daily_log", (USER, DAY)),
+    ("get_latest_water_log", (USER,)),
+    ("get_daily_logs", (USER, "2025-03-01", "2025-03-31")),
+    ("get_daily_logs", (USER, None, None, 7)),
+    ("get_daily_aggregates", (USER, "2025-03-01", "2025-03-31")),
+    ("get_daily_report", (USER, "2025-03-01", "2025-03-31")),
+    ("get_food_log", (USER, DAY)),
+    ("get_nutrition_summary", (USER, DAY)),
+    ("get_nutrition_summary_range", (USER, "2025-03-01", "2025-03-31")),
+    ("get_day_summaries", (USER, "2025-03-01", "2025-03-31")),
+    ("get_data_version", (USER,)),
+    ("get_products", ()),
+    ("get_products_page", ()),
+    ("get_product_by_name", ("Гречка",)),
+    ("search_products", ("греч", USER)),
+    ("search_products", ("гр", USER)),
+    ("get_finance_categories", (USER, "expense")),
+    ("get_finance_operations", (USER, "2025-03-01", "2025-03-31")),
+    ("get_finance_totals", (USER, "2025-03-01", "2025-03-31")),
+    ("get_finance_totals_by_category", (USER, "2025-03-01", "2025-03-31")),
+    ("get_finance_daily_totals", (USER, "2025-03-01", "2025-03-31")),
+    ("get_balance", (USER,)),
+    ("get_last_finance_operations", (USER,)),
+    ("get_all_reminders", ()),
+    ("save_daily_log", (USER, DAY, {"water": 2000, "сон": 8})),
+    ("log_habit_value", (USER, "Бег", 1)),
+    ("log_food", (USER, DAY, "Обед", "Гречка", 200)),
+    ("add_meal", (USER, DAY, "Ужин", 1, 100)),
+    ("delete_custom_field", (USER, "сон")),
+    ("delete_habit", (USER, "Бег")),
+    ("delete_reminder", (USER,)),
+    ("rebuild_finance_rollups", (USER,)),
+    ("rebuild_finance_rollups", ()),
+    ("rebuild_habit_streaks", (USER,)),
+    ("rebuild_habit_streaks", ()),
+]
+
+
+def _traced_statements(func, args):
+    statements = []
+    conn = db_pool.get_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        func(*args)
+    finally:
+        conn.set_trace_callback(None)
+    return [s for s in statements if re.match(r"\s*(SELECT|UPDATE|DELETE|INSERT|WITH)\b", s, re.I)]
+
+
+def _full_scans(conn, sql):
+    """
+    Таблицы базы, которые план проходит целиком: «SCAN <таблица>» без USING INDEX.
+    Подзапросы, CONSTANT ROW, виртуальные (FTS) и временные таблицы не в счёт.
+    """
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    try:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    except sqlite3.OperationalError as e:
+        # Запрос к временной таблице, которую функция уже удалила
+        if "no such table" in str(e):
+            return set()
+        raise
+    scans = set()
+    for *_, detail in plan:
+        words = detail.split()
+        if words[0] == "SCAN" and "USING" not in words and words[1] in tables:
+            scans.add(words[1])
+    return scans
+
+
+@pytest.mark.parametrize("name,args", CALLS, ids=[f"{name}-{i}" for i, (name, _) in enumerate(CALLS)])
+def test_no_full_table_scans(db, name, args):
+    _seed()
+    statements = _traced_statements(getattr(database, name), args)
+    assert statements, f"{name} не выполнил ни одного запроса"
+
+    conn = db_pool.get_connection()
+    allowed = FULL_SCAN_ALLOWED.get(name, set())
+    for sql in statements:
+        scans = _full_scans(conn, sql) - allowed
+        assert not scans, f"{name}: полный проход по {sorted(scans)}\n{sql}"
+
+
+def test_migrations_reach_latest_version(db):
+    from migrations import MIGRATIONS, get_schema_version
+    assert get_schema_version(db_pool.get_connection()) == MIGRATIONS[-1][0]
+
+
+
+def _daily_logs_indexes(conn):
+    return sorted(name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'daily_logs'"
+    ))
+
+
+def test_daily_logs_indexes_match_after_upgrade(db, tmp_path, monkeypatch):
+    # Новая база и база со старой схемой daily_logs (JSON в data) приходят к одним индексам
+    fresh = _daily_logs_indexes(db_pool.get_connection())
+    db_pool.close_all()
+
+    old_path = str(tmp_path / "old.db")
+    old = sqlite3.connect(old_path)
+    old.execute("CREATE TABLE daily_logs (user_id INTEGER, date TEXT, data TEXT)")
+    old.execute("""INSERT INTO daily_logs VALUES (1, '2025-03-10', '{"water": 500}')""")
+    old.commit()
+    old.close()
+    monkeypatch.setattr(db_pool, "DB_PATH", old_path)
+    database.init_db()
+
+    assert _daily_logs_indexes(db_pool.get_connection()) == fresh
+    assert "idx_daily_logs_user_date" not in fresh
+    assert database.get_daily_log(1, "2025-03-10")["water"] == 500
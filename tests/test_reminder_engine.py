@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from reminder_engine import ReminderEngine
+
+USER = 1
+
+
+def test_missed_days_fire_once():
+    engine = ReminderEngine()
+    engine.schedule(USER, "09:00")
+    first = engine._heap[0][0]
+
+    # Машина спала четыре дня: одно напоминание, следующее — уже после now
+    now = first + timedelta(days=4, hours=3)
+    assert engine.pop_due(now) == [USER]
+    assert engine.pop_due(now) == []
+    assert engine.pop_due(now + timedelta(minutes=1)) == []
+    assert engine._heap[0][0] == (first + timedelta(days=5))
+
+
+def test_daily_reminder_moves_to_next_day():
+    engine = ReminderEngine()
+    engine.schedule(USER, "09:00")
+    first = engine._heap[0][0]
+
+    assert engine.pop_due(first - timedelta(seconds=1)) == []
+    assert engine.pop_due(first) == [USER]
+    assert engine._heap[0][0] == first + timedelta(days=1)
+
+
+def test_cancelled_reminder_is_skipped():
+    engine = ReminderEngine()
+    engine.schedule(USER, "09:00")
+    engine.cancel(USER)
+    assert engine.pop_due(datetime.now() + timedelta(days=2)) == []
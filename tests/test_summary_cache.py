@@ -0,0 +1,40 @@
+import database
+from summary_cache import SummaryCache, summary_cache
+
+USER = 1
+DAY = "2025-03-10"
+
+
+def test_versions_are_bounded_and_never_repeat():
+    cache = SummaryCache(max_versions=3)
+    seen = {cache.version(USER)}
+    for other in range(2, 12):
+        cache.invalidate(USER, DAY)
+        cache.invalidate(other, DAY)
+        # Счётчики сбрасываются, но прежняя версия USER не возвращается
+        assert cache.version(USER) not in seen
+        seen.add(cache.version(USER))
+        assert len(cache._versions) <= 3
+
+
+def test_fill_started_before_reset_is_dropped():
+    cache = SummaryCache(max_versions=1)
+    version = cache.version(USER)
+    cache.invalidate(USER, DAY)
+    # Другой пользователь переполнил счётчики: версия USER снова «нулевая», но в новой эпохе
+    cache.invalidate(2, DAY)
+    cache.put_many(USER, {DAY: "старое"}, version)
+    assert cache.get_many(USER, [DAY]) == ({}, [DAY])
+
+
+def test_disabled_cache_always_reads_database(db):
+    database.save_daily_log(USER, DAY, {"water": 500})
+    summary_cache.disable()
+    assert database.get_day_summaries(USER, DAY, DAY)[DAY][0][1] == 500
+
+    # Запись мимо этого процесса (другой процесс бота) видна сразу
+    with database.get_connection() as conn:
+        conn.execute("UPDATE daily_logs SET water = 900 WHERE user_id = ? AND date = ?", (USER, DAY))
+        conn.commit()
+    assert database.get_day_summaries(USER, DAY, DAY)[DAY][0][1] == 900
+    assert summary_cache.stats()["days"] == 0
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+
+from aiogram import BaseMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Число шардов (параллельных воркеров) и глубина очереди каждого
+UPDATE_SHARDS = 8
+UPDATE_QUEUE_SIZE = 100
+# Сколько секунд при остановке ждать обработки уже принятых апдейтов
+SHUTDOWN_TIMEOUT = 10
+
+
+class _ShardStats:
+    __slots__ = ("processed", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.processed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+# === ПЛАНИРОВЩИК АПДЕЙТОВ ПО ПОЛЬЗОВАТЕЛЯМ ===
+class UpdateSchedulerMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: раскладывает апдейты по шардам user_id % N.
+    У каждого шарда своя очередь и один воркер, поэтому:
+    - апдейты одного пользователя обрабатываются строго по порядку
+      (два сообщения не гонятся внутри FSM);
+    - разные пользователи обрабатываются параллельно, долгий /export
+      задерживает только свой шард.
+    Ставится через install(dp) — до FSMContextMiddleware, чтобы состояние
+    читалось уже в воркере шарда, после предыдущего апдейта пользователя.
+    Апдейт считается принятым, как только лёг в очередь: поллинг и воркеры
+    вебхука не ждут хендлер. Когда очередь шарда заполнена, приём ждёт (backpressure).
+    """
+
+    def __init__(self, shards=UPDATE_SHARDS, queue_size=UPDATE_QUEUE_SIZE):
+        self.shards = shards
+        self.queue_size = queue_size
+        self._queues = []
+        self._workers = []
+        self._stats = [_ShardStats() for _ in range(shards)]
+
+    def install(self, dp):
+        # Порядок outer-middleware: ... UserContext (event_from_user) -> шарды -> FSM
+        fsm = dp.fsm if dp.fsm in dp.update.outer_middleware else None
+        if fsm:
+            dp.update.outer_middleware.unregister(fsm)
+        dp.update.outer_middleware(self)
+        if fsm:
+            dp.update.outer_middleware(fsm)
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        if not self._workers:
+            self._start()
+        await self._queues[user.id % self.shards].put((handler, event, data, time.monotonic()))
+
+    def _start(self):
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.shards)]
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.shards)]
+
+    async def _worker(self, shard):
+        queue = self._queues[shard]
+        stats = self._stats[shard]
+        while True:
+            handler, event, data, enqueued_at = await queue.get()
+            wait = time.monotonic() - enqueued_at
+            stats.processed += 1
+            stats.wait_total += wait
+            stats.wait_max = max(stats.wait_max, wait)
+            try:
+                await handler(event, data)
+            except Exception as e:
+                # Диспетчер уже вернулся из feed_update, ошибку кроме нас никто не увидит
+                logger.exception(f"[SCHEDULER] ошибка обработки апдейта {event.update_id}: {e}")
+            finally:
+                queue.task_done()
+
+    async def close(self, timeout=SHUTDOWN_TIMEOUT):
+        # Даём дообработать уже принятые апдейты, затем гасим воркеров
+        if self._queues:
+            try:
+                await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues)), timeout)
+            except asyncio.TimeoutError:
+                left = sum(q.qsize() for q in self._queues)
+                logger.warning(f"[SCHEDULER] не обработано апдейтов при остановке: {left}")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self):
+        """
+        Метрики по шардам: длина очереди, обработано, среднее и максимальное ожидание (с).
+        """
+        return [
+            {
+                "shard": i,
+                "queued": self._queues[i].qsize() if self._queues else 0,
+                "processed": s.processed,
+                "wait_avg": s.wait_total / s.processed if s.processed else 0.0,
+                "wait_max": s.wait_max,
+            }
+            for i, s in enumerate(self._stats)
+        ]
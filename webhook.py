@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import secrets
+import signal
+
+from aiohttp import web
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+# Сколько апдейтов обрабатывать одновременно и сколько держать в очереди
+WEBHOOK_WORKERS = 16
+WEBHOOK_QUEUE_SIZE = 1000
+# Сколько секунд при остановке ждать обработки уже принятых апдейтов
+SHUTDOWN_TIMEOUT = 10
+
+
+# === ВЕБХУК-СЕРВЕР (альтернатива поллингу) ===
+class WebhookServer:
+    """
+    aiohttp-приложение, принимающее апдейты от Telegram.
+    Запрос только кладёт апдейт в очередь и сразу отвечает 200,
+    обработкой занимается фиксированный пул воркеров.
+    Переполненная очередь отвечает 503 — Telegram повторит доставку позже.
+    """
+
+    def __init__(self, dp, bot, path="/webhook", secret_token=None,
+                 workers=WEBHOOK_WORKERS, queue_size=WEBHOOK_QUEUE_SIZE):
+        self.dp = dp
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks = []
+        self.processed = 0
+
+    def create_app(self):
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        return app
+
+    async def _handle(self, request):
+        if self.secret_token and not secrets.compare_digest(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), self.secret_token
+        ):
+            return web.Response(status=401)
+
+        update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            logger.warning("[WEBHOOK] очередь переполнена, апдейт отклонён")
+            return web.Response(status=503)
+        return web.Response()
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                logger.exception(f"[WEBHOOK] ошибка обработки апдейта {update.update_id}: {e}")
+            finally:
+                self.processed += 1
+                self.queue.task_done()
+
+    def start_workers(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop_workers(self, timeout=SHUTDOWN_TIMEOUT):
+        # Даём дообработать уже принятые апдейты, затем гасим воркеров
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[WEBHOOK] не обработано апдейтов при остановке: {self.queue.qsize()}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+async def run_webhook(dp, bot, base_url, path, host, port, secret_token=None, register=True,
+                      stop_event=None):
+    """
+    Запускает бота в режиме вебхука до SIGTERM/SIGINT, stop_event.set() или отмены задачи.
+    base_url — публичный адрес, на который Telegram будет слать апдейты.
+    register=False — не регистрировать вебхук в Telegram (локальные прогоны).
+    """
+    stop_event = stop_event or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    signals = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+            signals.append(sig)
+        except (NotImplementedError, RuntimeError):
+            # Windows и не главный поток: остаются Ctrl+C и отмена задачи
+            pass
+
+    server = WebhookServer(dp, bot, path=path, secret_token=secret_token)
+    runner = web.AppRunner(server.create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+
+    workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+    await dp.emit_startup(bot=bot, **workflow_data)
+    server.start_workers()
+    await site.start()
+    if register:
+        await bot.set_webhook(
+            f"{base_url.rstrip('/')}{path}",
+            secret_token=secret_token,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+    logger.info(f"[WEBHOOK] слушаем {host}:{port}{path}")
+
+    try:
+        await stop_event.wait()
+        logger.info("[WEBHOOK] получен сигнал остановки")
+    finally:
+        for sig in signals:
+            loop.remove_signal_handler(sig)
+        # Сначала перестаём принимать запросы, потом дорабатываем очередь
+        await site.stop()
+        await server.stop_workers()
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot, **workflow_data)
+        logger.info(f"[WEBHOOK] остановлен, обработано апдейтов: {server.processed}")